@@ -1,11 +1,14 @@
 from django.contrib import admin
-from django.core.mail import send_mail
 from django.conf import settings
+from django.utils import timezone
 from .models import (
     CarOwner, Car, Mechanic, Garage, GarageImage,
-    ServiceRequest, ServiceRecord, ServiceItem, Notification,
-    ProductCategory, Product, Order, OrderItem, ServiceInquiry
+    ServiceRequest, ServiceRequestEvent, ServiceRecord, ServiceItem, Notification,
+    ProductCategory, Product, Order, OrderItem, ServiceInquiry, OutboundEmail, MediaBlob, BroadcastJob
 )
+from .mail import queue_mail
+from .notifications import send_broadcast
+from .roles import invalidate_roles
 
 @admin.register(CarOwner)
 class CarOwnerAdmin(admin.ModelAdmin):
@@ -34,23 +37,23 @@ class MechanicAdmin(admin.ModelAdmin):
             mechanic.status = 'approved'
             mechanic.save()
             
-            try:
-                send_mail(
-                    'SwiftCar - Application Approved',
-                    f'Dear {mechanic.user.get_full_name()},\n\nCongratulations! Your application has been approved. You can now log in to your mechanic portal.\n\nThank you,\nSwiftCar Team',
-                    settings.DEFAULT_FROM_EMAIL,
-                    [mechanic.user.email],
-                    fail_silently=True,
-                )
-            except Exception as e:
-                print(f"Email sending failed: {e}")
+            queue_mail(
+                'SwiftCar - Application Approved',
+                f'Dear {mechanic.user.get_full_name()},\n\nCongratulations! Your application has been approved. You can now log in to your mechanic portal.\n\nThank you,\nSwiftCar Team',
+                settings.DEFAULT_FROM_EMAIL,
+                [mechanic.user.email],
+            )
         
         self.message_user(request, f"{queryset.count()} mechanics approved successfully")
     approve_mechanics.short_description = "Approve selected mechanics"
 
     def reject_mechanics(self, request, queryset):
-        queryset.update(status='rejected')
-        self.message_user(request, f"{queryset.count()} mechanics rejected")
+        # Read before the update: on a changelist filtered by status the
+        # queryset no longer matches these rows afterwards
+        user_ids = list(queryset.values_list('user_id', flat=True))
+        rejected = queryset.update(status='rejected')
+        invalidate_roles(user_ids)
+        self.message_user(request, f"{rejected} mechanics rejected")
     reject_mechanics.short_description = "Reject selected mechanics"
 
 @admin.register(Garage)
@@ -66,23 +69,21 @@ class GarageAdmin(admin.ModelAdmin):
             garage.status = 'approved'
             garage.save()
             
-            try:
-                send_mail(
-                    'SwiftCar - Garage Approved',
-                    f'Dear {garage.owner_name},\n\nCongratulations! Your garage registration has been approved. You can now log in to your garage portal.\n\nThank you,\nSwiftCar Team',
-                    settings.DEFAULT_FROM_EMAIL,
-                    [garage.owner_email],
-                    fail_silently=True,
-                )
-            except Exception as e:
-                print(f"Email sending failed: {e}")
+            queue_mail(
+                'SwiftCar - Garage Approved',
+                f'Dear {garage.owner_name},\n\nCongratulations! Your garage registration has been approved. You can now log in to your garage portal.\n\nThank you,\nSwiftCar Team',
+                settings.DEFAULT_FROM_EMAIL,
+                [garage.owner_email],
+            )
         
         self.message_user(request, f"{queryset.count()} garages approved successfully")
     approve_garages.short_description = "Approve selected garages"
 
     def reject_garages(self, request, queryset):
-        queryset.update(status='rejected')
-        self.message_user(request, f"{queryset.count()} garages rejected")
+        user_ids = list(queryset.values_list('user_id', flat=True))
+        rejected = queryset.update(status='rejected')
+        invalidate_roles(user_ids)
+        self.message_user(request, f"{rejected} garages rejected")
     reject_garages.short_description = "Reject selected garages"
 
 @admin.register(GarageImage)
@@ -90,12 +91,24 @@ class GarageImageAdmin(admin.ModelAdmin):
     list_display = ['garage', 'uploaded_at']
     list_filter = ['uploaded_at']
 
+class ServiceRequestEventInline(admin.TabularInline):
+    """The lifecycle log is append-only"""
+    model = ServiceRequestEvent
+    fields = ['created_at', 'transition', 'from_status', 'to_status', 'actor', 'seconds_in_from_status']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(ServiceRequest)
 class ServiceRequestAdmin(admin.ModelAdmin):
     list_display = ['id', 'car', 'owner', 'status', 'assigned_mechanic', 'assigned_garage', 'created_at']
     search_fields = ['car__registration_number', 'owner__user__email', 'service_type']
     list_filter = ['status', 'created_at']
     readonly_fields = ['created_at', 'updated_at']
+    inlines = [ServiceRequestEventInline]
 
 class ServiceItemInline(admin.TabularInline):
     model = ServiceItem
@@ -130,17 +143,12 @@ class NotificationAdmin(admin.ModelAdmin):
             return
         
         notification = queryset.first()
-        mechanics = Mechanic.objects.filter(status='approved')
+        job = send_broadcast('mechanic', notification.title, notification.message)
         
-        for mechanic in mechanics:
-            Notification.objects.create(
-                recipient_type='mechanic',
-                recipient_mechanic=mechanic,
-                title=notification.title,
-                message=notification.message
-            )
-        
-        self.message_user(request, f"Notification sent to {mechanics.count()} mechanics")
+        if job.status == 'sent':
+            self.message_user(request, f"Notification sent to {job.delivered} mechanics")
+        else:
+            self.message_user(request, f"Notification queued for {job.audience_size} mechanics (broadcast job #{job.pk})")
     send_to_all_mechanics.short_description = "Send to all approved mechanics"
 
     def send_to_all_garages(self, request, queryset):
@@ -149,17 +157,12 @@ class NotificationAdmin(admin.ModelAdmin):
             return
         
         notification = queryset.first()
-        garages = Garage.objects.filter(status='approved')
-        
-        for garage in garages:
-            Notification.objects.create(
-                recipient_type='garage',
-                recipient_garage=garage,
-                title=notification.title,
-                message=notification.message
-            )
+        job = send_broadcast('garage', notification.title, notification.message)
         
-        self.message_user(request, f"Notification sent to {garages.count()} garages")
+        if job.status == 'sent':
+            self.message_user(request, f"Notification sent to {job.delivered} garages")
+        else:
+            self.message_user(request, f"Notification queued for {job.audience_size} garages (broadcast job #{job.pk})")
     send_to_all_garages.short_description = "Send to all approved garages"
 
 
@@ -219,4 +222,39 @@ class ServiceInquiryAdmin(admin.ModelAdmin):
         ('Admin', {
             'fields': ('admin_notes', 'created_at', 'updated_at')
         }),
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['subject', 'recipients']
+    readonly_fields = ['attempts', 'last_error', 'sent_at', 'created_at']
+    actions = ['retry_emails']
+
+    def retry_emails(self, request, queryset):
+        updated = queryset.exclude(status='sent').update(status='pending', attempts=0, next_attempt_at=timezone.now())
+        self.message_user(request, f"{updated} emails queued for retry")
+    retry_emails.short_description = "Retry selected emails"
+
+
+@admin.register(BroadcastJob)
+class BroadcastJobAdmin(admin.ModelAdmin):
+    list_display = ['title', 'recipient_type', 'status', 'delivered', 'audience_size', 'attempts', 'created_at', 'finished_at']
+    list_filter = ['status', 'recipient_type', 'created_at']
+    search_fields = ['title', 'message']
+    readonly_fields = ['audience_size', 'delivered', 'last_recipient_id', 'attempts', 'last_error', 'created_at', 'finished_at']
+    actions = ['retry_broadcasts']
+
+    def retry_broadcasts(self, request, queryset):
+        # Delivery resumes after last_recipient_id, so nobody gets it twice
+        updated = queryset.filter(status='failed').update(status='queued', attempts=0, next_attempt_at=timezone.now(), finished_at=None)
+        self.message_user(request, f"{updated} broadcasts queued for retry")
+    retry_broadcasts.short_description = "Retry selected failed broadcasts"
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'size', 'refcount', 'updated_at']
+    search_fields = ['name']
+    readonly_fields = ['name', 'size', 'refcount', 'created_at', 'updated_at']
@@ -0,0 +1,106 @@
+"""
+Async-native DRF views.
+
+APIView.dispatch() only runs synchronously. AsyncAPIViewMixin.as_async_view()
+returns an async Django view that runs the same dispatch: DRF's request
+parsing, authentication, permissions, throttles, content negotiation,
+exception handling and rendering, all configured on the view class as
+usual. Only the blocking part of that (authentication reads the session,
+throttles read the cache) runs in a thread. Handlers may be coroutines;
+plain DRF handlers (e.g. the mixins' create/update) run in a thread, so one
+async view can serve a viewset's reads and writes.
+
+AsyncListModelMixin and AsyncRetrieveModelMixin are the async counterparts
+of DRF's ListModelMixin and RetrieveModelMixin; list() paginates with
+cars.pagination.AsyncPageNumberPagination.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from rest_framework.response import Response
+
+
+class AsyncAPIViewMixin:
+    """Serve an APIView or viewset from an async view (see as_async_view())"""
+
+    @classmethod
+    def as_async_view(cls, actions=None, **initkwargs):
+        """Like ``as_view()``; pass ``actions`` ({'get': 'list', ...}) for a viewset"""
+        if actions is not None:
+            # The attributes ViewSetMixin.as_view() defaults for a viewset
+            initkwargs = {'name': None, 'description': None, 'suffix': None, 'detail': None, 'basename': None,
+                          **initkwargs}
+            if 'get' in actions and 'head' not in actions:
+                actions = {**actions, 'head': actions['get']}
+
+        async def view(request, *args, **kwargs):
+            self = cls(**initkwargs)
+            if actions is not None:
+                self.action_map = actions
+                for method, action in actions.items():
+                    setattr(self, method, getattr(self, action))
+            self.setup(request, *args, **kwargs)
+            return await self.adispatch(request, *args, **kwargs)
+
+        view.cls = cls
+        view.initkwargs = initkwargs
+        view.actions = actions
+        # As on every APIView: DRF's SessionAuthentication does the CSRF check
+        view.csrf_exempt = True
+        return view
+
+    async def adispatch(self, request, *args, **kwargs):
+        """APIView.dispatch() with the handler awaited"""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            if not asyncio.iscoroutinefunction(handler):
+                handler = sync_to_async(handler)
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def aget_queryset(self):
+        """get_queryset() for async handlers; override it if building the queryset queries the database"""
+        return self.get_queryset()
+
+    async def aget_object(self):
+        """GenericAPIView.get_object() with the async ORM"""
+        queryset = self.filter_queryset(await self.aget_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+
+class AsyncListModelMixin:
+    async def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(await self.aget_queryset())
+        if self.paginator is not None:
+            page = await self.paginator.apaginate_queryset(queryset, request, view=self)
+            if page is not None:
+                return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer([obj async for obj in queryset], many=True).data)
+
+
+class AsyncRetrieveModelMixin:
+    async def retrieve(self, request, *args, **kwargs):
+        return Response(self.get_serializer(await self.aget_object()).data)
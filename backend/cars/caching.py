@@ -0,0 +1,79 @@
+"""
+Versioned response caching for the public product catalog.
+
+Catalog responses are cached under a key that includes a catalog version.
+Saving or deleting a Product or ProductCategory (and stock changes from
+orders) bumps the version, so every cached page goes stale at once without
+having to know which keys exist. Old entries simply expire.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+CATALOG_VERSION_KEY = 'cars:catalog:version'
+
+
+def catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+async def acatalog_version():
+    version = await cache.aget(CATALOG_VERSION_KEY)
+    if version is None:
+        await cache.aadd(CATALOG_VERSION_KEY, time.time_ns(), None)
+        version = await cache.aget(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog response"""
+    # A fresh timestamp rather than incr(), so a version key lost to cache
+    # eviction can never come back as a value older entries were stored under.
+    cache.set(CATALOG_VERSION_KEY, time.time_ns(), None)
+
+
+def _cache_key(request, name, version=None):
+    url = hashlib.md5(request.build_absolute_uri().encode('utf-8')).hexdigest()
+    return f'cars:catalog:{version or catalog_version()}:{name}:{url}'
+
+
+async def cached_catalog_response(request, name, build_response):
+    """Serve the data of ``await build_response()`` from the cache when possible.
+
+    Only successful GET responses are stored, keyed on the full URL
+    (pagination links and image URLs include the host).
+    """
+    if request.method != 'GET':
+        return await build_response()
+
+    key = _cache_key(request, name, await acatalog_version())
+    data = await cache.aget(key)
+    if data is not None:
+        return Response(data)
+
+    response = await build_response()
+    if response.status_code == status.HTTP_200_OK:
+        await cache.aset(key, response.data, settings.CATALOG_CACHE_TIMEOUT)
+    return response
+
+
+class CachedCatalogMixin:
+    """Cache an async catalog viewset's list and retrieve responses"""
+
+    async def list(self, request, *args, **kwargs):
+        return await cached_catalog_response(
+            request, f'{self.basename}-list', lambda: super(CachedCatalogMixin, self).list(request, *args, **kwargs)
+        )
+
+    async def retrieve(self, request, *args, **kwargs):
+        return await cached_catalog_response(
+            request, f'{self.basename}-detail', lambda: super(CachedCatalogMixin, self).retrieve(request, *args, **kwargs)
+        )
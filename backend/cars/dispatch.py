@@ -0,0 +1,192 @@
+"""
+Automatic dispatch of pending service requests to drivers.
+
+dispatch_pending() takes a batch of pending requests (earliest preferred
+pickup first) and approved drivers with their current load, scores every
+driver for each request and assigns the best one. All assignments of a
+batch are written in one transaction: one guarded UPDATE per driver (rows
+a driver accepted meanwhile are skipped) and one bulk insert of the
+notifications.
+
+The scoring function is pluggable through the DISPATCH_SCORER setting. It
+is called as ``score(candidate, service_request)`` and returns a number
+(higher is better) or None if the driver must not take the request.
+"""
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import Mechanic, Notification, ServiceRequest
+from .notifications import publish_notifications, saved_notifications
+
+logger = logging.getLogger(__name__)
+
+# A driver is busy with a request until the car is back with its owner
+ACTIVE_STATUSES = ('assigned', 'picked_up', 'completed')
+
+# Pickups closer together than this clash for the same driver
+SLOT_CONFLICT_WINDOW = timedelta(hours=2)
+
+RATING_WEIGHT = 1.0
+ACTIVE_JOB_PENALTY = 1.5
+SAME_DAY_JOB_PENALTY = 0.5
+
+
+@dataclass
+class DriverCandidate:
+    """An approved driver and the work they already have"""
+    mechanic: Mechanic
+    active_jobs: int = 0
+    # Preferred pickup datetimes of the driver's active requests
+    pickups: list = field(default_factory=list)
+
+    def jobs_on(self, day):
+        return sum(1 for pickup in self.pickups if pickup.date() == day)
+
+    def has_conflict(self, pickup):
+        return any(abs(pickup - other) < SLOT_CONFLICT_WINDOW for other in self.pickups)
+
+
+def pickup_datetime(service_request):
+    return datetime.combine(service_request.preferred_date, service_request.preferred_time)
+
+
+def default_score(candidate, service_request):
+    """Prefer well-rated drivers with few active jobs and a free slot"""
+    if candidate.active_jobs >= settings.DISPATCH_MAX_ACTIVE_JOBS:
+        return None
+    pickup = pickup_datetime(service_request)
+    if candidate.has_conflict(pickup):
+        return None
+    return (
+        float(candidate.mechanic.rating) * RATING_WEIGHT
+        - candidate.active_jobs * ACTIVE_JOB_PENALTY
+        - candidate.jobs_on(pickup.date()) * SAME_DAY_JOB_PENALTY
+    )
+
+
+def get_scorer():
+    return import_string(settings.DISPATCH_SCORER)
+
+
+def _load_candidates():
+    mechanics = Mechanic.objects.select_related('user').filter(status='approved').annotate(
+        active_jobs=Count('assigned_requests', filter=Q(assigned_requests__status__in=ACTIVE_STATUSES))
+    )
+    candidates = {mechanic.pk: DriverCandidate(mechanic, mechanic.active_jobs) for mechanic in mechanics}
+
+    active = ServiceRequest.objects.filter(
+        assigned_mechanic_id__in=list(candidates), status__in=ACTIVE_STATUSES
+    ).values_list('assigned_mechanic_id', 'preferred_date', 'preferred_time')
+    for mechanic_id, preferred_date, preferred_time in active:
+        candidates[mechanic_id].pickups.append(datetime.combine(preferred_date, preferred_time))
+    return candidates
+
+
+def plan_assignments(requests, candidates, score):
+    """Match requests to candidates in order. Returns {request: mechanic}."""
+    plan = {}
+    for service_request in requests:
+        best, best_score = None, None
+        for candidate in candidates.values():
+            value = score(candidate, service_request)
+            if value is not None and (best_score is None or value > best_score):
+                best, best_score = candidate, value
+        if best is None:
+            continue
+        plan[service_request] = best.mechanic
+        best.active_jobs += 1
+        best.pickups.append(pickup_datetime(service_request))
+    return plan
+
+
+def dispatch_pending(request_ids=None, batch_size=None, score=None, dry_run=False):
+    """Assign a batch of pending requests to drivers.
+
+    ``request_ids`` limits the batch to those requests (used by the
+    on-create hook). Returns the list of ``(request_id, mechanic_id)``
+    assignments made.
+    """
+    batch_size = batch_size or settings.DISPATCH_BATCH_SIZE
+    score = score or get_scorer()
+
+    with transaction.atomic():
+        pending = ServiceRequest.objects.select_for_update(skip_locked=True).filter(
+            status='pending', assigned_mechanic__isnull=True
+        )
+        if request_ids is not None:
+            pending = pending.filter(pk__in=request_ids)
+        requests = list(
+            pending.select_related('car').order_by('preferred_date', 'preferred_time', 'created_at')[:batch_size]
+        )
+        if not requests:
+            return []
+
+        plan = plan_assignments(requests, _load_candidates(), score)
+        if dry_run or not plan:
+            return [(service_request.pk, mechanic.pk) for service_request, mechanic in plan.items()]
+
+        by_mechanic = defaultdict(list)
+        for service_request, mechanic in plan.items():
+            by_mechanic[mechanic].append(service_request)
+
+        assigned = []
+        driver_notifications = []
+        owner_notifications = []
+        for mechanic, mechanic_requests in by_mechanic.items():
+            ids = [service_request.pk for service_request in mechanic_requests]
+            # Guarded like accept_job, so a request a driver accepted while
+            # we were planning keeps its driver (and its notifications, sent
+            # by accept_job, aren't sent again)
+            won = set(ServiceRequest.objects.filter(pk__in=ids).transition('accept', assigned_mechanic_id=mechanic.pk))
+            for service_request in mechanic_requests:
+                if service_request.pk not in won:
+                    continue
+                assigned.append((service_request.pk, mechanic.pk))
+                car = service_request.car
+                driver_notifications.append(Notification(
+                    recipient_type='mechanic',
+                    recipient_mechanic_id=mechanic.pk,
+                    title='New Job Assigned',
+                    message=f'You have been assigned to pick up a {car.make} {car.model} from '
+                            f'{service_request.pickup_location} on {service_request.preferred_date} '
+                            f'at {service_request.preferred_time:%H:%M}.'
+                ))
+                owner_notifications.append(Notification(
+                    recipient_type='owner',
+                    recipient_owner_id=service_request.owner_id,
+                    title='Driver Assigned',
+                    message='A driver has accepted your service request and will pick up your car soon.'
+                ))
+
+        since = timezone.now()
+        drivers = Notification.objects.bulk_create(driver_notifications)
+        owners = Notification.objects.bulk_create(owner_notifications)
+        transaction.on_commit(lambda: publish_notifications(
+            saved_notifications(drivers, 'recipient_mechanic_id', [n.recipient_mechanic_id for n in drivers], since)
+            + saved_notifications(owners, 'recipient_owner_id', [n.recipient_owner_id for n in owners], since)
+        ))
+
+    logger.info('Dispatched %s of %s pending requests', len(assigned), len(requests))
+    return assigned
+
+
+def dispatch_on_create(service_request):
+    """Hook for new requests: try to assign a driver once the request is committed"""
+    if not settings.DISPATCH_ON_CREATE:
+        return
+    request_id = service_request.pk
+
+    def run():
+        try:
+            dispatch_pending(request_ids=[request_id])
+        except Exception:
+            logger.exception('Dispatch of service request %s failed', request_id)
+
+    transaction.on_commit(run)
@@ -0,0 +1,150 @@
+"""
+Nearest-neighbour lookups for garages and pickups.
+
+Garages and service requests store a latitude/longitude plus its geohash,
+which is indexed. A k-nearest query covers a bounding box around the origin
+with a handful of geohash cells, so the database only reads rows from those
+cells (each cell is an index range scan on the geohash), then trims to the
+exact box and ranks the survivors by haversine distance in Python. If fewer
+than k rows are found the radius is doubled, up to MAX_RADIUS_KM.
+"""
+import math
+
+from django.db.models import Q
+
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_PRECISION = 9
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+INITIAL_RADIUS_KM = 10
+MAX_RADIUS_KM = 320
+# Upper bound on geohash cells used to cover a bounding box
+MAX_COVER_CELLS = 12
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def geohash_encode(lat, lng, precision=GEOHASH_PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        value, interval = (lng, lng_range) if even else (lat, lat_range)
+        mid = (interval[0] + interval[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = bit_count = 0
+    return ''.join(chars)
+
+
+def location_geohash(lat, lng):
+    """Geohash stored alongside a coordinate pair ('' when unset)"""
+    if lat is None or lng is None:
+        return ''
+    return geohash_encode(lat, lng)
+
+
+def _cell_size(precision):
+    """(height, width) in degrees of a geohash cell"""
+    lng_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def bounding_box(lat, lng, radius_km):
+    """(min_lat, max_lat, min_lng, max_lng) enclosing a circle of radius_km"""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(lat))
+    lng_delta = 180.0 if cos_lat < 1e-6 else min(180.0, lat_delta / cos_lat)
+    return (max(-90.0, lat - lat_delta), min(90.0, lat + lat_delta),
+            max(-180.0, lng - lng_delta), min(180.0, lng + lng_delta))
+
+
+def _steps(low, high, step):
+    value = low
+    while value < high:
+        yield value
+        value += step
+    yield high
+
+
+def covering_cells(box):
+    """Geohash prefixes whose cells together cover ``box``"""
+    min_lat, max_lat, min_lng, max_lng = box
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = _cell_size(precision)
+        if ((max_lat - min_lat) / height + 2) * ((max_lng - min_lng) / width + 2) > MAX_COVER_CELLS:
+            continue
+        return sorted({
+            geohash_encode(lat, lng, precision)
+            for lat in _steps(min_lat, max_lat, height)
+            for lng in _steps(min_lng, max_lng, width)
+        })
+    return ['']
+
+
+def _next_prefix(prefix):
+    """The smallest geohash prefix of the same length sorting after ``prefix``"""
+    chars = list(prefix)
+    while chars:
+        position = GEOHASH_ALPHABET.index(chars[-1])
+        if position + 1 < len(GEOHASH_ALPHABET):
+            chars[-1] = GEOHASH_ALPHABET[position + 1]
+            return ''.join(chars)
+        chars.pop()
+    return None
+
+
+def cell_filter(geohash_field, cell):
+    """Rows whose geohash falls in ``cell``, as an index range (not LIKE)"""
+    # SQLite's LIKE is case-insensitive and can't use a plain index, so
+    # express "starts with" as cell <= geohash < next cell instead.
+    condition = Q(**{f'{geohash_field}__gte': cell})
+    upper = _next_prefix(cell)
+    if upper is not None:
+        condition &= Q(**{f'{geohash_field}__lt': upper})
+    return condition
+
+
+def nearest(queryset, lat, lng, k, lat_field, lng_field, geohash_field,
+            initial_radius_km=INITIAL_RADIUS_KM, max_radius_km=MAX_RADIUS_KM):
+    """The ``k`` rows of ``queryset`` closest to (lat, lng).
+
+    Returns a list of ``(instance, distance_km)`` pairs, nearest first.
+    Rows more than ``max_radius_km`` away are never returned.
+    """
+    radius = initial_radius_km
+    while True:
+        box = bounding_box(lat, lng, radius)
+        cells = Q()
+        for cell in covering_cells(box):
+            cells |= cell_filter(geohash_field, cell)
+        candidates = queryset.filter(cells).filter(**{
+            f'{lat_field}__range': (box[0], box[1]),
+            f'{lng_field}__range': (box[2], box[3]),
+        })
+
+        ranked = []
+        for instance in candidates:
+            distance = haversine_km(lat, lng, getattr(instance, lat_field), getattr(instance, lng_field))
+            if distance <= radius:
+                ranked.append((instance, distance))
+        ranked.sort(key=lambda pair: pair[1])
+
+        # Rows outside the circle (but inside the box) may be beaten by rows
+        # in the next ring, so only stop early once k are inside the circle.
+        if len(ranked) >= k or radius >= max_radius_km:
+            return ranked[:k]
+        radius = min(radius * 2, max_radius_km)
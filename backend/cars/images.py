@@ -0,0 +1,102 @@
+"""
+Upload pipeline for garage photos.
+
+Each upload is decoded once with Pillow. The decoded image is turned upright
+(EXIF orientation), re-encoded without its EXIF block (camera and GPS data
+stay on the phone) and shrunk into WebP variants, largest first so each
+variant is resized from the previous one. A batch of uploads is processed in
+a thread pool; Pillow releases the GIL while decoding, resizing and
+encoding, so ten photos take about as long as the slowest one.
+"""
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# Longest side, in pixels, of each variant. The thumbnail covers 80px
+# avatars on 2x screens.
+VARIANT_SIZES = {
+    'medium': 800,
+    'thumbnail': 160,
+}
+WEBP_QUALITY = 80
+ORIGINAL_QUALITY = 90
+
+# Refuse images that would take more than ~160MB to decode
+MAX_PIXELS = 40_000_000
+
+ORIGINAL_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+@dataclass
+class Rendition:
+    content: ContentFile
+    width: int
+    height: int
+
+
+@dataclass
+class ProcessedImage:
+    original: Rendition
+    variants: dict = field(default_factory=dict)  # name -> Rendition
+
+
+def _encode(image, name, image_format, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    return Rendition(ContentFile(buffer.getvalue(), name=name), *image.size)
+
+
+def _webp_ready(image):
+    if image.mode in ('RGB', 'RGBA'):
+        return image
+    has_alpha = image.mode in ('LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def process_image(upload):
+    """Decode ``upload`` once and return its cleaned original plus its WebP variants"""
+    stem = os.path.splitext(os.path.basename(upload.name))[0] or 'image'
+    try:
+        upload.seek(0)
+        with Image.open(upload) as image:
+            if image.format not in ORIGINAL_FORMATS:
+                raise InvalidImage(f'{upload.name} is not a JPEG, PNG or WebP image')
+            if image.width * image.height > MAX_PIXELS:
+                raise InvalidImage(f'{upload.name} is too large ({image.width}x{image.height} pixels)')
+            image_format = image.format
+            image.load()
+            upright = ImageOps.exif_transpose(image)
+    except (OSError, SyntaxError, Image.DecompressionBombError) as exc:
+        raise InvalidImage(f'{upload.name} is not a valid image') from exc
+
+    # Pillow only writes EXIF when asked to, so none of these carry it
+    upright.info.pop('exif', None)
+    options = {'quality': ORIGINAL_QUALITY} if image_format in ('JPEG', 'WEBP') else {'optimize': True}
+    if image_format == 'JPEG' and upright.mode not in ('RGB', 'L', 'CMYK'):
+        upright = upright.convert('RGB')
+    processed = ProcessedImage(
+        original=_encode(upright, f'{stem}.{ORIGINAL_FORMATS[image_format]}', image_format, **options)
+    )
+
+    source = _webp_ready(upright)
+    for name, size in sorted(VARIANT_SIZES.items(), key=lambda item: -item[1]):
+        source = source.copy()
+        source.thumbnail((size, size), Image.Resampling.LANCZOS)
+        processed.variants[name] = _encode(source, f'{stem}.webp', 'WEBP', quality=WEBP_QUALITY, method=4)
+    return processed
+
+
+def process_images(uploads):
+    """process_image() over a batch of uploads in parallel, results in upload order"""
+    workers = max(1, min(len(uploads), settings.IMAGE_PROCESSING_WORKERS))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(process_image, uploads))
@@ -0,0 +1,113 @@
+"""
+Outbound email queue.
+
+Request handlers call queue_mail() instead of send_mail(), which only writes
+an OutboundEmail row. The send_queued_mail management command drains the
+outbox in batches over a single reused backend connection, retrying failed
+messages with exponential backoff.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# How long a claimed batch is hidden from other workers before it is retried
+CLAIM_LEASE = timedelta(minutes=5)
+RETRY_BASE_DELAY = timedelta(minutes=1)
+RETRY_MAX_DELAY = timedelta(hours=6)
+
+
+def queue_mail(subject, message, from_email, recipient_list):
+    """Queue an email for the outbox worker. Mirrors send_mail()'s arguments."""
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list),
+    )
+
+
+async def aqueue_mail(subject, message, from_email, recipient_list):
+    """queue_mail() for async views"""
+    return await OutboundEmail.objects.acreate(
+        subject=subject,
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list),
+    )
+
+
+def retry_delay(attempts):
+    """Backoff before the next attempt after ``attempts`` failures"""
+    return min(RETRY_BASE_DELAY * (2 ** (attempts - 1)), RETRY_MAX_DELAY)
+
+
+def _claim_batch(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if batch:
+            OutboundEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+                next_attempt_at=now + CLAIM_LEASE
+            )
+    return batch
+
+
+def send_queued_mail(batch_size=None, max_attempts=None):
+    """Deliver one batch of due emails. Returns ``(sent, failed)`` counts."""
+    batch_size = batch_size or settings.EMAIL_QUEUE_BATCH_SIZE
+    max_attempts = max_attempts or settings.EMAIL_QUEUE_MAX_ATTEMPTS
+
+    batch = _claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        logger.warning('Could not open email connection: %s', e)
+        connection = None
+
+    try:
+        for email in batch:
+            email.attempts += 1
+            try:
+                if connection is None:
+                    raise RuntimeError('Email connection unavailable')
+                message = EmailMessage(
+                    email.subject, email.body, email.from_email, email.recipients, connection=connection
+                )
+                connection.send_messages([message])
+            except Exception as e:
+                failed += 1
+                email.last_error = str(e)
+                if email.attempts >= max_attempts:
+                    email.status = 'failed'
+                    logger.error('Giving up on email %s after %s attempts: %s', email.pk, email.attempts, e)
+                else:
+                    email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+            else:
+                sent += 1
+                email.status = 'sent'
+                email.sent_at = timezone.now()
+                email.last_error = ''
+    finally:
+        if connection is not None:
+            connection.close()
+
+    OutboundEmail.objects.bulk_update(
+        batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    )
+    return sent, failed
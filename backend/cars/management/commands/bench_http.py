@@ -0,0 +1,148 @@
+"""
+Compare requests/sec of deployments serving the same database, e.g.:
+
+    export ANON_THROTTLE_RATE=1000000/second USER_THROTTLE_RATE=1000000/second
+    gunicorn swiftcar_api.wsgi -w 4 -b 127.0.0.1:8001
+    gunicorn swiftcar_api.asgi:application -k uvicorn.workers.UvicornWorker -w 4 -b 127.0.0.1:8002
+    python manage.py bench_http --target wsgi=http://127.0.0.1:8001 \\
+        --target asgi=http://127.0.0.1:8002 /api/products/ /api/products/featured/
+
+Each of --concurrency clients sends GET requests to the paths in turn over
+a keep-alive connection (reconnecting when the server closes it), for
+--duration seconds per target after a --warmup period. Without the raised
+throttle rates most responses would be 429s.
+"""
+import asyncio
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+
+    def percentile(self, fraction):
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000 if ordered else 0.0
+
+
+async def _read_response(reader):
+    """Read one response; returns (status, whether the connection can be reused)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Connection closed')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip().lower()
+
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.read()
+        return status, False
+    return status, headers.get('connection') != 'close'
+
+
+async def _client(url, paths, stats, record_from, deadline):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80)
+    base = parts.path.rstrip('/')
+    requests = [
+        f'GET {base}{path} HTTP/1.1\r\nHost: {parts.netloc}\r\nAccept: application/json\r\n\r\n'.encode()
+        for path in paths
+    ]
+    connection = None
+    index = 0
+    loop = asyncio.get_running_loop()
+    while loop.time() < deadline:
+        started = loop.time()
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection(host, port, ssl=parts.scheme == 'https' or None)
+            reader, writer = connection
+            writer.write(requests[index % len(requests)])
+            await writer.drain()
+            status, keep_alive = await _read_response(reader)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            if started >= record_from:
+                stats.errors += 1
+            if connection is not None:
+                connection[1].close()
+            connection = None
+            continue
+        index += 1
+        if started >= record_from:
+            stats.latencies.append(loop.time() - started)
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        if not keep_alive:
+            writer.close()
+            connection = None
+    if connection is not None:
+        connection[1].close()
+
+
+async def _run(url, paths, concurrency, warmup, duration):
+    stats = Stats()
+    now = asyncio.get_running_loop().time()
+    record_from = now + warmup
+    await asyncio.gather(*[
+        _client(url, paths, stats, record_from, record_from + duration) for _ in range(concurrency)
+    ])
+    return stats
+
+
+class Command(BaseCommand):
+    help = 'Load test running servers with concurrent GET clients and compare their requests/sec.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Paths to request, e.g. /api/products/')
+        parser.add_argument('--target', action='append', required=True,
+                            help='label=base URL of a running server; repeat to compare (e.g. wsgi=http://127.0.0.1:8001)')
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help='Concurrent clients (default: 50)')
+        parser.add_argument('--duration', type=float, default=10,
+                            help='Seconds measured per target (default: 10)')
+        parser.add_argument('--warmup', type=float, default=2,
+                            help='Seconds of unmeasured load before each run (default: 2)')
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['target']:
+            label, _, url = target.partition('=')
+            if not url.startswith(('http://', 'https://')):
+                raise CommandError(f'Expected label=http://host:port, got {target!r}')
+            targets.append((label, url))
+
+        results = []
+        for label, url in targets:
+            self.stdout.write(f'{label}: {options["concurrency"]} clients for {options["duration"]:g}s against {url}')
+            stats = asyncio.run(_run(url, options['paths'], options['concurrency'], options['warmup'], options['duration']))
+            results.append((label, stats, len(stats.latencies) / options['duration']))
+
+        self.stdout.write(f'\n{"target":<12}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}  statuses')
+        for label, stats, rate in results:
+            statuses = ', '.join(f'{code}: {count}' for code, count in sorted(stats.statuses.items()))
+            if stats.errors:
+                statuses += f', errors: {stats.errors}'
+            self.stdout.write(
+                f'{label:<12}{rate:>10.1f}{stats.percentile(0.5):>10.1f}'
+                f'{stats.percentile(0.95):>10.1f}{stats.percentile(0.99):>10.1f}  {statuses}'
+            )
+        if len(results) > 1 and results[0][2]:
+            baseline = results[0]
+            for label, stats, rate in results[1:]:
+                self.stdout.write(f'{label} vs {baseline[0]}: {rate / baseline[2]:.2f}x requests/sec')
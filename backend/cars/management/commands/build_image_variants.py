@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from cars.images import InvalidImage, process_image
+from cars.models import GarageImage
+
+
+class Command(BaseCommand):
+    help = 'Create the thumbnail and medium WebP variants of garage photos uploaded before they existed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Photos loaded per query (default: 100)')
+
+    def handle(self, *args, **options):
+        missing = GarageImage.objects.filter(thumbnail='').exclude(image='').order_by('pk')
+        built = failed = 0
+        last_id = 0
+        while True:
+            batch = list(missing.filter(pk__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1].pk
+            for garage_image in batch:
+                try:
+                    with garage_image.image.open('rb') as original:
+                        processed = process_image(original)
+                except (InvalidImage, OSError) as exc:
+                    failed += 1
+                    self.stderr.write(f'Garage image {garage_image.pk}: {exc}')
+                    continue
+                # The original is kept as uploaded; only the variants are added
+                garage_image.width, garage_image.height = processed.original.width, processed.original.height
+                update_fields = ['width', 'height'] + garage_image.store_variants(processed)
+                garage_image.save(update_fields=update_fields)
+                built += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Built variants for {built} photos ({failed} failed)'))
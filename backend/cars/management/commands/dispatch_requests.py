@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from cars.dispatch import dispatch_pending
+
+
+class Command(BaseCommand):
+    help = 'Assign pending service requests to approved drivers. Run from cron, or with --loop as a worker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Requests per batch (default: DISPATCH_BATCH_SIZE)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Show the assignments without saving them')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep dispatching instead of exiting after one batch')
+        parser.add_argument('--interval', type=float, default=30,
+                            help='Seconds to wait between batches with --loop (default: 30)')
+
+    def handle(self, *args, **options):
+        while True:
+            assigned = dispatch_pending(batch_size=options['batch_size'], dry_run=options['dry_run'])
+            for request_id, mechanic_id in assigned:
+                self.stdout.write(f'Service request {request_id} -> driver {mechanic_id}')
+            self.stdout.write(self.style.SUCCESS(f'Assigned {len(assigned)} requests'))
+            if not options['loop'] or options['dry_run']:
+                break
+            time.sleep(options['interval'])
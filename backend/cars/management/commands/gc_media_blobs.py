@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from cars.media import recount_references
+from cars.models import MediaBlob
+from cars.storage import BLOB_DIR, blob_storage
+
+
+class Command(BaseCommand):
+    help = 'Delete stored media blobs that no row references any more.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help='Keep unreferenced blobs touched more recently than this (default: 24)')
+        parser.add_argument('--recount', action='store_true',
+                            help='Recompute the reference counts from the rows first')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='List what would be deleted without deleting it')
+
+    def handle(self, *args, **options):
+        storage = blob_storage()
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+
+        if options['recount']:
+            self.stdout.write(f'Corrected {recount_references()} reference counts')
+
+        deleted = freed = 0
+        unreferenced = MediaBlob.objects.filter(refcount__lte=0, updated_at__lt=cutoff)
+        for blob in unreferenced.iterator():
+            if options['dry_run']:
+                self.stdout.write(f'Would delete {blob.name}')
+            # Guarded like the query, so a blob referenced or re-uploaded
+            # meanwhile is kept
+            elif MediaBlob.objects.filter(pk=blob.pk, refcount__lte=0, updated_at__lt=cutoff).delete()[0]:
+                storage.delete_blob(blob.name)
+            else:
+                continue
+            deleted += 1
+            freed += blob.size
+
+        # Files with no row at all (e.g. a crash between writing and registering)
+        known = set(MediaBlob.objects.values_list('name', flat=True))
+        for name in self._stored_blobs(storage):
+            if name in known or storage.get_modified_time(name) >= cutoff:
+                continue
+            freed += storage.size(name)
+            if options['dry_run']:
+                self.stdout.write(f'Would delete unregistered {name}')
+            else:
+                storage.delete_blob(name)
+            deleted += 1
+
+        # Copies left behind by interrupted writes
+        temp_dir = f'{BLOB_DIR}/.tmp'
+        if not options['dry_run'] and storage.exists(temp_dir):
+            for filename in storage.listdir(temp_dir)[1]:
+                if storage.get_modified_time(f'{temp_dir}/{filename}') < cutoff:
+                    storage.delete_blob(f'{temp_dir}/{filename}')
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {deleted} blobs ({freed / (1024 * 1024):.1f}MB)'))
+
+    def _stored_blobs(self, storage):
+        if not storage.exists(BLOB_DIR):
+            return
+        for first in storage.listdir(BLOB_DIR)[0]:
+            if first.startswith('.'):
+                continue
+            for second in storage.listdir(f'{BLOB_DIR}/{first}')[0]:
+                for filename in storage.listdir(f'{BLOB_DIR}/{first}/{second}')[1]:
+                    yield f'{BLOB_DIR}/{first}/{second}/{filename}'
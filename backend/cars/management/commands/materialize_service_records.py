@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from cars.models import ServiceRecord, ServiceRequest
+
+
+class Command(BaseCommand):
+    help = 'Create the service records (and their items) of completed and returned requests that have none.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Requests per transaction (default: 500)')
+
+    def handle(self, *args, **options):
+        missing = ServiceRequest.objects.filter(
+            status__in=ServiceRecord.MATERIALIZED_STATUSES, service_record__isnull=True
+        ).order_by('pk').values_list('pk', flat=True)
+
+        created = 0
+        last_id = 0
+        while True:
+            # Keyset batches: each one starts after the last id handled
+            batch = list(missing.filter(pk__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            with transaction.atomic():
+                ServiceRecord.materialize(batch)
+            created += len(batch)
+            last_id = batch[-1]
+            self.stdout.write(f'Materialized {created} records')
+
+        self.stdout.write(self.style.SUCCESS(f'Created {created} service records'))
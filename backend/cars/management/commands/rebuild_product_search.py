@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from cars.search import is_supported, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index from the catalog.'
+
+    def handle(self, *args, **options):
+        if not is_supported():
+            self.stdout.write(self.style.WARNING('This database has no search index; search falls back to LIKE.'))
+            return
+        indexed = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} products'))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from cars.notifications import send_queued_broadcasts
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued notification broadcasts. Run from cron, or with --loop as a long-lived worker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-jobs', type=int, default=10,
+                            help='Stop after this many broadcast jobs per run (default: 10)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling for queued broadcasts instead of exiting when there are none')
+        parser.add_argument('--interval', type=float, default=10,
+                            help='Seconds to wait between polls with --loop (default: 10)')
+
+    def handle(self, *args, **options):
+        while True:
+            for job in send_queued_broadcasts(max_jobs=options['max_jobs']):
+                self.stdout.write(
+                    f'Broadcast job {job.pk} ("{job.title}"): {job.status}, '
+                    f'{job.delivered}/{job.audience_size} {job.recipient_type} recipients'
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
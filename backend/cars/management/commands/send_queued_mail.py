@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from cars.mail import send_queued_mail
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued outbound emails. Run from cron, or with --loop as a long-lived worker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Emails per batch (default: EMAIL_QUEUE_BATCH_SIZE)')
+        parser.add_argument('--max-batches', type=int, default=20,
+                            help='Stop after this many batches per run (default: 20)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling the outbox instead of exiting when it is empty')
+        parser.add_argument('--interval', type=float, default=10,
+                            help='Seconds to wait between polls with --loop (default: 10)')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            for _ in range(options['max_batches']):
+                sent, failed = send_queued_mail(batch_size=options['batch_size'])
+                total_sent += sent
+                total_failed += failed
+                if not sent and not failed:
+                    break
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Sent {total_sent} emails, {total_failed} failed'))
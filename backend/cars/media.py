@@ -0,0 +1,77 @@
+"""
+Reference counts for the content-addressed media storage (see cars.storage).
+
+MediaBlob.refcount is the number of model fields, across MEDIA_FIELDS,
+whose value is that blob. The signals in cars.signals adjust it when a row
+is saved with a different file or deleted; code that writes rows with
+bulk_create must call add_references() itself. recount_references()
+recomputes every count from the rows, should they ever drift.
+"""
+from collections import Counter, defaultdict
+
+from django.db import models
+from django.utils import timezone
+from .models import GarageImage, MediaBlob, Mechanic, Product, ProductCategory
+from .storage import is_blob_name
+
+MEDIA_FIELDS = {
+    GarageImage: ('image', 'thumbnail', 'medium'),
+    Mechanic: ('passport_photo',),
+    Product: ('image',),
+    ProductCategory: ('image',),
+}
+
+RECOUNT_BATCH_SIZE = 1000
+
+
+def register_blob(name, size):
+    """Make sure ``name`` has a MediaBlob row, and mark it as just used"""
+    if not MediaBlob.objects.filter(name=name).update(updated_at=timezone.now()):
+        MediaBlob.objects.bulk_create([MediaBlob(name=name, size=size)], ignore_conflicts=True)
+
+
+def media_names(instance):
+    """The blob names ``instance`` references, one per non-empty media field"""
+    names = (getattr(instance, field).name for field in MEDIA_FIELDS[type(instance)])
+    return [name for name in names if is_blob_name(name)]
+
+
+def stored_media_names(instance):
+    """media_names() of the row as it is in the database (empty for a new row)"""
+    if instance._state.adding or instance.pk is None:
+        return []
+    row = type(instance).objects.filter(pk=instance.pk).values_list(*MEDIA_FIELDS[type(instance)]).first()
+    return [name for name in row or () if is_blob_name(name)]
+
+
+def adjust_references(added=(), removed=()):
+    """Count new references to the ``added`` names and drop those to the ``removed`` ones"""
+    deltas = Counter(added)
+    deltas.subtract(removed)
+    by_delta = defaultdict(list)
+    for name, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(name)
+    now = timezone.now()
+    for delta, names in by_delta.items():
+        MediaBlob.objects.filter(name__in=names).update(refcount=models.F('refcount') + delta, updated_at=now)
+
+
+def add_references(instances):
+    adjust_references(added=[name for instance in instances for name in media_names(instance)])
+
+
+def recount_references():
+    """Recompute every refcount from the model rows. Returns the number of blobs corrected."""
+    counts = Counter()
+    for model, fields in MEDIA_FIELDS.items():
+        for row in model.objects.values_list(*fields).iterator(chunk_size=RECOUNT_BATCH_SIZE):
+            counts.update(name for name in row if is_blob_name(name))
+
+    stale = []
+    for blob in MediaBlob.objects.only('name', 'refcount').iterator(chunk_size=RECOUNT_BATCH_SIZE):
+        if blob.refcount != counts.get(blob.name, 0):
+            blob.refcount = counts.get(blob.name, 0)
+            stale.append(blob)
+    MediaBlob.objects.bulk_update(stale, ['refcount'], batch_size=RECOUNT_BATCH_SIZE)
+    return len(stale)
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.27 on 2026-10-17 21:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0006_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient_owner', 'is_read'], name='notif_owner_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient_mechanic', 'is_read'], name='notif_mech_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient_garage', 'is_read'], name='notif_garage_unread_idx'),
+        ),
+    ]
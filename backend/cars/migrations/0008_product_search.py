@@ -0,0 +1,46 @@
+from django.db import migrations
+
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS cars_product_search USING fts5("
+    "name, description, category, tokenize='unicode61 remove_diacritics 2')"
+)
+MYSQL_CREATE = (
+    "CREATE TABLE IF NOT EXISTS cars_product_search ("
+    "product_id BIGINT NOT NULL PRIMARY KEY, "
+    "name VARCHAR(200) NOT NULL, "
+    "description LONGTEXT NOT NULL, "
+    "category VARCHAR(100) NOT NULL, "
+    "FULLTEXT KEY cars_product_search_ft (name, description, category)"
+    ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+)
+POPULATE = (
+    "INSERT INTO cars_product_search ({key}, name, description, category) "
+    "SELECT p.id, p.name, p.description, COALESCE(c.name, '') "
+    "FROM cars_product p LEFT JOIN cars_productcategory c ON c.id = p.category_id"
+)
+
+
+def create_search_table(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(SQLITE_CREATE)
+        schema_editor.execute(POPULATE.format(key='rowid'))
+    elif vendor == 'mysql':
+        schema_editor.execute(MYSQL_CREATE)
+        schema_editor.execute(POPULATE.format(key='product_id'))
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'mysql'):
+        schema_editor.execute('DROP TABLE IF EXISTS cars_product_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0007_notification_unread_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
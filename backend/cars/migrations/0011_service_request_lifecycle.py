@@ -0,0 +1,24 @@
+# Generated by Django 4.2.27 on 2026-10-17 22:04
+
+from django.db import migrations, models
+
+
+def delivered_to_returned(apps, schema_editor):
+    # return_to_owner used to write 'delivered', which isn't a valid status
+    ServiceRequest = apps.get_model('cars', 'ServiceRequest')
+    ServiceRequest.objects.filter(status='delivered').update(status='returned')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0010_geolocation'),
+    ]
+
+    operations = [
+        migrations.RunPython(delivered_to_returned, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='servicerequest',
+            constraint=models.CheckConstraint(check=models.Q(('status__in', ['pending', 'assigned', 'picked_up', 'in_service', 'completed', 'returned', 'cancelled'])), name='svcreq_status_valid'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.27 on 2026-10-17 22:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_events(apps, schema_editor):
+    """Open the log of existing requests: created as pending, then one step to their current status"""
+    ServiceRequest = apps.get_model('cars', 'ServiceRequest')
+    ServiceRequestEvent = apps.get_model('cars', 'ServiceRequestEvent')
+    rows = ServiceRequest.objects.values_list('id', 'status', 'created_at', 'updated_at').order_by('id')
+    events = []
+    for request_id, status, created_at, updated_at in rows.iterator(chunk_size=BACKFILL_BATCH_SIZE):
+        events.append(ServiceRequestEvent(
+            service_request_id=request_id, transition='create', to_status='pending', created_at=created_at
+        ))
+        if status != 'pending':
+            updated_at = max(updated_at, created_at)
+            events.append(ServiceRequestEvent(
+                service_request_id=request_id, transition='backfill', from_status='pending', to_status=status,
+                seconds_in_from_status=int((updated_at - created_at).total_seconds()), created_at=updated_at
+            ))
+        if len(events) >= BACKFILL_BATCH_SIZE:
+            ServiceRequestEvent.objects.bulk_create(events)
+            events = []
+    ServiceRequestEvent.objects.bulk_create(events)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cars', '0011_service_request_lifecycle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceRequestEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transition', models.CharField(max_length=30)),
+                ('from_status', models.CharField(blank=True, max_length=20)),
+                ('to_status', models.CharField(max_length=20)),
+                ('seconds_in_from_status', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('service_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='cars.servicerequest')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['service_request', 'created_at', 'id'], name='svcreq_event_timeline_idx'), models.Index(fields=['created_at', 'from_status', 'to_status'], name='svcreq_event_stage_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_events, migrations.RunPython.noop),
+    ]
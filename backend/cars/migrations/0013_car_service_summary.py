@@ -0,0 +1,50 @@
+# Generated by Django 4.2.27 on 2026-10-17 22:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import Coalesce
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_summaries(apps, schema_editor):
+    ServiceRecord = apps.get_model('cars', 'ServiceRecord')
+    CarServiceSummary = apps.get_model('cars', 'CarServiceSummary')
+    totals = ServiceRecord.objects.order_by().values('car_id').annotate(
+        visit_count=Count('id'),
+        lifetime_cost=Sum('total_cost'),
+        last_service_date=Max(Coalesce('date_completed', 'date_taken')),
+    )
+    summaries = []
+    for row in totals.iterator(chunk_size=BACKFILL_BATCH_SIZE):
+        summaries.append(CarServiceSummary(**row))
+        if len(summaries) >= BACKFILL_BATCH_SIZE:
+            CarServiceSummary.objects.bulk_create(summaries)
+            summaries = []
+    CarServiceSummary.objects.bulk_create(summaries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0012_service_request_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarServiceSummary',
+            fields=[
+                ('car', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='service_summary', serialize=False, to='cars.car')),
+                ('visit_count', models.PositiveIntegerField(default=0)),
+                ('lifetime_cost', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('last_service_date', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='servicerecord',
+            index=models.Index(fields=['car', '-created_at', '-id'], name='svcrecord_car_created_idx'),
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
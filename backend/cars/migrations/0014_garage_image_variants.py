@@ -0,0 +1,53 @@
+# Generated by Django 4.2.27 on 2026-10-17 22:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0013_car_service_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='garageimage',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='garageimage',
+            name='medium',
+            field=models.ImageField(blank=True, upload_to='garage_images/medium/'),
+        ),
+        migrations.AddField(
+            model_name='garageimage',
+            name='medium_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='garageimage',
+            name='medium_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='garageimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, upload_to='garage_images/thumbnails/'),
+        ),
+        migrations.AddField(
+            model_name='garageimage',
+            name='thumbnail_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='garageimage',
+            name='thumbnail_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='garageimage',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
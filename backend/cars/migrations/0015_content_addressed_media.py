@@ -0,0 +1,58 @@
+# Generated by Django 4.2.27 on 2026-10-17 22:32
+
+import cars.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0014_garage_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='garageimage',
+            name='image',
+            field=models.ImageField(storage=cars.storage.blob_storage, upload_to='garage_images/'),
+        ),
+        migrations.AlterField(
+            model_name='garageimage',
+            name='medium',
+            field=models.ImageField(blank=True, storage=cars.storage.blob_storage, upload_to='garage_images/medium/'),
+        ),
+        migrations.AlterField(
+            model_name='garageimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, storage=cars.storage.blob_storage, upload_to='garage_images/thumbnails/'),
+        ),
+        migrations.AlterField(
+            model_name='mechanic',
+            name='passport_photo',
+            field=models.ImageField(blank=True, null=True, storage=cars.storage.blob_storage, upload_to='mechanic_photos/'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=cars.storage.blob_storage, upload_to='product_images/'),
+        ),
+        migrations.AlterField(
+            model_name='productcategory',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=cars.storage.blob_storage, upload_to='category_images/'),
+        ),
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('refcount', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['refcount', 'updated_at'], name='mediablob_gc_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.27 on 2026-10-17 23:36
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0016_broadcast_jobs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='servicerecord',
+            name='date_taken',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
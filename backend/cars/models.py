@@ -1,6 +1,15 @@
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.contrib.auth.models import User
+from django.core.validators import MaxValueValidator, MinValueValidator
+from decimal import Decimal
 import uuid
+from .geo import location_geohash
+from .storage import blob_storage
+
+LATITUDE_VALIDATORS = [MinValueValidator(-90), MaxValueValidator(90)]
+LONGITUDE_VALIDATORS = [MinValueValidator(-180), MaxValueValidator(180)]
 
 class CarOwner(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='car_owner_profile')
@@ -49,7 +58,7 @@ class Mechanic(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='mechanic_profile')
     phone_number = models.CharField(max_length=20)
     address = models.TextField()
-    passport_photo = models.ImageField(upload_to='mechanic_photos/', null=True, blank=True)
+    passport_photo = models.ImageField(upload_to='mechanic_photos/', storage=blob_storage, null=True, blank=True)
     id_number = models.CharField(max_length=50)
     license_number = models.CharField(max_length=50, blank=True)
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
@@ -76,22 +85,108 @@ class Garage(models.Model):
     owner_email = models.EmailField()
     address = models.TextField()
     location = models.CharField(max_length=200)
+    latitude = models.FloatField(null=True, blank=True, validators=LATITUDE_VALIDATORS)
+    longitude = models.FloatField(null=True, blank=True, validators=LONGITUDE_VALIDATORS)
+    geohash = models.CharField(max_length=12, blank=True, editable=False)  # Derived from latitude/longitude
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='garage_profile')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Nearest approved garages (see cars.geo)
+            models.Index(fields=['status', 'geohash'], name='garage_status_geohash_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.geohash = location_geohash(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.name} - {self.location}"
 
 class GarageImage(models.Model):
     garage = models.ForeignKey(Garage, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='garage_images/')
+    image = models.ImageField(upload_to='garage_images/', storage=blob_storage)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    # WebP variants made on upload (see cars.images); empty for older photos
+    thumbnail = models.ImageField(upload_to='garage_images/thumbnails/', storage=blob_storage, blank=True)
+    thumbnail_width = models.PositiveIntegerField(null=True, blank=True)
+    thumbnail_height = models.PositiveIntegerField(null=True, blank=True)
+    medium = models.ImageField(upload_to='garage_images/medium/', storage=blob_storage, blank=True)
+    medium_width = models.PositiveIntegerField(null=True, blank=True)
+    medium_height = models.PositiveIntegerField(null=True, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    @classmethod
+    def from_processed(cls, garage, processed):
+        """An unsaved GarageImage whose files (original and variants) are already stored"""
+        garage_image = cls(garage=garage, width=processed.original.width, height=processed.original.height)
+        garage_image.image.save(processed.original.content.name, processed.original.content, save=False)
+        garage_image.store_variants(processed)
+        return garage_image
+
+    def store_variants(self, processed):
+        """Store the variants of ``processed`` and note their sizes. Returns the fields set (the row isn't saved)."""
+        fields = []
+        for name, rendition in processed.variants.items():
+            getattr(self, name).save(rendition.content.name, rendition.content, save=False)
+            setattr(self, f'{name}_width', rendition.width)
+            setattr(self, f'{name}_height', rendition.height)
+            fields += [name, f'{name}_width', f'{name}_height']
+        return fields
+
     def __str__(self):
         return f"Image for {self.garage.name}"
 
+def _take_write_lock(using):
+    """Start an SQLite transaction as a writer.
+
+    SQLite has no row locks (select_for_update() is a no-op there), and a
+    transaction that has read can't upgrade to a writer while another
+    connection is writing, so it would fail with "database is locked"
+    instead of waiting. An UPDATE that matches nothing takes the write lock,
+    waiting for it like any write.
+    """
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {ServiceRequest._meta.db_table} SET id = id WHERE 0')
+
+
+class ServiceRequestQuerySet(models.QuerySet):
+    def transition(self, name, actor=None, **changes):
+        """Apply lifecycle transition ``name`` to the rows still in one of its source states.
+
+        A guarded UPDATE (``... WHERE status IN (<sources>)``), so concurrent
+        or repeated calls can't skip a step or write a status the lifecycle
+        doesn't allow. Each row it moves gets a ServiceRequestEvent in the
+        same transaction. Returns the ids of the rows moved.
+        """
+        sources, target = ServiceRequest.TRANSITIONS[name]
+        changes = {**ServiceRequest.transition_changes(name), **changes}
+        with transaction.atomic(using=self.db):
+            _take_write_lock(self.db)
+            # Locked, so exactly these rows are still in a source state when
+            # the UPDATE runs and they are the ones events are recorded for
+            locked = list(self.select_for_update().filter(status__in=sources).values_list('id', flat=True))
+            if not locked:
+                return []
+            now = timezone.now()
+            ServiceRequest.objects.filter(pk__in=locked, status__in=sources).update(
+                status=target, updated_at=now, **changes
+            )
+            ServiceRequestEvent.record(name, locked, actor, now)
+            if name in ServiceRecord.MATERIALIZED_ON:
+                ServiceRecord.materialize(locked)
+        return locked
+
+
 class ServiceRequest(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -102,10 +197,31 @@ class ServiceRequest(models.Model):
         ('returned', 'Car Returned'),
         ('cancelled', 'Cancelled'),
     ]
+
+    # Lifecycle: transition name -> (statuses it may start from, resulting status)
+    TRANSITIONS = {
+        'accept': (('pending',), 'assigned'),                    # driver takes an open job
+        'assign': (('pending', 'assigned'), 'assigned'),         # admin/dispatch picks the driver
+        'release': (('assigned',), 'pending'),                   # admin puts a job back on the board
+        'pickup': (('assigned',), 'picked_up'),
+        'deliver_to_garage': (('picked_up',), 'in_service'),
+        'complete': (('in_service',), 'completed'),
+        'return_to_owner': (('completed',), 'returned'),
+        'cancel': (('pending', 'assigned'), 'cancelled'),
+    }
+    # Transitions that need more than a status change (a driver or garage)
+    # and so can't be applied in bulk by status alone
+    TRANSITIONS_WITH_ARGUMENTS = ('accept', 'assign', 'deliver_to_garage')
+
+    SERVICE_FEE_RATE = Decimal('0.05')
+    TRIP_FEE = Decimal('700.00')
     
     car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='service_requests')
     owner = models.ForeignKey(CarOwner, on_delete=models.CASCADE, related_name='service_requests')
     pickup_location = models.TextField()
+    pickup_latitude = models.FloatField(null=True, blank=True, validators=LATITUDE_VALIDATORS)
+    pickup_longitude = models.FloatField(null=True, blank=True, validators=LONGITUDE_VALIDATORS)
+    pickup_geohash = models.CharField(max_length=12, blank=True, editable=False)  # Derived from pickup_latitude/longitude
     preferred_date = models.DateField()
     preferred_time = models.TimeField()
     service_type = models.CharField(max_length=200)
@@ -119,12 +235,46 @@ class ServiceRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ServiceRequestQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination: (created_at, id) for staff and per-owner feeds
+            models.Index(fields=['-created_at', '-id'], name='svcreq_created_id_idx'),
+            models.Index(fields=['owner', '-created_at', '-id'], name='svcreq_owner_created_idx'),
+            # Mechanic and garage dashboards, and the pending job board
+            models.Index(fields=['assigned_mechanic', '-created_at', '-id'], name='svcreq_mech_created_idx'),
+            models.Index(fields=['assigned_garage', '-created_at', '-id'], name='svcreq_garage_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='svcreq_status_created_idx'),
+            # Nearest pending jobs (see cars.geo)
+            models.Index(fields=['status', 'pickup_geohash'], name='svcreq_status_geohash_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(status__in=['pending', 'assigned', 'picked_up', 'in_service', 'completed',
+                                           'returned', 'cancelled']),
+                name='svcreq_status_valid',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.pickup_geohash = location_geohash(self.pickup_latitude, self.pickup_longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'pickup_latitude', 'pickup_longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'pickup_geohash'}
+        if not self._state.adding:
+            super().save(*args, **kwargs)
+            return
+        # A new request opens its event log in the same transaction
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            ServiceRequestEvent.objects.create(
+                service_request=self, transition='create', to_status=self.status, created_at=self.created_at
+            )
 
     def get_commission_rate(self):
         """Get commission rate based on garage cost tier"""
-        from decimal import Decimal
         cost = self.garage_cost
         if cost < 10000:
             return Decimal('0.10')  # 10%
@@ -145,15 +295,125 @@ class ServiceRequest(models.Model):
 
     def calculate_customer_total(self):
         """Calculate total cost for customer: repair cost + 5% service fee + 700 trip fee"""
-        from decimal import Decimal
-        service_fee = self.garage_cost * Decimal('0.05')
-        trip_fee = Decimal('700.00')
-        return self.garage_cost + service_fee + trip_fee
+        service_fee = self.garage_cost * self.SERVICE_FEE_RATE
+        return self.garage_cost + service_fee + self.TRIP_FEE
+
+    @classmethod
+    def customer_total_expression(cls, garage_cost):
+        """calculate_customer_total() as a database expression over ``garage_cost``"""
+        return garage_cost * (Decimal('1') + cls.SERVICE_FEE_RATE) + cls.TRIP_FEE
+
+    @classmethod
+    def transition_for_status(cls, status):
+        """The argument-free transition that leads to ``status``, or None"""
+        for name, (sources, target) in cls.TRANSITIONS.items():
+            if target == status and name not in cls.TRANSITIONS_WITH_ARGUMENTS:
+                return name
+        return None
+
+    @classmethod
+    def transition_changes(cls, name):
+        """Columns a transition always writes besides status"""
+        if name == 'release':
+            return {'assigned_mechanic': None}
+        if name == 'complete':
+            # garage_cost is kept current by the work item actions; only the
+            # customer total needs (re)deriving when the service completes
+            return {'total_cost': cls.customer_total_expression(models.F('garage_cost'))}
+        return {}
+
+    def apply_cost_delta(self, delta):
+        """Add ``delta`` to garage_cost and recompute total_cost in a single UPDATE.
+
+        Call inside a transaction that holds the row lock. The in-memory
+        costs are refreshed afterwards.
+        """
+        new_garage_cost = models.F('garage_cost') + delta
+        ServiceRequest.objects.filter(pk=self.pk).update(
+            # total_cost is assigned first: MySQL evaluates SET clauses left to
+            # right, so it must read garage_cost before it is incremented.
+            total_cost=self.customer_total_expression(new_garage_cost),
+            garage_cost=new_garage_cost,
+            updated_at=timezone.now(),
+        )
+        self.refresh_from_db(fields=['garage_cost', 'total_cost', 'updated_at'])
 
     def __str__(self):
         return f"Service Request #{self.id} - {self.car} - {self.status}"
 
 
+class ServiceRequestEventQuerySet(models.QuerySet):
+    def stage_metrics(self):
+        """Count and duration (seconds) of each from_status -> to_status step in these events"""
+        return list(
+            self.exclude(transition__in=('create', 'backfill'))
+            .values('from_status', 'to_status')
+            .annotate(
+                count=models.Count('id'),
+                avg_seconds=models.Avg('seconds_in_from_status'),
+                min_seconds=models.Min('seconds_in_from_status'),
+                max_seconds=models.Max('seconds_in_from_status'),
+            )
+            .order_by('from_status', 'to_status')
+        )
+
+
+class ServiceRequestEvent(models.Model):
+    """Append-only log of lifecycle transitions, written by ServiceRequestQuerySet.transition"""
+    service_request = models.ForeignKey(ServiceRequest, on_delete=models.CASCADE, related_name='events')
+    transition = models.CharField(max_length=30)  # 'create' or a ServiceRequest.TRANSITIONS name
+    from_status = models.CharField(max_length=20, blank=True)
+    to_status = models.CharField(max_length=20)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')  # None for system changes
+    # Time spent in from_status, so stage metrics are a plain aggregate
+    seconds_in_from_status = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = ServiceRequestEventQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['service_request', 'created_at', 'id'], name='svcreq_event_timeline_idx'),
+            models.Index(fields=['created_at', 'from_status', 'to_status'], name='svcreq_event_stage_idx'),
+        ]
+
+    @classmethod
+    def record(cls, name, request_ids, actor, now):
+        """Log transition ``name`` of ``request_ids``, which have just been moved.
+
+        The previous status and how long the request spent in it come from
+        the request's latest event, so this works after the UPDATE.
+        """
+        sources, target = ServiceRequest.TRANSITIONS[name]
+        latest = models.Subquery(
+            cls.objects.filter(service_request_id=models.OuterRef('service_request_id'))
+            .order_by('-created_at', '-id').values('id')[:1]
+        )
+        previous = {
+            event.service_request_id: event
+            for event in cls.objects.filter(service_request_id__in=request_ids, id=latest).only(
+                'service_request_id', 'to_status', 'created_at'
+            )
+        }
+        events = []
+        for request_id in request_ids:
+            last = previous.get(request_id)
+            events.append(cls(
+                service_request_id=request_id,
+                transition=name,
+                from_status=last.to_status if last else (sources[0] if len(sources) == 1 else ''),
+                to_status=target,
+                actor=actor if actor is not None and actor.is_authenticated else None,
+                seconds_in_from_status=max(0, int((now - last.created_at).total_seconds())) if last else None,
+                created_at=now,
+            ))
+        cls.objects.bulk_create(events)
+
+    def __str__(self):
+        return f"Service Request #{self.service_request_id}: {self.from_status or '-'} -> {self.to_status}"
+
+
 class ServiceWorkItem(models.Model):
     """Items/work done by the garage on a service request"""
     service_request = models.ForeignKey(ServiceRequest, on_delete=models.CASCADE, related_name='work_items')
@@ -172,7 +432,7 @@ class ServiceRecord(models.Model):
     mechanic_return = models.ForeignKey(Mechanic, on_delete=models.SET_NULL, null=True, blank=True, related_name='returns')
     garage = models.ForeignKey(Garage, on_delete=models.SET_NULL, null=True, related_name='service_records')
     garage_person_in_charge = models.CharField(max_length=200, blank=True)
-    date_taken = models.DateTimeField(auto_now_add=True)
+    date_taken = models.DateTimeField(default=timezone.now, editable=False)  # Set from the pickup by materialize()
     date_completed = models.DateTimeField(null=True, blank=True)
     date_returned = models.DateTimeField(null=True, blank=True)
     total_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
@@ -180,12 +440,130 @@ class ServiceRecord(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Lifecycle transitions that (re)write the record of a request
+    MATERIALIZED_ON = ('complete', 'return_to_owner')
+    MATERIALIZED_STATUSES = ('completed', 'returned')
+    # When the car was taken: picked up by the driver, else dropped at the garage
+    TAKEN_STATUSES = ('picked_up', 'in_service')
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Per-car history, newest first
+            models.Index(fields=['car', '-created_at', '-id'], name='svcrecord_car_created_idx'),
+        ]
+
+    @classmethod
+    def materialize(cls, request_ids):
+        """Create or refresh the records of completed/returned requests from the requests themselves.
+
+        New records get the request's work items copied in as ServiceItems;
+        the taken (pickup), completion and return dates come from the event
+        log. A fixed number of queries however many requests are passed;
+        call inside the transaction that moved them.
+        """
+        requests = list(
+            ServiceRequest.objects.filter(pk__in=request_ids, status__in=cls.MATERIALIZED_STATUSES)
+            .select_related('assigned_garage')
+        )
+        if not requests:
+            return
+        ids = [service_request.pk for service_request in requests]
+        dates = {}
+        for request_id, to_status, created_at in ServiceRequestEvent.objects.filter(
+            service_request_id__in=ids, to_status__in=cls.TAKEN_STATUSES + cls.MATERIALIZED_STATUSES
+        ).values_list('service_request_id', 'to_status', 'created_at'):
+            dates[request_id, to_status] = created_at  # Oldest first, so the latest wins
+
+        existing = {record.service_request_id: record for record in cls.objects.filter(service_request_id__in=ids)}
+        new_records = []
+        for service_request in requests:
+            record = existing.get(service_request.pk)
+            if record is None:
+                record = cls(
+                    service_request=service_request,
+                    car_id=service_request.car_id,
+                    mechanic_pickup_id=service_request.assigned_mechanic_id,
+                    garage_id=service_request.assigned_garage_id,
+                    garage_person_in_charge=(service_request.assigned_garage.owner_name
+                                             if service_request.assigned_garage_id else ''),
+                    notes=service_request.special_instructions,
+                )
+                new_records.append(record)
+            taken = [dates[service_request.pk, status] for status in cls.TAKEN_STATUSES
+                     if (service_request.pk, status) in dates]
+            if taken:
+                record.date_taken = taken[0]
+            record.total_cost = service_request.total_cost
+            record.date_completed = dates.get((service_request.pk, 'completed'), record.date_completed)
+            if service_request.status == 'returned':
+                record.mechanic_return_id = service_request.assigned_mechanic_id
+                record.date_returned = dates.get((service_request.pk, 'returned'), record.date_returned)
+
+        if existing:
+            now = timezone.now()
+            for record in existing.values():
+                record.updated_at = now  # bulk_update skips auto_now
+            cls.objects.bulk_update(
+                existing.values(),
+                ['total_cost', 'date_taken', 'date_completed', 'date_returned', 'mechanic_return', 'updated_at']
+            )
+        if new_records:
+            cls.objects.bulk_create(new_records)
+            # MySQL doesn't return the new primary keys, so look them up
+            record_ids = dict(
+                cls.objects.filter(service_request_id__in=[record.service_request_id for record in new_records])
+                .values_list('service_request_id', 'id')
+            )
+            ServiceItem.objects.bulk_create([
+                ServiceItem(service_record_id=record_ids[request_id], item_name=description[:200],
+                            description=description if len(description) > 200 else '', cost=cost)
+                for request_id, description, cost in ServiceWorkItem.objects.filter(
+                    service_request_id__in=record_ids
+                ).order_by('created_at', 'id').values_list('service_request_id', 'description', 'cost')
+            ])
+        # bulk writes skip the ServiceRecord signals that keep this current
+        CarServiceSummary.refresh({service_request.car_id for service_request in requests})
 
     def __str__(self):
         return f"Service Record #{self.id} - {self.car}"
 
+class CarServiceSummary(models.Model):
+    """Denormalized service totals per car, refreshed whenever its records change"""
+    car = models.OneToOneField(Car, on_delete=models.CASCADE, primary_key=True, related_name='service_summary')
+    visit_count = models.PositiveIntegerField(default=0)
+    lifetime_cost = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    last_service_date = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def refresh(cls, car_ids):
+        """Recompute the summaries of ``car_ids`` from their service records (one read, one upsert)"""
+        cars = Car.objects.filter(pk__in=car_ids).annotate(
+            visit_count=models.Count('service_records'),
+            lifetime_cost=models.Sum('service_records__total_cost'),
+            last_service_date=models.Max(Coalesce(
+                'service_records__date_completed', 'service_records__date_taken'
+            )),
+        ).values_list('pk', 'visit_count', 'lifetime_cost', 'last_service_date')
+        # MySQL's ON DUPLICATE KEY UPDATE can't name the conflicting column
+        # (Django refuses unique_fields there); the primary key is the only
+        # unique key, so it is what conflicts anyway.
+        with_target = connections[cls.objects.db].features.supports_update_conflicts_with_target
+        cls.objects.bulk_create(
+            [
+                cls(car_id=car_id, visit_count=visit_count, lifetime_cost=lifetime_cost or Decimal('0.00'),
+                    last_service_date=last_service_date)
+                for car_id, visit_count, lifetime_cost, last_service_date in cars
+            ],
+            update_conflicts=True,
+            unique_fields=['car'] if with_target else None,
+            update_fields=['visit_count', 'lifetime_cost', 'last_service_date', 'updated_at'],
+        )
+
+    def __str__(self):
+        return f"Service summary for {self.car}"
+
 class ServiceItem(models.Model):
     service_record = models.ForeignKey(ServiceRecord, on_delete=models.CASCADE, related_name='items')
     item_name = models.CharField(max_length=200)
@@ -214,6 +592,17 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination: (created_at, id) per recipient
+            models.Index(fields=['-created_at', '-id'], name='notif_created_id_idx'),
+            models.Index(fields=['recipient_owner', '-created_at', '-id'], name='notif_owner_created_idx'),
+            models.Index(fields=['recipient_mechanic', '-created_at', '-id'], name='notif_mech_created_idx'),
+            models.Index(fields=['recipient_garage', '-created_at', '-id'], name='notif_garage_created_idx'),
+            # Unread counts and mark-all-read per recipient
+            models.Index(fields=['recipient_owner', 'is_read'], name='notif_owner_unread_idx'),
+            models.Index(fields=['recipient_mechanic', 'is_read'], name='notif_mech_unread_idx'),
+            models.Index(fields=['recipient_garage', 'is_read'], name='notif_garage_unread_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.recipient_type}"
@@ -223,7 +612,7 @@ class ProductCategory(models.Model):
     name = models.CharField(max_length=100)
     slug = models.SlugField(unique=True)
     description = models.TextField(blank=True)
-    image = models.ImageField(upload_to='category_images/', null=True, blank=True)
+    image = models.ImageField(upload_to='category_images/', storage=blob_storage, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -241,7 +630,7 @@ class Product(models.Model):
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     sale_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    image = models.ImageField(upload_to='product_images/', null=True, blank=True)
+    image = models.ImageField(upload_to='product_images/', storage=blob_storage, null=True, blank=True)
     stock = models.IntegerField(default=0)
     is_featured = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
@@ -250,6 +639,21 @@ class Product(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Shop listing, per-category listing, featured and on-sale strips
+            models.Index(fields=['is_active', '-created_at'], name='product_active_created_idx'),
+            models.Index(fields=['category', 'is_active', '-created_at'], name='product_cat_active_idx'),
+            models.Index(fields=['is_active', 'is_featured', '-created_at'], name='product_featured_idx'),
+            models.Index(fields=['is_active', 'sale_price', '-created_at'], name='product_sale_idx'),
+            # SQLite filters booleans as a bare "WHERE is_featured", which only
+            # a partial index on the same condition can serve. MySQL compares
+            # with "= true" and uses the composites above (it has no partial
+            # indexes, so Django skips these there).
+            models.Index(fields=['-created_at'], condition=models.Q(is_active=True, is_featured=True),
+                         name='product_featured_partial_idx'),
+            models.Index(fields=['-created_at'], condition=models.Q(is_active=True, sale_price__isnull=False),
+                         name='product_sale_partial_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -288,6 +692,11 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination: (created_at, id) per customer
+            models.Index(fields=['-created_at', '-id'], name='order_created_id_idx'),
+            models.Index(fields=['customer', '-created_at', '-id'], name='order_customer_created_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.order_number:
@@ -355,3 +764,83 @@ class ServiceInquiry(models.Model):
 
     def __str__(self):
         return f"{self.get_service_type_display()} - {self.company_name} ({self.created_at.strftime('%Y-%m-%d')})"
+
+
+class OutboundEmail(models.Model):
+    """Queued outgoing email, delivered by the send_queued_mail command"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
+
+
+class BroadcastJob(models.Model):
+    """A notification for every recipient of a type, delivered in chunks (see cars.notifications)"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    recipient_type = models.CharField(max_length=20, choices=Notification.RECIPIENT_CHOICES)
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    audience_size = models.PositiveIntegerField(default=0)
+    delivered = models.PositiveIntegerField(default=0)
+    # Keyset cursor: recipients up to this id have their notification
+    last_recipient_id = models.BigIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    # Not picked up by a worker before this time (claim lease or retry backoff)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='broadcast_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} -> {self.recipient_type} ({self.status}, {self.delivered}/{self.audience_size})"
+
+
+class MediaBlob(models.Model):
+    """A stored file of the content-addressed media storage and how many fields reference it"""
+    name = models.CharField(max_length=100, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    refcount = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Garbage collection: unreferenced blobs not touched lately
+            models.Index(fields=['refcount', 'updated_at'], name='mediablob_gc_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} references)"
@@ -0,0 +1,210 @@
+"""
+Notification delivery helpers.
+
+A broadcast is a BroadcastJob row. Its recipients are walked in id order,
+one chunk per transaction: the chunk's notifications are written with
+bulk_create together with the job's new cursor, so an interrupted job
+resumes where it stopped without skipping or repeating anyone. Audiences up
+to BROADCAST_BACKGROUND_THRESHOLD are delivered during the admin's request;
+larger ones (and inline attempts that failed) are left to
+``python manage.py send_queued_broadcasts``, which retries failures with
+backoff.
+
+Every committed notification is also published to its recipient's live
+stream channel (see cars.pubsub).
+"""
+import logging
+from datetime import timedelta
+from functools import partial
+
+from django.db import transaction
+from django.utils import timezone
+from .mail import retry_delay
+from .models import BroadcastJob, CarOwner, Mechanic, Garage, Notification
+from .pubsub import get_broker, notification_channel
+from .serializers import NotificationSerializer
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_CHUNK_SIZE = 1000
+BROADCAST_BACKGROUND_THRESHOLD = 2000
+BROADCAST_MAX_ATTEMPTS = 5
+# How long a job being delivered is hidden from other workers; renewed per chunk
+BROADCAST_LEASE = timedelta(minutes=5)
+
+# recipient_type -> (profile queryset factory, Notification foreign key column)
+BROADCAST_AUDIENCES = {
+    'mechanic': (lambda: Mechanic.objects.filter(status='approved'), 'recipient_mechanic_id'),
+    'garage': (lambda: Garage.objects.filter(status='approved'), 'recipient_garage_id'),
+    'owner': (lambda: CarOwner.objects.all(), 'recipient_owner_id'),
+}
+
+
+def _audience(recipient_type):
+    try:
+        return BROADCAST_AUDIENCES[recipient_type]
+    except KeyError:
+        raise ValueError(f'Unknown recipient type: {recipient_type}')
+
+
+def audience_size(recipient_type):
+    """Number of recipients a broadcast to ``recipient_type`` would reach"""
+    queryset, _ = _audience(recipient_type)
+    return queryset().count()
+
+
+def queue_broadcast(recipient_type, title, message, deliver_after=None):
+    """Create the job for a broadcast; the worker picks it up from ``deliver_after`` (default: now)"""
+    return BroadcastJob.objects.create(
+        recipient_type=recipient_type,
+        title=title,
+        message=message,
+        audience_size=audience_size(recipient_type),
+        next_attempt_at=deliver_after or timezone.now(),
+    )
+
+
+def saved_notifications(created, field, recipient_ids, since):
+    """The rows of a bulk_create, with primary keys.
+
+    MySQL's bulk_create doesn't return them, so there they are looked up:
+    the notifications with this type and title that ``field`` gave
+    ``recipient_ids``, created since ``since``.
+    """
+    if all(notification.pk for notification in created) or not created:
+        return created
+    sample = created[0]
+    return list(Notification.objects.filter(
+        recipient_type=sample.recipient_type, title=sample.title,
+        created_at__gte=since, **{f'{field}__in': recipient_ids},
+    ).order_by('id'))
+
+
+def _publish_chunk(created, field, recipient_ids, since):
+    publish_notifications(saved_notifications(created, field, recipient_ids, since))
+
+
+def _deliver_chunk(job_id, chunk_size):
+    """Write the next chunk of a job's notifications, or mark it sent. Returns the job."""
+    with transaction.atomic():
+        job = BroadcastJob.objects.select_for_update().get(pk=job_id)
+        if job.status != 'queued':
+            return job  # Finished by another worker
+
+        queryset, field = _audience(job.recipient_type)
+        chunk = list(
+            queryset().filter(id__gt=job.last_recipient_id).order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        now = timezone.now()
+        if not chunk:
+            job.status = 'sent'
+            job.finished_at = now
+            job.save(update_fields=['status', 'finished_at'])
+            return job
+
+        created = Notification.objects.bulk_create([
+            Notification(recipient_type=job.recipient_type, title=job.title, message=job.message, **{field: pk})
+            for pk in chunk
+        ], batch_size=chunk_size)
+        transaction.on_commit(partial(_publish_chunk, created, field, chunk, now))
+        job.last_recipient_id = chunk[-1]
+        job.delivered += len(chunk)
+        job.next_attempt_at = now + BROADCAST_LEASE
+        job.save(update_fields=['last_recipient_id', 'delivered', 'next_attempt_at'])
+        return job
+
+
+def deliver_broadcast(job, chunk_size=None):
+    """Deliver what is left of ``job``. Returns it sent, or still queued for a retry (failed after the last one)."""
+    chunk_size = chunk_size or BROADCAST_CHUNK_SIZE
+    try:
+        while job.status == 'queued':
+            job = _deliver_chunk(job.pk, chunk_size)
+    except Exception as e:
+        logger.exception('Broadcast job %s ("%s") failed', job.pk, job.title)
+        job = BroadcastJob.objects.get(pk=job.pk)
+        job.attempts += 1
+        job.last_error = str(e)
+        if job.attempts >= BROADCAST_MAX_ATTEMPTS:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+        else:
+            job.next_attempt_at = timezone.now() + retry_delay(job.attempts)
+        job.save(update_fields=['attempts', 'last_error', 'status', 'finished_at', 'next_attempt_at'])
+    return job
+
+
+def send_broadcast(recipient_type, title, message):
+    """Broadcast to every recipient of ``recipient_type``.
+
+    Returns the BroadcastJob: ``status == 'sent'`` with ``delivered`` set
+    when it went out inline, otherwise still 'queued' for the worker.
+    """
+    if audience_size(recipient_type) > BROADCAST_BACKGROUND_THRESHOLD:
+        return queue_broadcast(recipient_type, title, message)
+    # Leased so the worker leaves it alone unless this request dies mid-way
+    job = queue_broadcast(recipient_type, title, message, deliver_after=timezone.now() + BROADCAST_LEASE)
+    return deliver_broadcast(job)
+
+
+def _claim_broadcast():
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            BroadcastJob.objects.select_for_update(skip_locked=True)
+            .filter(status='queued', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')
+            .first()
+        )
+        if job is not None:
+            job.next_attempt_at = now + BROADCAST_LEASE
+            job.save(update_fields=['next_attempt_at'])
+    return job
+
+
+def send_queued_broadcasts(max_jobs=10):
+    """Deliver up to ``max_jobs`` due broadcast jobs. Returns them."""
+    jobs = []
+    for _ in range(max_jobs):
+        job = _claim_broadcast()
+        if job is None:
+            break
+        jobs.append(deliver_broadcast(job))
+    return jobs
+
+
+def publish_notifications(notifications):
+    """publish_notification() for rows written with bulk_create (no post_save)"""
+    for notification in notifications:
+        publish_notification(notification)
+
+
+RECIPIENT_FIELDS = {
+    'owner': 'recipient_owner_id',
+    'mechanic': 'recipient_mechanic_id',
+    'garage': 'recipient_garage_id',
+}
+
+
+def recipient_filter(role):
+    """Notification filter kwargs and channel for a non-staff role, or (None, None)"""
+    for recipient_type, profile_id in (
+        ('owner', role.car_owner_id),
+        ('mechanic', role.mechanic_id),
+        ('garage', role.garage_id),
+    ):
+        if profile_id:
+            return {RECIPIENT_FIELDS[recipient_type]: profile_id}, notification_channel(recipient_type, profile_id)
+    return None, None
+
+
+def publish_notification(notification):
+    """Push a saved notification to its recipient's live stream subscribers"""
+    field = RECIPIENT_FIELDS.get(notification.recipient_type)
+    recipient_id = getattr(notification, field) if field else None
+    if notification.pk is None or recipient_id is None:
+        return
+    get_broker().publish(
+        notification_channel(notification.recipient_type, recipient_id),
+        NotificationSerializer(notification).data,
+    )
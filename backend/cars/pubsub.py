@@ -0,0 +1,114 @@
+"""
+Publish/subscribe for live notification delivery.
+
+Notification rows are published to a per-recipient channel once their
+transaction commits, and the notification stream endpoint subscribes to the
+caller's channel. The default InProcessBroker only reaches subscribers in the
+same process; the stream also re-checks the database periodically, so rows
+written by other processes still arrive, just less promptly. A shared broker
+(e.g. Redis-backed) can be plugged in with the NOTIFICATION_BROKER setting.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+def notification_channel(recipient_type, recipient_id):
+    return f'notifications:{recipient_type}:{recipient_id}'
+
+
+class Subscription:
+    """A subscriber's queue, bound to the event loop it was created on"""
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    def deliver(self, message):
+        # publish() may run on any thread (e.g. a WSGI worker or the
+        # broadcast thread), so hand the message to the subscriber's loop.
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, message)
+
+    async def get(self, timeout=None):
+        """Next message, or None if ``timeout`` seconds pass without one"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class BaseBroker:
+    def publish(self, channel, message):
+        raise NotImplementedError
+
+    def subscribe(self, channel):
+        """Return a Subscription; must be called from a running event loop"""
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+class InProcessBroker(BaseBroker):
+    """Delivers to subscribers in the current process only"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.deliver(message)
+            except RuntimeError:
+                # The subscriber's event loop has shut down
+                self.unsubscribe(subscription)
+        return len(subscriptions)
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.channel]
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscriptions.get(channel, ()))
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.NOTIFICATION_BROKER)()
+    return _broker
+
+
+def reset_broker():
+    """Forget the configured broker (used when settings change in tests)"""
+    global _broker
+    with _broker_lock:
+        _broker = None
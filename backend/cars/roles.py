@@ -0,0 +1,110 @@
+"""
+Role resolution for authenticated users.
+
+A user is a car owner, a mechanic (driver) or a garage depending on which
+profile row points at them. The profile ids and approval statuses are fetched
+in one joined query, cached per user and memoised on the request, so views
+only pay for the lookup once per cache lifetime.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+ROLE_CACHE_TIMEOUT = 60 * 15  # 15 minutes; profile writes invalidate sooner
+
+_PROFILE_FIELDS = {
+    'car_owner_id': 'car_owner_profile__id',
+    'mechanic_id': 'mechanic_profile__id',
+    'mechanic_status': 'mechanic_profile__status',
+    'garage_id': 'garage_profile__id',
+    'garage_status': 'garage_profile__status',
+}
+
+_EMPTY_PROFILE = dict.fromkeys(_PROFILE_FIELDS)
+
+
+@dataclass(frozen=True)
+class Role:
+    """Profile ids and statuses for a single user"""
+    is_staff: bool = False
+    car_owner_id: Optional[int] = None
+    mechanic_id: Optional[int] = None
+    mechanic_status: Optional[str] = None
+    garage_id: Optional[int] = None
+    garage_status: Optional[str] = None
+
+    @property
+    def user_type(self):
+        if self.is_staff:
+            return 'admin'
+        if self.garage_id:
+            return 'garage'
+        if self.mechanic_id:
+            return 'mechanic'
+        if self.car_owner_id:
+            return 'car_owner'
+        return 'unknown'
+
+    @property
+    def is_approved_mechanic(self):
+        return self.mechanic_id is not None and self.mechanic_status == 'approved'
+
+    def user_data(self, user):
+        """Payload returned by the login and current-user endpoints"""
+        data = {'id': user.id, 'email': user.email, 'first_name': user.first_name, 'last_name': user.last_name}
+        if self.car_owner_id:
+            data['car_owner_id'] = self.car_owner_id
+        if self.mechanic_id:
+            data['mechanic_id'] = self.mechanic_id
+            data['status'] = self.mechanic_status
+        if self.garage_id:
+            data['garage_id'] = self.garage_id
+            data['status'] = self.garage_status
+        return data
+
+
+def _cache_key(user_id):
+    return f'cars:role:{user_id}'
+
+
+def _load_profile(user_id):
+    row = User.objects.filter(pk=user_id).values(*_PROFILE_FIELDS.values()).first()
+    if row is None:
+        return dict(_EMPTY_PROFILE)
+    return {name: row[lookup] for name, lookup in _PROFILE_FIELDS.items()}
+
+
+def resolve_role(user):
+    """Return the Role for ``user``, using the per-user cache when possible"""
+    if not user or not user.is_authenticated:
+        return Role()
+
+    key = _cache_key(user.pk)
+    profile = cache.get(key)
+    if profile is None:
+        profile = _load_profile(user.pk)
+        cache.set(key, profile, ROLE_CACHE_TIMEOUT)
+    return Role(is_staff=user.is_staff, **profile)
+
+
+def get_role(request):
+    """Return the Role for the request's user, memoised on the request"""
+    # DRF wraps the Django request; memoise on the underlying one so function
+    # views and viewsets handling the same request share the result.
+    http_request = getattr(request, '_request', request)
+    role = getattr(http_request, '_swiftcar_role', None)
+    if role is None:
+        role = resolve_role(request.user)
+        http_request._swiftcar_role = role
+    return role
+
+
+def invalidate_role(user_id):
+    """Drop the cached role so the next request re-reads the profiles"""
+    cache.delete(_cache_key(user_id))
+
+
+def invalidate_roles(user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
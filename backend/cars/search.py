@@ -0,0 +1,114 @@
+"""
+Full-text product search.
+
+Products are copied into a search table (name, description, category name)
+that the database can match against an index: an FTS5 virtual table on
+SQLite, an InnoDB table with a FULLTEXT index on MySQL. The table is created
+by migration 0008 and refreshed from the Product/ProductCategory signals;
+``python manage.py rebuild_product_search`` rebuilds it from scratch.
+
+Every search term is matched as a prefix ("bra" finds "brake pads") and all
+terms must match. Results are ranked by relevance, with name matches
+weighted above category and description matches on SQLite. The index holds
+every product, so the ranked query is restricted to the caller's queryset
+(active products, category, ...) before its MAX_SEARCH_RESULTS limit.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, When
+from .models import Product, ProductCategory
+
+SEARCH_TABLE = 'cars_product_search'
+MAX_SEARCH_TERMS = 8
+MAX_SEARCH_RESULTS = 500
+
+# bm25() column weights for (name, description, category)
+SQLITE_COLUMN_WEIGHTS = (10.0, 1.0, 4.0)
+
+
+def is_supported(vendor=None):
+    return (vendor or connection.vendor) in ('sqlite', 'mysql')
+
+
+def _key_column():
+    return 'rowid' if connection.vendor == 'sqlite' else 'product_id'
+
+
+def _copy_products_sql(where):
+    return (
+        f"INSERT INTO {SEARCH_TABLE} ({_key_column()}, name, description, category) "
+        f"SELECT p.id, p.name, p.description, COALESCE(c.name, '') "
+        f"FROM {Product._meta.db_table} p "
+        f"LEFT JOIN {ProductCategory._meta.db_table} c ON c.id = p.category_id"
+        f"{where}"
+    )
+
+
+def refresh_products(product_ids):
+    """Re-index the given products (deleted ones are dropped from the index)"""
+    product_ids = [int(pk) for pk in product_ids]
+    if not product_ids or not is_supported():
+        return
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE {_key_column()} IN ({placeholders})', product_ids)
+        cursor.execute(_copy_products_sql(f' WHERE p.id IN ({placeholders})'), product_ids)
+
+
+def rebuild_index():
+    """Re-index the whole catalog. Returns the number of products indexed."""
+    if not is_supported():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute(_copy_products_sql(''))
+        return cursor.rowcount
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query.lower())[:MAX_SEARCH_TERMS]
+
+
+def _ranked_ids(terms, queryset):
+    candidates, candidate_params = queryset.order_by().values('pk').query.sql_with_params()
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(weight) for weight in SQLITE_COLUMN_WEIGHTS)
+        sql = (
+            f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s AND rowid IN ({candidates}) '
+            f'ORDER BY bm25({SEARCH_TABLE}, {weights}) LIMIT %s'
+        )
+        params = [match, *candidate_params, MAX_SEARCH_RESULTS]
+    else:
+        # Note: MySQL ignores terms shorter than innodb_ft_min_token_size (3)
+        match = ' '.join(f'+{term}*' for term in terms)
+        sql = (
+            f'SELECT product_id FROM {SEARCH_TABLE} '
+            f'WHERE MATCH(name, description, category) AGAINST (%s IN BOOLEAN MODE) AND product_id IN ({candidates}) '
+            f'ORDER BY MATCH(name, description, category) AGAINST (%s IN BOOLEAN MODE) DESC LIMIT %s'
+        )
+        params = [match, *candidate_params, match, MAX_SEARCH_RESULTS]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_products(queryset, query):
+    """Filter ``queryset`` to products matching ``query``, best match first"""
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+
+    if not is_supported():
+        for term in terms:
+            queryset = queryset.filter(
+                Q(name__icontains=term) | Q(description__icontains=term) | Q(category__name__icontains=term)
+            )
+        return queryset
+
+    ids = _ranked_ids(terms, queryset)
+    if not ids:
+        return queryset.none()
+    rank = Case(*[When(pk=pk, then=position) for position, pk in enumerate(ids)], output_field=IntegerField())
+    return queryset.filter(pk__in=ids).annotate(search_rank=rank).order_by('search_rank')
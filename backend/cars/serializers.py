@@ -1,11 +1,43 @@
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from django.contrib.auth.models import User
 from .models import (
-    CarOwner, Car, Mechanic, Garage, GarageImage, 
-    ServiceRequest, ServiceRecord, ServiceItem, ServiceWorkItem, Notification,
+    CarOwner, Car, CarServiceSummary, Mechanic, Garage, GarageImage, 
+    ServiceRequest, ServiceRequestEvent, ServiceRecord, ServiceItem, ServiceWorkItem, Notification,
     ProductCategory, Product, Order, OrderItem
 )
 
+def query_param_set(request, name):
+    """Comma-separated query param as a set, e.g. ``?expand=car_details,work_items``"""
+    if request is None:
+        return set()
+    value = request.query_params.get(name, '')
+    return {part.strip() for part in value.split(',') if part.strip()}
+
+
+class FieldSelectionMixin:
+    """Lets read clients pick fields with ``?fields=`` and add nested ones with ``?expand=``.
+
+    ``expandable_fields`` maps a field name to a callable returning the
+    serializer field to add. Only the top-level serializer reads the query
+    params; nested serializers are left untouched. Writes ignore them, so a
+    POST or PATCH always validates every field and returns the full object.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+        for name in query_param_set(request, 'expand') & set(self.expandable_fields):
+            self.fields[name] = self.expandable_fields[name]()
+        selected = query_param_set(request, 'fields')
+        if selected:
+            for name in set(self.fields) - selected:
+                self.fields.pop(name)
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -176,9 +208,39 @@ class MechanicRegistrationSerializer(serializers.ModelSerializer):
         return mechanic
 
 class GarageImageSerializer(serializers.ModelSerializer):
+    """``image`` is the thumbnail; ``medium`` and ``original`` are there for full-size views"""
+    image = serializers.SerializerMethodField()
+    width = serializers.SerializerMethodField()
+    height = serializers.SerializerMethodField()
+    medium = serializers.ImageField(read_only=True)
+    original = serializers.ImageField(source='image', read_only=True)
+    original_width = serializers.IntegerField(source='width', read_only=True)
+    original_height = serializers.IntegerField(source='height', read_only=True)
+
     class Meta:
         model = GarageImage
-        fields = '__all__'
+        fields = ['id', 'garage', 'image', 'width', 'height', 'medium', 'medium_width', 'medium_height',
+                  'original', 'original_width', 'original_height', 'uploaded_at']
+        read_only_fields = fields
+
+    def _small(self, obj):
+        # Photos uploaded before variants existed only have the original
+        return (obj.thumbnail, obj.thumbnail_width, obj.thumbnail_height) if obj.thumbnail else (
+            obj.image, obj.width, obj.height
+        )
+
+    def get_image(self, obj):
+        file = self._small(obj)[0]
+        if not file:
+            return None
+        request = self.context.get('request')
+        return request.build_absolute_uri(file.url) if request is not None else file.url
+
+    def get_width(self, obj):
+        return self._small(obj)[1]
+
+    def get_height(self, obj):
+        return self._small(obj)[2]
 
 class GarageSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
@@ -186,7 +248,7 @@ class GarageSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Garage
-        fields = ['id', 'user', 'name', 'owner_name', 'address', 'location',
+        fields = ['id', 'user', 'name', 'owner_name', 'address', 'location', 'latitude', 'longitude',
                   'status', 'images', 'created_at', 'updated_at']
         read_only_fields = ('status', 'created_at', 'updated_at')
 
@@ -199,11 +261,13 @@ class GarageRegistrationSerializer(serializers.ModelSerializer):
     owner_email = serializers.EmailField(required=False)
     address = serializers.CharField()
     location = serializers.CharField()
+    latitude = serializers.FloatField(required=False, min_value=-90, max_value=90)
+    longitude = serializers.FloatField(required=False, min_value=-180, max_value=180)
 
     class Meta:
         model = Garage
         fields = ['email', 'password', 'name', 'owner_name', 'owner_phone', 
-                 'owner_email', 'address', 'location']
+                 'owner_email', 'address', 'location', 'latitude', 'longitude']
 
     def validate_email(self, value):
         """Check if email already exists"""
@@ -232,7 +296,9 @@ class GarageRegistrationSerializer(serializers.ModelSerializer):
             owner_phone=validated_data['owner_phone'],
             owner_email=email,
             address=validated_data['address'],
-            location=validated_data['location']
+            location=validated_data['location'],
+            latitude=validated_data.get('latitude'),
+            longitude=validated_data.get('longitude')
         )
         
         return garage
@@ -244,7 +310,7 @@ class ServiceWorkItemSerializer(serializers.ModelSerializer):
         read_only_fields = ('created_at',)
 
 
-class ServiceRequestSerializer(serializers.ModelSerializer):
+class ServiceRequestSerializer(FieldSelectionMixin, serializers.ModelSerializer):
     car_details = CarSerializer(source='car', read_only=True)
     owner_details = CarOwnerSerializer(source='owner', read_only=True)
     mechanic_details = MechanicSerializer(source='assigned_mechanic', read_only=True)
@@ -254,14 +320,59 @@ class ServiceRequestSerializer(serializers.ModelSerializer):
     class Meta:
         model = ServiceRequest
         fields = '__all__'
-        read_only_fields = ('owner', 'assigned_mechanic', 'garage_cost', 'total_cost', 'created_at', 'updated_at')
+        # status and assignments only change through the lifecycle actions
+        read_only_fields = ('owner', 'status', 'assigned_mechanic', 'assigned_garage', 'garage_cost', 'total_cost',
+                            'created_at', 'updated_at')
+
+class ServiceRequestListSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    """Compact row for list responses; ``?expand=`` adds the nested details"""
+    car_label = serializers.SerializerMethodField()
+    car_registration = serializers.CharField(source='car.registration_number', read_only=True)
+    owner_name = serializers.CharField(source='owner.user.get_full_name', read_only=True)
+    mechanic_name = serializers.SerializerMethodField()
+    garage_name = serializers.CharField(source='assigned_garage.name', read_only=True, default=None)
+
+    expandable_fields = {
+        'car_details': lambda: CarSerializer(source='car', read_only=True),
+        'owner_details': lambda: CarOwnerSerializer(source='owner', read_only=True),
+        'mechanic_details': lambda: MechanicSerializer(source='assigned_mechanic', read_only=True),
+        'garage_details': lambda: GarageSerializer(source='assigned_garage', read_only=True),
+        'work_items': lambda: ServiceWorkItemSerializer(many=True, read_only=True),
+    }
+
+    class Meta:
+        model = ServiceRequest
+        fields = ['id', 'status', 'service_type', 'pickup_location', 'pickup_latitude', 'pickup_longitude',
+                  'preferred_date', 'preferred_time',
+                  'car', 'car_label', 'car_registration', 'owner', 'owner_name',
+                  'assigned_mechanic', 'mechanic_name', 'assigned_garage', 'garage_name',
+                  'garage_cost', 'total_cost', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+    def get_car_label(self, obj):
+        return f"{obj.car.year} {obj.car.make} {obj.car.model}"
+
+    def get_mechanic_name(self, obj):
+        return obj.assigned_mechanic.user.get_full_name() if obj.assigned_mechanic_id else None
+
+class ServiceRequestEventSerializer(serializers.ModelSerializer):
+    actor_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ServiceRequestEvent
+        fields = ['id', 'transition', 'from_status', 'to_status', 'actor', 'actor_name',
+                  'seconds_in_from_status', 'created_at']
+        read_only_fields = fields
+
+    def get_actor_name(self, obj):
+        return (obj.actor.get_full_name() or obj.actor.username) if obj.actor_id else None
 
 class ServiceItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = ServiceItem
         fields = '__all__'
 
-class ServiceRecordSerializer(serializers.ModelSerializer):
+class ServiceRecordSerializer(FieldSelectionMixin, serializers.ModelSerializer):
     items = ServiceItemSerializer(many=True, read_only=True)
     car_details = CarSerializer(source='car', read_only=True)
     mechanic_pickup_details = MechanicSerializer(source='mechanic_pickup', read_only=True)
@@ -273,6 +384,53 @@ class ServiceRecordSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ('created_at', 'updated_at')
 
+class ServiceRecordListSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    """Compact row for list responses; ``?expand=`` adds the nested details"""
+    car_label = serializers.SerializerMethodField()
+    car_registration = serializers.CharField(source='car.registration_number', read_only=True)
+    mechanic_pickup_name = serializers.SerializerMethodField()
+    mechanic_return_name = serializers.SerializerMethodField()
+    garage_name = serializers.CharField(source='garage.name', read_only=True, default=None)
+
+    expandable_fields = {
+        'car_details': lambda: CarSerializer(source='car', read_only=True),
+        'mechanic_pickup_details': lambda: MechanicSerializer(source='mechanic_pickup', read_only=True),
+        'mechanic_return_details': lambda: MechanicSerializer(source='mechanic_return', read_only=True),
+        'garage_details': lambda: GarageSerializer(source='garage', read_only=True),
+        'items': lambda: ServiceItemSerializer(many=True, read_only=True),
+    }
+
+    class Meta:
+        model = ServiceRecord
+        fields = ['id', 'service_request', 'car', 'car_label', 'car_registration',
+                  'mechanic_pickup', 'mechanic_pickup_name', 'mechanic_return', 'mechanic_return_name',
+                  'garage', 'garage_name', 'date_taken', 'date_completed', 'date_returned',
+                  'total_cost', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+    def get_car_label(self, obj):
+        return f"{obj.car.year} {obj.car.make} {obj.car.model}"
+
+    def get_mechanic_pickup_name(self, obj):
+        return obj.mechanic_pickup.user.get_full_name() if obj.mechanic_pickup_id else None
+
+    def get_mechanic_return_name(self, obj):
+        return obj.mechanic_return.user.get_full_name() if obj.mechanic_return_id else None
+
+class CarHistoryRecordSerializer(ServiceRecordListSerializer):
+    """A record in a car's service history, with its items"""
+    items = ServiceItemSerializer(many=True, read_only=True)
+
+    class Meta(ServiceRecordListSerializer.Meta):
+        fields = ServiceRecordListSerializer.Meta.fields + ['notes', 'items']
+        read_only_fields = fields
+
+class CarServiceSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CarServiceSummary
+        fields = ['visit_count', 'lifetime_cost', 'last_service_date']
+        read_only_fields = fields
+
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
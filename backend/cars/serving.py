@@ -0,0 +1,156 @@
+"""
+Serving MEDIA_ROOT files from Django.
+
+On the shared hosting deployment (passenger_wsgi.py) nothing in front of
+Django serves /media/, so serve_media() does it with the usual static file
+server behaviour:
+
+* ``ETag`` and ``Last-Modified``, answering ``If-None-Match`` /
+  ``If-Modified-Since`` with 304 (and ``If-Match`` / ``If-Unmodified-Since``
+  with 412);
+* single ``Range`` requests (206, or 416 when unsatisfiable), honouring
+  ``If-Range``;
+* whole files as a FileResponse, which the WSGI server may send with
+  ``wsgi.file_wrapper`` (sendfile) instead of reading them into Python;
+* ``Cache-Control: immutable`` with a one-year max-age for content-addressed
+  blobs (see cars.storage), whose name changes whenever their content does;
+  other files are cached for MEDIA_CACHE_MAX_AGE and then revalidated.
+"""
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from .storage import BLOB_DIR, is_blob_name
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+RANGE_CHUNK_SIZE = 64 * 1024
+
+BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOB_DIGEST = re.compile(rf'^{BLOB_DIR}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/([0-9a-f]{{64}})(\.\w+)?$')
+
+# Not known to every Python's mimetypes
+mimetypes.add_type('image/webp', '.webp')
+
+
+def _etag(path, stat_result):
+    match = BLOB_DIGEST.match(path)
+    if match:
+        return f'"{match.group(1)}"'
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single byte range, None to send the whole file, or 'unsatisfiable'"""
+    match = BYTE_RANGE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None  # Malformed or multiple ranges: ignored, as RFC 9110 allows
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start > end:
+            return 'unsatisfiable' if start >= size else None
+    else:
+        suffix = int(last)
+        if suffix == 0:
+            return 'unsatisfiable'
+        start, end = max(size - suffix, 0), size - 1
+    if size == 0:
+        return 'unsatisfiable'
+    return start, end
+
+
+def _range_is_current(request, etag, last_modified):
+    """False when If-Range names an older version of the file"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(RANGE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve_media(request, path):
+    # No dotfiles or directories (this covers the blob storage's .tmp)
+    if any(part.startswith('.') for part in path.split('/')):
+        raise Http404
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat_result = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404
+
+    size = stat_result.st_size
+    last_modified = int(stat_result.st_mtime)
+    etag = _etag(path, stat_result)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': (f'public, max-age={IMMUTABLE_MAX_AGE}, immutable' if is_blob_name(path)
+                          else f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'),
+    }
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified.headers.setdefault(header, value)
+        return not_modified
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    if encoding:
+        # A .gz must not be transparently decompressed by the client
+        content_type = 'application/octet-stream'
+
+    byte_range = None
+    if 'HTTP_RANGE' in request.META and _range_is_current(request, etag, last_modified):
+        byte_range = parse_range(request.META['HTTP_RANGE'], size)
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416, headers=headers)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type, headers=headers)
+        if byte_range:
+            start, end = byte_range
+            response.status_code = 206
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1 if byte_range else size
+        return response
+
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_range(full_path, start, end - start + 1), status=206, content_type=content_type, headers=headers
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+        return response
+
+    response = FileResponse(open(full_path, 'rb'), content_type=content_type, headers=headers)
+    response['Content-Length'] = size
+    return response
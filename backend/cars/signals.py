@@ -0,0 +1,96 @@
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+from .caching import bump_catalog_version
+from .media import MEDIA_FIELDS, adjust_references, media_names, stored_media_names
+from .models import (
+    CarOwner, CarServiceSummary, Mechanic, Garage, Notification, Product, ProductCategory, ServiceRecord
+)
+from .notifications import publish_notification
+from .pubsub import reset_broker
+from .roles import invalidate_role
+from .search import refresh_products
+
+
+@receiver(post_save, sender=CarOwner)
+@receiver(post_save, sender=Mechanic)
+@receiver(post_save, sender=Garage)
+@receiver(post_delete, sender=CarOwner)
+@receiver(post_delete, sender=Mechanic)
+@receiver(post_delete, sender=Garage)
+def invalidate_profile_role(sender, instance, **kwargs):
+    """A profile was created, approved or removed - re-resolve the user's role"""
+    invalidate_role(instance.user_id)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductCategory)
+def invalidate_catalog_cache(sender, instance, **kwargs):
+    """Cached catalog responses are stale once a product or category changes"""
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def refresh_product_search(sender, instance, **kwargs):
+    product_id = instance.pk
+    transaction.on_commit(lambda: refresh_products([product_id]))
+
+
+@receiver(post_save, sender=ProductCategory)
+@receiver(pre_delete, sender=ProductCategory)
+def refresh_category_product_search(sender, instance, **kwargs):
+    """Products are indexed with their category name"""
+    product_ids = list(instance.products.values_list('id', flat=True))
+    if product_ids:
+        transaction.on_commit(lambda: refresh_products(product_ids))
+
+
+@receiver(post_save, sender=ServiceRecord)
+@receiver(post_delete, sender=ServiceRecord)
+def refresh_car_service_summary(sender, instance, **kwargs):
+    """Keep the car's history totals in step with its records"""
+    # After commit: a record deleted along with its car must not re-create the summary
+    car_id = instance.car_id
+    transaction.on_commit(lambda: CarServiceSummary.refresh([car_id]))
+
+
+@receiver(post_save, sender=Notification)
+def publish_new_notification(sender, instance, created, **kwargs):
+    """Push new notifications to live streams once they are committed"""
+    if created:
+        transaction.on_commit(lambda: publish_notification(instance))
+
+
+def _saves_media(sender, update_fields):
+    return update_fields is None or not set(update_fields).isdisjoint(MEDIA_FIELDS[sender])
+
+
+def remember_stored_media(sender, instance, update_fields=None, **kwargs):
+    if _saves_media(sender, update_fields):
+        instance._stored_media = stored_media_names(instance)
+
+
+def count_media_references(sender, instance, update_fields=None, **kwargs):
+    """Move the blob references from the files the row had to the ones it has now"""
+    if _saves_media(sender, update_fields):
+        adjust_references(added=media_names(instance), removed=instance.__dict__.pop('_stored_media', []))
+
+
+def release_media_references(sender, instance, **kwargs):
+    adjust_references(removed=media_names(instance))
+
+
+for media_model in MEDIA_FIELDS:
+    pre_save.connect(remember_stored_media, sender=media_model)
+    post_save.connect(count_media_references, sender=media_model)
+    post_delete.connect(release_media_references, sender=media_model)
+
+
+@receiver(setting_changed)
+def reset_notification_broker(setting, **kwargs):
+    if setting == 'NOTIFICATION_BROKER':
+        reset_broker()
@@ -0,0 +1,95 @@
+"""
+Content-addressed media storage.
+
+Uploaded images are stored once per distinct content: a file is hashed
+(SHA-256) while it is copied to a temporary file next to the blob
+directory, then renamed to ``blobs/<ab>/<cd>/<digest><ext>``. If that blob
+already exists the copy is dropped, so a garage re-uploading the same photo
+set takes no extra space. The rename makes every write atomic, and since a
+blob's name changes whenever its content does, it can be served with
+immutable cache headers.
+
+Each blob has a MediaBlob row counting the model fields that reference it
+(kept up to date by cars.media). Blobs are never deleted here:
+``python manage.py gc_media_blobs`` removes the ones nothing references.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage, storages
+
+BLOB_DIR = 'blobs'
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def blob_storage():
+    """Storage for the media fields (a callable, so tests can swap the STORAGES entry)"""
+    return storages['media_blobs']
+
+
+def is_blob_name(name):
+    return bool(name) and name.startswith(f'{BLOB_DIR}/')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # The stored name comes from the content, not from the upload
+        return name
+
+    def _blob_name(self, digest, name):
+        extension = os.path.splitext(name)[1].lower()
+        return f'{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+    def _temp_dir(self):
+        path = self.path(f'{BLOB_DIR}/.tmp')
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _save(self, name, content):
+        from .media import register_blob
+
+        digest = hashlib.sha256()
+        if hasattr(content, 'temporary_file_path'):
+            # Already spooled to disk (see cars.uploads): hash it where it is
+            source = content.temporary_file_path()
+            with open(source, 'rb') as spooled:
+                for chunk in iter(lambda: spooled.read(HASH_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+            size = os.path.getsize(source)
+            temporary = None
+        else:
+            content.seek(0)
+            size = 0
+            with tempfile.NamedTemporaryFile(dir=self._temp_dir(), delete=False) as copy:
+                for chunk in content.chunks(HASH_CHUNK_SIZE):
+                    digest.update(chunk)
+                    copy.write(chunk)
+                    size += len(chunk)
+            source = temporary = copy.name
+
+        blob_name = self._blob_name(digest.hexdigest(), name)
+        # Register first: a blob touched just now is never garbage collected
+        register_blob(blob_name, size)
+        full_path = self.path(blob_name)
+        if os.path.exists(full_path):
+            if temporary:
+                os.unlink(temporary)
+            return blob_name
+
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        if temporary:
+            os.replace(temporary, full_path)
+        else:
+            # A rename when the spool directory is on the same filesystem
+            file_move_safe(source, full_path, allow_overwrite=True)
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return blob_name
+
+    def delete(self, name):
+        """Blobs may be shared, so they are only removed by garbage collection"""
+
+    def delete_blob(self, name):
+        super().delete(name)
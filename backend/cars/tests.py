@@ -1,3 +1,1487 @@
-from django.test import TestCase
+import asyncio
+import base64
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date, time, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from PIL import Image
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.throttling import AnonRateThrottle
+
+from .admin import GarageAdmin, MechanicAdmin
+from .dispatch import dispatch_pending, plan_assignments
+from .mail import queue_mail, send_queued_mail
+from .models import (
+    CarOwner, Car, CarServiceSummary, Mechanic, Garage, GarageImage, MediaBlob, ServiceRequest, ServiceRequestEvent, ServiceRecord, ServiceWorkItem,
+    Notification, ProductCategory, Product, Order, OutboundEmail, ServiceInquiry, BroadcastJob
+)
+from .pagination import CreatedAtKeysetPagination
+from .roles import resolve_role
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    ALLOWED_HOSTS=['testserver'],
+)
+class OutboundEmailQueueTests(TestCase):
+    def test_inquiry_only_enqueues(self):
+        response = APIClient().post('/api/service-inquiry/', {
+            'service_type': 'fleet_management',
+            'companyName': 'Acme',
+            'contactPerson': 'Jo',
+            'email': 'jo@example.com',
+            'phone': '0700000000',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboundEmail.objects.filter(status='pending').count(), 2)
+
+    def test_worker_drains_outbox(self):
+        queue_mail('Hello', 'Body', None, ['a@example.com'])
+        queue_mail('Hello again', 'Body', None, ['b@example.com'])
+
+        self.assertEqual(send_queued_mail(), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertFalse(OutboundEmail.objects.exclude(status='sent').exists())
+        self.assertEqual(send_queued_mail(), (0, 0))
+
+    def test_failed_send_backs_off_then_gives_up(self):
+        email = queue_mail('Hello', 'Body', None, ['a@example.com'])
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            self.assertEqual(send_queued_mail(max_attempts=2), (0, 1))
+            email.refresh_from_db()
+            self.assertEqual(email.status, 'pending')
+            self.assertGreater(email.next_attempt_at, timezone.now())
+
+            OutboundEmail.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+            self.assertEqual(send_queued_mail(max_attempts=2), (0, 1))
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'failed')
+        self.assertEqual(email.attempts, 2)
+        self.assertEqual(email.last_error, 'down')
+
+
+def make_service_request(status='pending', **kwargs):
+    owner_user = User.objects.create_user('owner@example.com', 'owner@example.com', 'pw')
+    owner = CarOwner.objects.create(user=owner_user, phone_number='0700000000', address='Nairobi')
+    car = Car.objects.create(owner=owner, make='Toyota', model='Axio', year=2015,
+                             registration_number='KDA 001A', color='White')
+    fields = dict(pickup_location='Westlands', preferred_date=date(2026, 1, 10), preferred_time=time(9, 0),
+                  service_type='general_service')
+    fields.update(kwargs)
+    return ServiceRequest.objects.create(car=car, owner=owner, status=status, **fields)
+
+
+def make_garage(email='garage@example.com', **kwargs):
+    user = User.objects.create_user(email, email, 'pw')
+    return Garage.objects.create(user=user, name='Garage', owner_name='Gary Garage', owner_phone='0711000000',
+                                 owner_email=email, address='Industrial Area', location='Nairobi',
+                                 status='approved', **kwargs)
+
+
+def make_mechanic(email='driver@example.com', status='approved'):
+    user = User.objects.create_user(email, email, 'pw')
+    return Mechanic.objects.create(user=user, phone_number='0722000000', address='Nairobi',
+                                   id_number=email, status=status)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class WorkItemCostLedgerTests(TestCase):
+    def setUp(self):
+        self.garage = make_garage()
+        self.service_request = make_service_request(status='in_service', assigned_garage=self.garage)
+        self.client = APIClient()
+        self.client.force_authenticate(self.garage.user)
+        self.url = f'/api/service-requests/{self.service_request.pk}/'
+
+    def assertCosts(self, garage_cost, total_cost):
+        self.service_request.refresh_from_db()
+        self.assertEqual(self.service_request.garage_cost, Decimal(garage_cost))
+        self.assertEqual(self.service_request.total_cost, Decimal(total_cost))
+
+    def test_add_and_remove_update_costs_incrementally(self):
+        response = self.client.post(self.url + 'add_work_item/', {'description': 'Oil', 'cost': '1000'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.client.post(self.url + 'add_work_item/', {'description': 'Filter', 'cost': '500.40'}, format='json')
+        self.assertCosts('1500.40', '2275.42')
+
+        work_item_id = response.data['work_item']['id']
+        response = self.client.delete(self.url + 'remove_work_item/', {'work_item_id': work_item_id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertCosts('500.40', '1225.42')
+
+    def test_batch_add_and_remove(self):
+        first = self.client.post(self.url + 'add_work_item/', {'description': 'Oil', 'cost': '1000'}, format='json')
+        response = self.client.post(self.url + 'work_items/', {
+            'add': [{'description': 'Brake pads', 'cost': '4000'}, {'description': 'Labour', 'cost': '2000'}],
+            'remove': [first.data['work_item']['id']],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.service_request.work_items.count(), 2)
+        self.assertCosts('6000.00', '7000.00')
+
+    def test_batch_rejects_unknown_work_item(self):
+        response = self.client.post(self.url + 'work_items/', {
+            'add': [{'description': 'Brake pads', 'cost': '4000'}],
+            'remove': [999999],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(self.service_request.work_items.exists())
+        self.assertCosts('0.00', '0.00')
+
+    def test_complete_service_sets_customer_total(self):
+        self.client.post(self.url + 'add_work_item/', {'description': 'Oil', 'cost': '2000'}, format='json')
+        response = self.client.post(self.url + 'complete_service/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_cost'], '2800.00')
+        self.assertEqual(self.client.post(self.url + 'complete_service/').status_code, 400)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class AcceptJobTests(TransactionTestCase):
+    def test_concurrent_accepts_assign_exactly_one_driver(self):
+        service_request = make_service_request()
+        drivers = [make_mechanic(f'driver{i}@example.com') for i in range(8)]
+        url = f'/api/service-requests/{service_request.pk}/accept_job/'
+        barrier = threading.Barrier(len(drivers))
+        results = {}
+
+        def accept(mechanic):
+            client = APIClient()
+            client.force_authenticate(mechanic.user)
+            barrier.wait()
+            try:
+                results[mechanic.pk] = client.post(url).status_code
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=accept, args=(driver,)) for driver in drivers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        winners = [pk for pk, code in results.items() if code == 200]
+        self.assertEqual(len(winners), 1)
+        self.assertEqual(sorted(results.values()), [200] + [400] * (len(drivers) - 1))
+        service_request.refresh_from_db()
+        self.assertEqual(service_request.status, 'assigned')
+        self.assertEqual(service_request.assigned_mechanic_id, winners[0])
+        self.assertEqual(Notification.objects.filter(recipient_owner=service_request.owner).count(), 1)
+
+    def test_unapproved_driver_cannot_accept(self):
+        service_request = make_service_request()
+        client = APIClient()
+        client.force_authenticate(make_mechanic(status='pending').user)
+
+        response = client.post(f'/api/service-requests/{service_request.pk}/accept_job/')
+
+        self.assertEqual(response.status_code, 403)
+        service_request.refresh_from_db()
+        self.assertEqual(service_request.status, 'pending')
+
+
+def make_owner(email='owner2@example.com'):
+    user = User.objects.create_user(email, email, 'pw')
+    return CarOwner.objects.create(user=user, phone_number='0700000001', address='Nairobi')
+
+
+def sse_data(chunk):
+    return json.loads(chunk.split('data: ', 1)[1])
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class NotificationStreamTests(TransactionTestCase):
+    def setUp(self):
+        self.owner = make_owner()
+        self.first = Notification.objects.create(recipient_type='owner', recipient_owner=self.owner,
+                                                 title='First', message='Hello')
+
+    def test_long_poll_returns_backlog_under_wsgi(self):
+        self.client.force_login(self.owner.user)
+
+        response = self.client.get('/api/notifications/stream/', {'after': 0})
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = response.content.decode()
+        self.assertIn(f'id: {self.first.pk}\n', body)
+        self.assertEqual(sse_data(body)['title'], 'First')
+
+    def test_wsgi_poll_does_not_hold_the_worker(self):
+        self.client.force_login(self.owner.user)
+
+        started = timezone.now()
+        response = self.client.get('/api/notifications/stream/', {'after': self.first.pk})
+
+        self.assertLess(timezone.now() - started, timedelta(seconds=2))
+        self.assertEqual(response['Retry-After'], '3')
+        self.assertNotIn('id: ', response.content.decode())
+
+    async def test_stream_pushes_published_notifications(self):
+        await sync_to_async(self.async_client.force_login)(self.owner.user)
+        response = await self.async_client.get('/api/notifications/stream/', headers={'Last-Event-ID': '0'})
+        events = response.streaming_content.__aiter__()
+
+        async def next_event():
+            while True:
+                chunk = (await asyncio.wait_for(events.__anext__(), 5)).decode()
+                if chunk.startswith('id: '):
+                    return sse_data(chunk)
+
+        try:
+            self.assertEqual((await next_event())['id'], self.first.pk)
+
+            # Created outside any transaction, so the post_save hook publishes it immediately
+            await sync_to_async(Notification.objects.create)(
+                recipient_type='owner', recipient_owner=self.owner, title='Second', message='Again'
+            )
+            self.assertEqual((await next_event())['title'], 'Second')
+        finally:
+            await events.aclose()
+
+    def test_requires_authentication(self):
+        response = self.client.get('/api/notifications/stream/')
+
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class NotificationReadStateTests(TestCase):
+    def setUp(self):
+        self.owner = make_owner()
+        self.other = make_owner('other@example.com')
+        self.notifications = Notification.objects.bulk_create([
+            Notification(recipient_type='owner', recipient_owner=self.owner, title=f'N{i}', message='m')
+            for i in range(5)
+        ] + [Notification(recipient_type='owner', recipient_owner=self.other, title='Other', message='m')])
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner.user)
+
+    def test_unread_count_and_mark_all_read(self):
+        self.assertEqual(self.client.get('/api/notifications/unread_count/').data['unread_count'], 5)
+
+        response = self.client.post('/api/notifications/mark_all_read/')
+
+        self.assertEqual(response.data['updated'], 5)
+        self.assertEqual(self.client.get('/api/notifications/unread_count/').data['unread_count'], 0)
+        self.assertFalse(Notification.objects.get(recipient_owner=self.other).is_read)
+
+    def test_mark_read_bulk_only_touches_own_notifications(self):
+        own = Notification.objects.filter(recipient_owner=self.owner).values_list('id', flat=True)[:2]
+        foreign = Notification.objects.get(recipient_owner=self.other)
+
+        response = self.client.post('/api/notifications/mark_read_bulk/',
+                                    {'ids': list(own) + [foreign.pk]}, format='json')
+
+        self.assertEqual(response.data['updated'], 2)
+        foreign.refresh_from_db()
+        self.assertFalse(foreign.is_read)
+
+    def test_mark_read_rejects_foreign_notification(self):
+        foreign = Notification.objects.get(recipient_owner=self.other)
+
+        self.assertEqual(self.client.post(f'/api/notifications/{foreign.pk}/mark_read/').status_code, 404)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class CreateOrderTests(TestCase):
+    def setUp(self):
+        self.owner = make_owner()
+        self.oil = Product.objects.create(name='Oil', slug='oil', description='5W-30', price=Decimal('40'), stock=5)
+        self.filter = Product.objects.create(name='Filter', slug='filter', description='Oil filter',
+                                             price=Decimal('20'), sale_price=Decimal('15'), stock=1)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner.user)
+
+    def order(self, items):
+        return self.client.post('/api/orders/create_order/', {
+            'items': items, 'shipping_address': 'Nairobi', 'phone_number': '0700000000',
+        }, format='json')
+
+    def test_creates_order_and_decrements_stock(self):
+        response = self.order([{'product_id': self.oil.pk, 'quantity': 2}, {'product_id': self.filter.pk}])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Decimal(response.data['subtotal']), Decimal('95'))
+        self.assertEqual(len(response.data['items']), 2)
+        self.oil.refresh_from_db()
+        self.filter.refresh_from_db()
+        self.assertEqual((self.oil.stock, self.filter.stock), (3, 0))
+
+    def test_oversell_rolls_back_everything(self):
+        response = self.order([{'product_id': self.oil.pk, 'quantity': 2}, {'product_id': self.filter.pk, 'quantity': 2}])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Filter', response.data['error'])
+        self.assertFalse(Order.objects.exists())
+        self.oil.refresh_from_db()
+        self.assertEqual(self.oil.stock, 5)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ServiceRequestListSerializerTests(TestCase):
+    def setUp(self):
+        self.garage = make_garage()
+        self.service_request = make_service_request(status='in_service', assigned_garage=self.garage)
+        self.client = APIClient()
+        self.client.force_authenticate(self.service_request.owner.user)
+
+    def test_list_returns_compact_rows(self):
+        response = self.client.get('/api/service-requests/')
+
+        row = response.data['results'][0]
+        self.assertEqual(row['car_label'], '2015 Toyota Axio')
+        self.assertEqual(row['garage_name'], 'Garage')
+        self.assertNotIn('garage_details', row)
+        self.assertNotIn('work_items', row)
+
+    def test_expand_and_fields(self):
+        response = self.client.get('/api/service-requests/?expand=garage_details,work_items&fields=id,garage_details,work_items')
+
+        row = response.data['results'][0]
+        self.assertEqual(set(row), {'id', 'garage_details', 'work_items'})
+        self.assertEqual(row['garage_details']['name'], 'Garage')
+
+    def test_writes_ignore_field_selection(self):
+        response = self.client.patch(f'/api/service-requests/{self.service_request.pk}/?fields=id',
+                                     {'special_instructions': 'Brakes squeal'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['special_instructions'], 'Brakes squeal')
+        self.assertIn('car_details', response.data)
+        self.service_request.refresh_from_db()
+        self.assertEqual(self.service_request.special_instructions, 'Brakes squeal')
+
+    def test_retrieve_keeps_nested_details(self):
+        response = self.client.get(f'/api/service-requests/{self.service_request.pk}/')
+
+        self.assertEqual(response.data['car_details']['make'], 'Toyota')
+        self.assertIn('work_items', response.data)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(name='Oil', slug='oil', description='5W-30', price=Decimal('40'),
+                                              stock=5, is_featured=True)
+        self.client = APIClient()
+
+    def test_featured_is_served_from_cache(self):
+        self.client.get('/api/products/featured/')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/featured/')
+        self.assertEqual(response.data[0]['name'], 'Oil')
+
+    def test_product_save_invalidates_cached_responses(self):
+        self.client.get('/api/products/')
+
+        self.product.name = 'Engine Oil'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.data['results'][0]['name'], 'Engine Oil')
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        brakes = ProductCategory.objects.create(name='Brakes', slug='brakes', description='Brake parts')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pads = Product.objects.create(name='Ceramic brake pads', slug='pads', description='Front axle set',
+                                               price=Decimal('60'), category=brakes)
+            self.disc = Product.objects.create(name='Brake disc', slug='disc', description='Vented rotor',
+                                               price=Decimal('90'), category=brakes)
+            self.oil = Product.objects.create(name='Engine oil', slug='oil', description='Helps brake-in new engines',
+                                              price=Decimal('40'))
+        self.client = APIClient()
+
+    def search(self, query):
+        response = self.client.get('/api/products/', {'q': query})
+        return [product['slug'] for product in response.data['results']]
+
+    def test_prefix_match_ranks_name_matches_first(self):
+        results = self.search('bra')
+
+        self.assertEqual(set(results[:2]), {'pads', 'disc'})
+        self.assertEqual(results[2], 'oil')
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search('brake ceram'), ['pads'])
+        self.assertEqual(self.search('brake gearbox'), [])
+
+    def test_index_follows_product_and_category_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.oil.name = 'Gear oil'
+            self.oil.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductCategory.objects.filter(slug='brakes').get().delete()
+
+        self.assertEqual(self.search('gear'), ['oil'])
+        self.assertEqual(self.search('disc brakes'), [])
+
+    def test_result_limit_applies_after_the_catalog_filters(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for number in range(3):
+                Product.objects.create(name=f'Brake pads {number}', slug=f'old-pads-{number}', description='Brake',
+                                       price=Decimal('10'), is_active=False)
+
+        with mock.patch('cars.search.MAX_SEARCH_RESULTS', 2):
+            self.assertEqual(set(self.search('brake')), {'pads', 'disc'})
+            response = self.client.get('/api/products/', {'q': 'brake', 'category': 'brakes'})
+            self.assertEqual(response.data['count'], 2)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked with SQLite EXPLAIN QUERY PLAN')
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class QueryPlanTests(TestCase):
+    """Every viewset query on the hot tables must be served from an index"""
+    HOT_TABLES = ('cars_servicerequest', 'cars_notification', 'cars_product', 'cars_order')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.garage = make_garage()
+        cls.mechanic = make_mechanic()
+        cls.service_request = make_service_request(assigned_garage=cls.garage, assigned_mechanic=cls.mechanic)
+        cls.owner = cls.service_request.owner
+        cls.staff = User.objects.create_user('staff@example.com', 'staff@example.com', 'pw', is_staff=True)
+        Notification.objects.create(recipient_type='owner', recipient_owner=cls.owner, title='Hi', message='Hi')
+        category = ProductCategory.objects.create(name='Oils', slug='oils', description='Oils')
+        Product.objects.create(name='Oil', slug='oil', description='5W-30', price=Decimal('40'), category=category,
+                               is_featured=True, sale_price=Decimal('35'))
+
+    def setUp(self):
+        cache.clear()
+
+    def full_scans(self, user, url):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+
+        scans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or not any(table in sql for table in self.HOT_TABLES):
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    if detail.startswith('SCAN ') and detail.split()[1] in self.HOT_TABLES and 'INDEX' not in detail:
+                        scans.append(f'{detail}\n    {sql}')
+        return scans
+
+    def test_viewset_queries_use_indexes(self):
+        cases = [
+            (self.owner.user, '/api/service-requests/'),
+            (self.mechanic.user, '/api/service-requests/'),
+            (self.mechanic.user, '/api/service-requests/open_jobs/'),
+            (self.mechanic.user, '/api/service-requests/my_jobs/'),
+            (self.garage.user, '/api/service-requests/'),
+            (self.staff, '/api/service-requests/'),
+            (self.owner.user, '/api/notifications/'),
+            (self.mechanic.user, '/api/notifications/'),
+            (self.garage.user, '/api/notifications/'),
+            (self.owner.user, '/api/notifications/unread_count/'),
+            (self.owner.user, '/api/orders/'),
+            (None, '/api/products/'),
+            (None, '/api/products/?category=oils'),
+            (None, '/api/products/?featured=true'),
+            (None, '/api/products/featured/'),
+            (None, '/api/products/on_sale/'),
+        ]
+        for user, url in cases:
+            with self.subTest(user=user and user.username, url=url):
+                self.assertEqual(self.full_scans(user, url), [])
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class DriverJobFeedTests(TestCase):
+    def setUp(self):
+        self.mechanic = make_mechanic()
+        self.service_request = make_service_request(pickup_location='Westlands, Nairobi')
+        car, owner = self.service_request.car, self.service_request.owner
+        self.later = ServiceRequest.objects.create(
+            car=car, owner=owner, pickup_location='Karen', preferred_date=date(2026, 2, 1),
+            preferred_time=time(9, 0), service_type='general_service',
+        )
+        self.mine = ServiceRequest.objects.create(
+            car=car, owner=owner, pickup_location='Karen', preferred_date=date(2026, 1, 5),
+            preferred_time=time(9, 0), service_type='general_service', status='assigned',
+            assigned_mechanic=self.mechanic,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.mechanic.user)
+
+    def ids(self, url, params=None):
+        response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return {row['id'] for row in response.data['results']}
+
+    def test_open_jobs_lists_pending_requests(self):
+        self.assertEqual(self.ids('/api/service-requests/open_jobs/'), {self.service_request.pk, self.later.pk})
+
+    def test_open_jobs_filters_by_date_window_and_area(self):
+        self.assertEqual(self.ids('/api/service-requests/open_jobs/', {'date_from': '2026-01-15'}), {self.later.pk})
+        self.assertEqual(self.ids('/api/service-requests/open_jobs/', {'area': 'westlands'}), {self.service_request.pk})
+        response = self.client.get('/api/service-requests/open_jobs/', {'date_to': 'soon'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_my_jobs_lists_assigned_requests(self):
+        self.assertEqual(self.ids('/api/service-requests/my_jobs/'), {self.mine.pk})
+
+    def test_open_jobs_requires_approved_driver(self):
+        self.mechanic.status = 'pending'
+        self.mechanic.save()
+
+        response = self.client.get('/api/service-requests/open_jobs/')
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class NearestMatchingTests(TestCase):
+    # Nairobi CBD, Westlands (~4 km), Karen (~13 km), Mombasa (~440 km)
+    CBD = (-1.2864, 36.8172)
+
+    def setUp(self):
+        self.westlands = make_garage('westlands@example.com', latitude=-1.2676, longitude=36.8108)
+        self.karen = make_garage('karen@example.com', latitude=-1.3197, longitude=36.7076)
+        make_garage('mombasa@example.com', latitude=-4.0435, longitude=39.6682)
+        pending = make_garage('pending@example.com', latitude=-1.2870, longitude=36.8170)
+        Garage.objects.filter(pk=pending.pk).update(status='pending')
+        self.mechanic = make_mechanic()
+        self.client = APIClient()
+        self.client.force_authenticate(self.mechanic.user)
+
+    def test_geohash_is_kept_in_sync(self):
+        self.assertTrue(self.westlands.geohash.startswith('kzf0'))
+        self.westlands.latitude, self.westlands.longitude = None, None
+        self.westlands.save(update_fields=['latitude', 'longitude'])
+        self.westlands.refresh_from_db()
+        self.assertEqual(self.westlands.geohash, '')
+
+    def test_nearest_approved_garages(self):
+        response = self.client.get('/api/garages/nearest/', {'lat': self.CBD[0], 'lng': self.CBD[1], 'k': 2})
+
+        self.assertEqual([garage['id'] for garage in response.data], [self.westlands.pk, self.karen.pk])
+        self.assertLess(response.data[0]['distance_km'], response.data[1]['distance_km'])
+
+    def test_nearest_garages_to_pickup(self):
+        service_request = make_service_request(status='assigned', assigned_mechanic=self.mechanic,
+                                               pickup_latitude=-1.3200, pickup_longitude=36.7100)
+
+        response = self.client.get('/api/garages/nearest/', {'service_request': service_request.pk, 'k': 1})
+
+        self.assertEqual(response.data[0]['id'], self.karen.pk)
+
+    def test_nearest_pending_jobs(self):
+        near = make_service_request(pickup_latitude=-1.2900, pickup_longitude=36.8200)
+        far = ServiceRequest.objects.create(
+            car=near.car, owner=near.owner, pickup_location='Karen', pickup_latitude=-1.3197,
+            pickup_longitude=36.7076, preferred_date=date(2026, 1, 10), preferred_time=time(9, 0),
+            service_type='general_service',
+        )
+        ServiceRequest.objects.create(
+            car=near.car, owner=near.owner, pickup_location='Unknown', preferred_date=date(2026, 1, 10),
+            preferred_time=time(9, 0), service_type='general_service',
+        )
+
+        response = self.client.get('/api/service-requests/nearest_jobs/', {'lat': self.CBD[0], 'lng': self.CBD[1]})
+
+        self.assertEqual([job['id'] for job in response.data], [near.pk, far.pk])
+
+    def test_missing_coordinates_rejected(self):
+        response = self.client.get('/api/garages/nearest/')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class DispatchTests(TestCase):
+    def setUp(self):
+        self.top = make_mechanic('top@example.com')
+        self.top.rating = Decimal('4.90')
+        self.top.save()
+        self.second = make_mechanic('second@example.com')
+        self.second.rating = Decimal('4.00')
+        self.second.save()
+        make_mechanic('pending@example.com', status='pending')
+        self.first = make_service_request(preferred_time=time(9, 0))
+        self.same_slot = ServiceRequest.objects.create(
+            car=self.first.car, owner=self.first.owner, pickup_location='Karen', preferred_date=date(2026, 1, 10),
+            preferred_time=time(9, 30), service_type='general_service',
+        )
+
+    def test_batch_assigns_best_free_driver_per_slot(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            assigned = dispatch_pending()
+
+        self.assertEqual(dict(assigned), {self.first.pk: self.top.pk, self.same_slot.pk: self.second.pk})
+        self.first.refresh_from_db()
+        self.assertEqual((self.first.status, self.first.assigned_mechanic_id), ('assigned', self.top.pk))
+        self.assertTrue(Notification.objects.filter(recipient_mechanic=self.second, title='New Job Assigned').exists())
+
+    def test_request_accepted_while_planning_is_not_notified_again(self):
+        real_plan = plan_assignments
+
+        def plan_then_driver_accepts(*args):
+            plan = real_plan(*args)
+            # The planned driver accepts the job themselves before the batch writes
+            ServiceRequest.objects.filter(pk=self.first.pk).transition('accept', assigned_mechanic_id=self.top.pk)
+            return plan
+
+        with mock.patch('cars.dispatch.plan_assignments', side_effect=plan_then_driver_accepts), \
+                self.captureOnCommitCallbacks(execute=True):
+            assigned = dispatch_pending()
+
+        self.assertEqual(assigned, [(self.same_slot.pk, self.second.pk)])
+        self.assertFalse(Notification.objects.filter(recipient_mechanic=self.top).exists())
+        self.assertEqual(Notification.objects.filter(recipient_owner=self.first.owner, title='Driver Assigned').count(), 1)
+
+    def test_dry_run_writes_nothing(self):
+        dispatch_pending(dry_run=True)
+
+        self.assertEqual(ServiceRequest.objects.filter(status='pending').count(), 2)
+
+    def test_custom_scorer(self):
+        def prefer_low_rating(candidate, service_request):
+            return -float(candidate.mechanic.rating)
+
+        assigned = dispatch_pending(request_ids=[self.first.pk], score=prefer_low_rating)
+
+        self.assertEqual(assigned, [(self.first.pk, self.second.pk)])
+
+    def test_max_active_jobs(self):
+        with self.settings(DISPATCH_MAX_ACTIVE_JOBS=0):
+            self.assertEqual(dispatch_pending(), [])
+
+    def test_on_create_hook(self):
+        client = APIClient()
+        client.force_authenticate(self.first.owner.user)
+        with self.settings(DISPATCH_ON_CREATE=True), self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/service-requests/', {
+                'car': self.first.car.pk, 'pickup_location': 'Kilimani', 'preferred_date': '2026-01-11',
+                'preferred_time': '10:00', 'service_type': 'general_service',
+            })
+
+        created = ServiceRequest.objects.get(pk=response.data['id'])
+        self.assertEqual((created.status, created.assigned_mechanic_id), ('assigned', self.top.pk))
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class LifecycleTransitionTests(TestCase):
+    def setUp(self):
+        self.mechanic = make_mechanic()
+        self.service_request = make_service_request(status='completed', assigned_mechanic=self.mechanic)
+        self.staff = User.objects.create_user('staff@example.com', 'staff@example.com', 'pw', is_staff=True)
+        self.client = APIClient()
+
+    def test_return_to_owner_writes_returned(self):
+        self.client.force_authenticate(self.mechanic.user)
+
+        response = self.client.post(f'/api/service-requests/{self.service_request.pk}/return_to_owner/')
+
+        self.assertEqual(response.status_code, 200)
+        self.service_request.refresh_from_db()
+        self.assertEqual(self.service_request.status, 'returned')
+
+    def test_transition_is_guarded_by_current_status(self):
+        self.client.force_authenticate(self.mechanic.user)
+
+        response = self.client.post(f'/api/service-requests/{self.service_request.pk}/pickup_car/')
+
+        self.assertEqual(response.status_code, 400)
+        self.service_request.refresh_from_db()
+        self.assertEqual(self.service_request.status, 'completed')
+
+    def test_other_driver_is_forbidden(self):
+        self.client.force_authenticate(make_mechanic('other@example.com').user)
+
+        response = self.client.post(f'/api/service-requests/{self.service_request.pk}/return_to_owner/')
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_invalid_status_cannot_be_stored(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ServiceRequest.objects.filter(pk=self.service_request.pk).update(status='delivered')
+
+    def test_bulk_transition_moves_only_eligible_requests(self):
+        pending = ServiceRequest.objects.create(
+            car=self.service_request.car, owner=self.service_request.owner, pickup_location='Karen',
+            preferred_date=date(2026, 1, 10), preferred_time=time(9, 0), service_type='general_service',
+        )
+        self.client.force_authenticate(self.staff)
+
+        response = self.client.post('/api/service-requests/bulk_transition/', {
+            'ids': [pending.pk, self.service_request.pk], 'status': 'cancelled',
+        }, format='json')
+
+        self.assertEqual(response.data, {'updated': [pending.pk], 'skipped': [self.service_request.pk]})
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, 'cancelled')
+
+    def test_bulk_transition_requires_a_list_of_ids(self):
+        self.client.force_authenticate(self.staff)
+
+        for ids in (str(self.service_request.pk), {str(self.service_request.pk): 1}, [], ['x'], None):
+            with self.subTest(ids=ids):
+                response = self.client.post('/api/service-requests/bulk_transition/',
+                                            {'ids': ids, 'status': 'cancelled'}, format='json')
+                self.assertEqual(response.status_code, 400)
+
+    def test_transition_returns_only_the_rows_it_moved(self):
+        other = ServiceRequest.objects.create(
+            car=self.service_request.car, owner=self.service_request.owner, pickup_location='Karen',
+            preferred_date=date(2026, 1, 10), preferred_time=time(9, 0), service_type='general_service',
+        )
+
+        moved = ServiceRequest.objects.filter(pk__in=[other.pk, self.service_request.pk]).transition('cancel')
+
+        self.assertEqual(moved, [other.pk])
+        self.assertEqual(ServiceRequestEvent.objects.filter(transition='cancel').count(), 1)
+
+    def test_update_status_requires_dedicated_action_for_assignments(self):
+        self.client.force_authenticate(self.staff)
+
+        response = self.client.post(f'/api/service-requests/{self.service_request.pk}/update_status/',
+                                    {'status': 'in_service'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ServiceRequestEventTests(TestCase):
+    def setUp(self):
+        self.mechanic = make_mechanic()
+        self.garage = make_garage()
+        self.service_request = make_service_request(status='assigned', assigned_mechanic=self.mechanic)
+        self.client = APIClient()
+
+    def test_transitions_are_logged_with_actor_and_duration(self):
+        ServiceRequestEvent.objects.filter(transition='create').update(created_at=timezone.now() - timedelta(hours=2))
+        self.client.force_authenticate(self.mechanic.user)
+
+        self.client.post(f'/api/service-requests/{self.service_request.pk}/pickup_car/')
+        self.client.post(f'/api/service-requests/{self.service_request.pk}/deliver_to_garage/',
+                         {'garage_id': self.garage.pk})
+
+        events = list(self.service_request.events.values_list('transition', 'from_status', 'to_status', 'actor_id'))
+        self.assertEqual(events, [
+            ('create', '', 'assigned', None),
+            ('pickup', 'assigned', 'picked_up', self.mechanic.user_id),
+            ('deliver_to_garage', 'picked_up', 'in_service', self.mechanic.user_id),
+        ])
+        pickup = self.service_request.events.get(transition='pickup')
+        self.assertAlmostEqual(pickup.seconds_in_from_status, 7200, delta=5)
+
+    def test_rejected_transition_is_not_logged(self):
+        self.client.force_authenticate(self.mechanic.user)
+
+        response = self.client.post(f'/api/service-requests/{self.service_request.pk}/return_to_owner/')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.service_request.events.count(), 1)
+
+    def test_completion_dates_the_service_record(self):
+        ServiceRequest.objects.filter(pk=self.service_request.pk).update(status='in_service', assigned_garage=self.garage)
+        record = ServiceRecord.objects.create(service_request=self.service_request, car=self.service_request.car,
+                                              garage=self.garage)
+        self.client.force_authenticate(self.garage.user)
+
+        self.client.post(f'/api/service-requests/{self.service_request.pk}/complete_service/')
+
+        record.refresh_from_db()
+        self.assertIsNotNone(record.date_completed)
+        self.assertIsNone(record.date_returned)
+
+    def test_timeline_is_visible_to_the_owner_only(self):
+        ServiceRequest.objects.filter(pk=self.service_request.pk).transition('pickup', actor=self.mechanic.user)
+        url = f'/api/service-requests/{self.service_request.pk}/timeline/'
+
+        self.client.force_authenticate(self.service_request.owner.user)
+        response = self.client.get(url)
+        self.assertEqual([event['to_status'] for event in response.data], ['assigned', 'picked_up'])
+        self.assertEqual(response.data[1]['actor_name'], self.mechanic.user.username)
+
+        self.client.force_authenticate(make_garage('other@example.com').user)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_stage_metrics_aggregate_the_log(self):
+        staff = User.objects.create_user('staff@example.com', 'staff@example.com', 'pw', is_staff=True)
+        ServiceRequest.objects.filter(pk=self.service_request.pk).transition('pickup')
+        self.client.force_authenticate(staff)
+
+        response = self.client.get('/api/service-requests/stage_metrics/')
+
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual((response.data[0]['from_status'], response.data[0]['to_status'], response.data[0]['count']),
+                         ('assigned', 'picked_up', 1))
+        self.client.force_authenticate(self.mechanic.user)
+        self.assertEqual(self.client.get('/api/service-requests/stage_metrics/').status_code, 403)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ServiceRecordMaterializationTests(TestCase):
+    def setUp(self):
+        self.mechanic = make_mechanic()
+        self.garage = make_garage()
+        self.service_request = make_service_request(
+            status='in_service', assigned_mechanic=self.mechanic, assigned_garage=self.garage,
+            garage_cost=Decimal('3000.00'),
+        )
+        ServiceWorkItem.objects.bulk_create([
+            ServiceWorkItem(service_request=self.service_request, description='Oil change', cost=Decimal('2000.00')),
+            ServiceWorkItem(service_request=self.service_request, description='Filter', cost=Decimal('1000.00')),
+        ])
+        self.client = APIClient()
+
+    def test_completion_creates_record_with_work_items(self):
+        self.client.force_authenticate(self.garage.user)
+
+        self.client.post(f'/api/service-requests/{self.service_request.pk}/complete_service/')
+
+        record = ServiceRecord.objects.get(service_request=self.service_request)
+        self.assertEqual(record.total_cost, Decimal('3850.00'))
+        self.assertEqual((record.garage_id, record.mechanic_pickup_id), (self.garage.pk, self.mechanic.pk))
+        self.assertIsNotNone(record.date_completed)
+        self.assertEqual(sorted(record.items.values_list('item_name', 'cost')),
+                         [('Filter', Decimal('1000.00')), ('Oil change', Decimal('2000.00'))])
+
+    def test_taken_date_is_the_pickup(self):
+        picked_up_at = timezone.now() - timedelta(days=2)
+        ServiceRequestEvent.objects.create(service_request=self.service_request, transition='pickup',
+                                           from_status='assigned', to_status='picked_up', created_at=picked_up_at)
+
+        ServiceRequest.objects.filter(pk=self.service_request.pk).transition('complete')
+
+        record = ServiceRecord.objects.get(service_request=self.service_request)
+        self.assertEqual(record.date_taken, picked_up_at)
+        self.assertGreater(record.date_completed, picked_up_at)
+
+    def test_return_completes_the_record_without_copying_items_again(self):
+        ServiceRequest.objects.filter(pk=self.service_request.pk).transition('complete')
+        self.client.force_authenticate(self.mechanic.user)
+
+        self.client.post(f'/api/service-requests/{self.service_request.pk}/return_to_owner/')
+
+        record = ServiceRecord.objects.get(service_request=self.service_request)
+        self.assertEqual(record.mechanic_return_id, self.mechanic.pk)
+        self.assertIsNotNone(record.date_returned)
+        self.assertEqual(record.items.count(), 2)
+
+    def test_completion_on_a_backend_without_conflict_targets(self):
+        # As on MySQL: upserts are ON DUPLICATE KEY UPDATE, without unique_fields
+        with mock.patch.object(type(connection.features), 'supports_update_conflicts_with_target', False):
+            ServiceRequest.objects.filter(pk=self.service_request.pk).transition('complete')
+
+        summary = CarServiceSummary.objects.get(car=self.service_request.car)
+        self.assertEqual((summary.visit_count, summary.lifetime_cost), (1, Decimal('3850.00')))
+
+    def test_backfill_command_materializes_historical_requests(self):
+        ServiceRequest.objects.filter(pk=self.service_request.pk).update(status='returned')
+
+        call_command('materialize_service_records', batch_size=1, stdout=io.StringIO())
+        call_command('materialize_service_records', stdout=io.StringIO())
+
+        record = ServiceRecord.objects.get(service_request=self.service_request)
+        self.assertEqual(record.mechanic_return_id, self.mechanic.pk)
+        self.assertEqual(record.items.count(), 2)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class CarHistoryTests(TestCase):
+    def setUp(self):
+        self.garage = make_garage()
+        self.service_request = make_service_request(
+            status='in_service', assigned_garage=self.garage, garage_cost=Decimal('1000.00')
+        )
+        ServiceWorkItem.objects.create(service_request=self.service_request, description='Brake pads',
+                                       cost=Decimal('1000.00'))
+        self.car = self.service_request.car
+        self.url = f'/api/cars/{self.car.pk}/history/'
+        self.client = APIClient()
+        self.client.force_authenticate(self.service_request.owner.user)
+
+    def add_past_visit(self, total_cost):
+        past_request = ServiceRequest.objects.create(
+            car=self.car, owner=self.service_request.owner, status='returned', pickup_location='Westlands',
+            preferred_date=date(2025, 6, 1), preferred_time=time(9, 0), service_type='general_service',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            return ServiceRecord.objects.create(service_request=past_request, car=self.car, garage=self.garage,
+                                                total_cost=total_cost,
+                                                date_completed=timezone.now() - timedelta(days=30))
+
+    def test_history_lists_records_with_summary(self):
+        self.add_past_visit(Decimal('500.00'))
+        ServiceRequest.objects.filter(pk=self.service_request.pk).transition('complete')
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['summary']['visit_count'], 2)
+        self.assertEqual(Decimal(response.data['summary']['lifetime_cost']), Decimal('2250.00'))
+        self.assertEqual(response.data['results'][0]['items'][0]['item_name'], 'Brake pads')
+
+    def test_history_query_count_does_not_grow_with_records(self):
+        self.add_past_visit(Decimal('500.00'))
+        self.client.get(self.url)  # Warm the role cache
+        with CaptureQueriesContext(connection) as one_record:
+            self.client.get(self.url)
+        for _ in range(3):
+            self.add_past_visit(Decimal('500.00'))
+
+        with self.assertNumQueries(len(one_record.captured_queries)):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['summary']['visit_count'], 4)
+
+    def test_deleting_a_record_updates_the_summary(self):
+        record = self.add_past_visit(Decimal('500.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            record.delete()
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.data['summary']['visit_count'], 0)
+
+    def test_other_owners_cannot_see_the_history(self):
+        other = make_owner('other@example.com')
+        self.client.force_authenticate(other.user)
+
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+def make_jpeg(name='photo.jpg', size=(1200, 900)):
+    """A JPEG carrying camera EXIF: rotated 90 degrees, with a GPS block"""
+    image = Image.new('RGB', size, 'red')
+    exif = image.getexif()
+    exif[0x0112] = 6  # Orientation: rotate 90 CW
+    exif[0x010f] = 'Canon'
+    exif[0x8825] = {1: 'S', 2: (1.0, 17.0, 0.0)}  # GPSInfo
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class GarageImagePipelineTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root, UPLOAD_TEMP_DIR=f'{self.media_root}/tmp')
+        media.enable()
+        self.addCleanup(media.disable)
+        self.garage = make_garage()
+        self.client = APIClient()
+        self.client.force_authenticate(self.garage.user)
+        self.url = f'/api/garages/{self.garage.pk}/upload_images/'
+
+    def test_upload_stores_upright_original_without_exif_and_webp_variants(self):
+        response = self.client.post(self.url, {'images': [make_jpeg(), make_jpeg('second.jpg')]}, format='multipart')
+
+        self.assertEqual(response.status_code, 200)
+        garage_image = GarageImage.objects.filter(garage=self.garage).first()
+        self.assertEqual((garage_image.width, garage_image.height), (900, 1200))
+        self.assertEqual((garage_image.thumbnail_width, garage_image.thumbnail_height), (120, 160))
+        self.assertEqual((garage_image.medium_width, garage_image.medium_height), (600, 800))
+        with Image.open(garage_image.image.path) as original:
+            self.assertEqual(dict(original.getexif()), {})
+        with Image.open(garage_image.thumbnail.path) as thumbnail:
+            self.assertEqual(thumbnail.format, 'WEBP')
+        self.assertEqual(GarageImage.objects.filter(garage=self.garage).count(), 2)
+
+    def test_serializers_return_the_thumbnail_by_default(self):
+        self.client.post(self.url, {'images': [make_jpeg()]}, format='multipart')
+
+        response = self.client.get(f'/api/garages/{self.garage.pk}/')
+
+        image = response.data['images'][0]
+        self.assertTrue(image['image'].endswith('.webp'))
+        self.assertEqual((image['width'], image['height']), (120, 160))
+        self.assertNotEqual(image['medium'], image['image'])
+
+    def test_undecodable_upload_is_rejected(self):
+        junk = SimpleUploadedFile('photo.jpg', b'not really a jpeg', content_type='image/jpeg')
+
+        response = self.client.post(self.url, {'images': [make_jpeg(), junk]}, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(GarageImage.objects.exists())
+
+    def test_oversized_upload_is_rejected_while_streaming(self):
+        big = SimpleUploadedFile('big.jpg', b'\xff\xd8\xff\xe0' + b'\0' * (5 * 1024 * 1024), content_type='image/jpeg')
+
+        response = self.client.post(self.url, {'images': [big]}, format='multipart')
+
+        self.assertEqual(response.data, {'error': 'File big.jpg exceeds 5MB limit'})
+        self.assertEqual(os.listdir(f'{self.media_root}/tmp'), [])
+
+    def test_declared_content_type_is_not_trusted(self):
+        script = SimpleUploadedFile('photo.png', b'<?php echo 1; ?>' * 10, content_type='image/png')
+
+        response = self.client.post(self.url, {'images': [script]}, format='multipart')
+
+        self.assertEqual(response.data, {'error': 'Invalid file type: photo.png. Allowed: JPEG, PNG, WEBP'})
+
+    def test_rejected_upload_body_is_drained(self):
+        script = SimpleUploadedFile('photo.png', b'<?php echo 1; ?>' * 100000, content_type='image/png')
+
+        response = self.client.post(self.url, {'images': [script]}, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        # Read to the end, so the server can send the 400 instead of resetting the connection
+        self.assertEqual(response.wsgi_request._stream.read(), b'')
+
+    def test_eleventh_image_is_rejected(self):
+        response = self.client.post(self.url, {'images': [make_jpeg(f'{i}.jpg', (20, 20)) for i in range(11)]},
+                                    format='multipart')
+
+        self.assertEqual(response.data, {'error': 'Maximum 10 files allowed for images'})
+        self.assertFalse(GarageImage.objects.exists())
+
+    def test_passport_photo_is_checked_while_streaming(self):
+        response = APIClient().post('/api/mechanics/register/', {
+            'email': 'new@example.com', 'password': 'pw', 'first_name': 'New', 'last_name': 'Driver',
+            'phone_number': '0722000001', 'address': 'Nairobi', 'id_number': '123',
+            'passport_photo': SimpleUploadedFile('passport.jpg', b'GIF89a' + b'\0' * 100, content_type='image/jpeg'),
+        }, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Invalid file type', response.data['passport_photo'][0])
+        self.assertFalse(User.objects.filter(email='new@example.com').exists())
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ContentAddressedMediaTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root, UPLOAD_TEMP_DIR=f'{self.media_root}/tmp')
+        media.enable()
+        self.addCleanup(media.disable)
+        self.garage = make_garage()
+        self.client = APIClient()
+        self.client.force_authenticate(self.garage.user)
+
+    def upload(self, *names):
+        return self.client.post(f'/api/garages/{self.garage.pk}/upload_images/',
+                                {'images': [make_jpeg(name) for name in names]}, format='multipart')
+
+    def gc(self, *args):
+        call_command('gc_media_blobs', *args, stdout=io.StringIO())
+
+    def test_identical_uploads_share_one_blob(self):
+        self.upload('a.jpg', 'b.jpg')
+        self.upload('c.jpg')
+
+        names = set(GarageImage.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(MediaBlob.objects.get(name=names.pop()).refcount, 3)
+        # One original, one medium and one thumbnail on disk
+        self.assertEqual(MediaBlob.objects.count(), 3)
+
+    def test_deleting_rows_releases_references_and_gc_removes_the_blob(self):
+        self.upload('a.jpg', 'b.jpg')
+        name = GarageImage.objects.first().image.name
+        storage = GarageImage.objects.first().image.storage
+
+        GarageImage.objects.first().delete()
+        self.gc('--grace-hours=0')
+        self.assertTrue(storage.exists(name))
+
+        GarageImage.objects.all().delete()
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 0)
+        self.gc('--grace-hours=0')
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_recently_used_blobs_survive_gc(self):
+        self.upload('a.jpg')
+        GarageImage.objects.all().delete()
+
+        self.gc()
+
+        self.assertEqual(MediaBlob.objects.count(), 3)
+
+    def test_recount_repairs_drifted_counts(self):
+        self.upload('a.jpg')
+        MediaBlob.objects.update(refcount=0)
+
+        self.gc('--recount', '--grace-hours=0')
+
+        self.assertEqual(GarageImage.objects.count(), 1)
+        self.assertTrue(all(blob.refcount == 1 for blob in MediaBlob.objects.all()))
+
+    def test_spooled_passport_photos_are_deduplicated(self):
+        for email in ('one@example.com', 'two@example.com'):
+            APIClient().post('/api/mechanics/register/', {
+                'email': email, 'password': 'pw', 'first_name': 'New', 'last_name': 'Driver',
+                'phone_number': '0722000001', 'address': 'Nairobi', 'id_number': email,
+                'passport_photo': make_jpeg('passport.jpg', (40, 40)),
+            }, format='multipart')
+
+        names = set(Mechanic.objects.values_list('passport_photo', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(MediaBlob.objects.get(name=names.pop()).refcount, 2)
+        self.assertEqual(os.listdir(f'{self.media_root}/tmp'), [])
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], MEDIA_CACHE_MAX_AGE=3600)
+class MediaServingTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.digest = 'ab' * 32
+        self.blob = f'blobs/ab/ab/{self.digest}.webp'
+        self.content = bytes(range(256)) * 4
+        for name in (self.blob, 'legacy/photo.jpg'):
+            os.makedirs(os.path.dirname(f'{self.media_root}/{name}'), exist_ok=True)
+            with open(f'{self.media_root}/{name}', 'wb') as file:
+                file.write(self.content)
+
+    def test_blobs_are_immutable_and_revalidate_to_304(self):
+        response = self.client.get(f'/media/{self.blob}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(response['ETag'], f'"{self.digest}"')
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.client.get(f'/media/{self.blob}', HTTP_IF_NONE_MATCH=f'"{self.digest}"')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_other_files_revalidate_by_date(self):
+        response = self.client.get('/media/legacy/photo.jpg')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+
+        response = self.client.get('/media/legacy/photo.jpg', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_requests(self):
+        response = self.client.get(f'/media/{self.blob}', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+
+        response = self.client.get(f'/media/{self.blob}', HTTP_RANGE='bytes=-4')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-4:])
+
+        response = self.client.get(f'/media/{self.blob}', HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+        # A stale If-Range gets the whole (new) file
+        response = self.client.get(f'/media/{self.blob}', HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_paths_outside_media_are_not_served(self):
+        os.makedirs(f'{self.media_root}/blobs/.tmp')
+        open(f'{self.media_root}/blobs/.tmp/partial', 'wb').close()
+        for path in ('../settings.py', 'blobs/.tmp/partial', 'blobs', 'missing.jpg'):
+            self.assertEqual(self.client.get(f'/media/{path}').status_code, 404, path)
+        self.assertEqual(self.client.post(f'/media/{self.blob}').status_code, 405)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class AsyncCatalogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = ProductCategory.objects.create(name='Oils', slug='oils', description='Oils')
+        for number in range(12):
+            Product.objects.create(name=f'Oil {number}', slug=f'oil-{number}', description='5W-30', price=Decimal('40'),
+                                   category=self.category, is_featured=number < 3, sale_price=Decimal('35') if number else None)
+        self.client = APIClient()
+
+    def test_reads(self):
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['count'], data['next'], data['previous']), (12, 'http://testserver/api/products/?page=2', None))
+        self.assertEqual(len(data['results']), 10)
+        self.assertEqual(len(self.client.get('/api/products/?page=2').json()['results']), 2)
+        self.assertEqual(self.client.get('/api/products/?category=oils&featured=true').json()['count'], 3)
+        self.assertEqual(self.client.get('/api/products/oil-3/').json()['slug'], 'oil-3')
+        self.assertEqual(len(self.client.get('/api/products/featured/').json()), 3)
+        self.assertEqual(len(self.client.get('/api/products/on_sale/').json()), 8)
+        self.assertEqual(self.client.get('/api/product-categories/').json()['count'], 1)
+        self.assertEqual(self.client.get('/api/product-categories/oils/').json()['name'], 'Oils')
+
+    def test_pagination_edges(self):
+        self.assertEqual(self.client.get('/api/products/?page=last').json()['previous'],
+                         'http://testserver/api/products/')
+        response = self.client.get('/api/products/?page=3')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'detail': 'Invalid page.'})
+        response = self.client.get('/api/products/missing/')
+        self.assertEqual(response.json(), {'detail': 'No Product matches the given query.'})
+
+    def test_writes(self):
+        payload = {'name': 'Filter', 'slug': 'filter', 'description': 'Oil filter', 'price': '12.00'}
+        self.assertEqual(self.client.post('/api/products/', payload, format='json').status_code, 403)
+
+        staff = User.objects.create_user('staff@example.com', 'staff@example.com', 'pw', is_staff=True)
+        self.client.force_authenticate(staff)
+        self.assertEqual(self.client.post('/api/products/', payload, format='json').status_code, 201)
+        self.assertEqual(self.client.patch('/api/products/filter/', {'stock': 3}, format='json').status_code, 200)
+        self.assertEqual(self.client.post('/api/products/featured/').status_code, 405)
+
+    def test_reads_are_throttled_like_the_viewsets(self):
+        with mock.patch.dict(AnonRateThrottle.THROTTLE_RATES, {'anon': '2/minute'}):
+            for _ in range(2):
+                self.assertEqual(self.client.get('/api/products/').status_code, 200)
+            response = self.client.get('/api/products/')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    async def test_served_by_the_asgi_handler(self):
+        client = AsyncClient()
+
+        response = await client.get('/api/products/oil-1/')
+        self.assertEqual(response.json()['name'], 'Oil 1')
+
+        response = await client.post('/api/service-inquiry/', {
+            'service_type': 'ntsa_inspection', 'institutionName': 'School', 'contactPerson': 'Jo',
+            'email': 'jo@example.com', 'phone': '0700000000', 'fleetSize': '4',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        inquiry = await ServiceInquiry.objects.aget()
+        self.assertEqual(inquiry.inquiry_data, {'fleetSize': '4'})
+        self.assertEqual(await OutboundEmail.objects.acount(), 2)
+
+    def test_inquiry_rejects_bad_requests(self):
+        self.assertEqual(self.client.get('/api/service-inquiry/').status_code, 405)
+        response = self.client.post('/api/service-inquiry/', 'not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/service-inquiry/', {'service_type': 'fleet_management'})
+        self.assertIn('Missing required fields', response.json()['error'])
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class BroadcastTests(TestCase):
+    def setUp(self):
+        self.mechanics = [make_mechanic(f'driver{number}@example.com') for number in range(5)]
+        make_mechanic('pending@example.com', status='pending')
+        staff = User.objects.create_user('staff@example.com', 'staff@example.com', 'pw', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(staff)
+
+    def broadcast(self, title='Heads up'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/notifications/send_to_mechanics/', {'title': title, 'message': 'Hi'})
+
+    def recipients(self, title='Heads up'):
+        return sorted(Notification.objects.filter(title=title).values_list('recipient_mechanic_id', flat=True))
+
+    def test_every_recipient_gets_one_notification_across_chunk_boundaries(self):
+        expected = sorted(mechanic.pk for mechanic in self.mechanics)
+        for chunk_size in (1, 2, 5, 6):
+            with self.subTest(chunk_size=chunk_size), mock.patch('cars.notifications.BROADCAST_CHUNK_SIZE', chunk_size):
+                response = self.broadcast(f'Chunks of {chunk_size}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self.recipients(f'Chunks of {chunk_size}'), expected)
+
+    def test_inline_broadcast_reports_the_delivered_count(self):
+        with mock.patch('cars.notifications.publish_notification') as publish:
+            response = self.broadcast()
+
+        self.assertEqual(response.data['status'], 'sent')
+        self.assertEqual(response.data['count'], 5)
+        job = BroadcastJob.objects.get()
+        self.assertEqual((job.status, job.delivered, job.audience_size), ('sent', 5, 5))
+        self.assertTrue(all(call.args[0].pk for call in publish.call_args_list))
+        self.assertEqual(publish.call_count, 5)
+
+    def test_large_audience_is_queued_for_the_worker(self):
+        with mock.patch('cars.notifications.BROADCAST_BACKGROUND_THRESHOLD', 3):
+            response = self.broadcast()
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'queued')
+        self.assertEqual(response.data['audience_size'], 5)
+        self.assertNotIn('count', response.data)
+        self.assertEqual(self.recipients(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('send_queued_broadcasts', stdout=io.StringIO())
+        self.assertEqual(len(self.recipients()), 5)
+        self.assertEqual(BroadcastJob.objects.get().status, 'sent')
+
+    def test_interrupted_job_resumes_without_repeating_anyone(self):
+        real_bulk_create = Notification.objects.bulk_create
+        calls = []
+
+        def failing_second_chunk(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 2:
+                raise OSError('worker killed')
+            return real_bulk_create(*args, **kwargs)
+
+        with mock.patch('cars.notifications.BROADCAST_CHUNK_SIZE', 2), \
+                mock.patch.object(Notification.objects, 'bulk_create', side_effect=failing_second_chunk), \
+                self.assertLogs('cars.notifications', 'ERROR'):
+            response = self.broadcast()
+        self.assertEqual(response.status_code, 202)
+        job = BroadcastJob.objects.get()
+        self.assertEqual((job.status, job.delivered, job.attempts), ('queued', 2, 1))
+
+        BroadcastJob.objects.update(next_attempt_at=timezone.now())
+        call_command('send_queued_broadcasts', stdout=io.StringIO())
+        self.assertEqual(self.recipients(), sorted(mechanic.pk for mechanic in self.mechanics))
+
+    def test_rows_without_returned_pks_are_looked_up_for_publishing(self):
+        # As on MySQL, where bulk_create doesn't set primary keys
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert',
+                               new_callable=mock.PropertyMock, return_value=False), \
+                mock.patch('cars.notifications.publish_notification') as publish:
+            self.broadcast()
+
+        published = sorted(call.args[0].pk for call in publish.call_args_list)
+        self.assertEqual(published, sorted(Notification.objects.values_list('pk', flat=True)))
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('owner@example.com', 'owner@example.com', 'pw')
+        self.owner = CarOwner.objects.create(user=user, phone_number='0700000000', address='Nairobi')
+        Notification.objects.bulk_create([
+            Notification(recipient_type='owner', recipient_owner=self.owner, title=f'N{number}', message='m')
+            for number in range(11)
+        ])
+        # Ties on created_at must be broken by id
+        tied = timezone.now() - timedelta(hours=1)
+        Notification.objects.filter(title__in=['N3', 'N4', 'N5', 'N6']).update(created_at=tied)
+        self.expected = list(
+            Notification.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.client.get('/api/notifications/')  # Warm the role cache
+
+    def ids(self, response):
+        return [row['id'] for row in response.data['results']]
+
+    def test_forward_pages_cover_every_row_once(self):
+        seen = []
+        url = '/api/notifications/?page_size=3'
+        while url:
+            response = self.client.get(url)
+            seen += self.ids(response)
+            url = response.data['next']
+        self.assertEqual(seen, self.expected)
+
+    def test_previous_cursor_returns_the_page_before(self):
+        first = self.client.get('/api/notifications/?page_size=3')
+        second = self.client.get(first.data['next'])
+        third = self.client.get(second.data['next'])
+
+        self.assertEqual(self.ids(self.client.get(third.data['previous'])), self.ids(second))
+        back_to_first = self.client.get(second.data['previous'])
+        self.assertEqual(self.ids(back_to_first), self.expected[:3])
+        self.assertIsNone(first.data['previous'])
+
+    def test_page_size_is_clamped(self):
+        with mock.patch.object(CreatedAtKeysetPagination, 'max_page_size', 4):
+            self.assertEqual(len(self.ids(self.client.get('/api/notifications/?page_size=50'))), 4)
+        self.assertEqual(len(self.ids(self.client.get('/api/notifications/?page_size=0'))), 10)
+        self.assertEqual(len(self.ids(self.client.get('/api/notifications/?page_size=x'))), 10)
+
+    def test_invalid_cursor_is_404(self):
+        tampered = base64.urlsafe_b64encode(b'{"c":"not a date","i":1}').decode()
+        for cursor in ('garbage', tampered, base64.urlsafe_b64encode(b'{"i":1}').decode()):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get('/api/notifications/', {'cursor': cursor}).status_code, 404)
+
+    def test_pages_run_no_count_query(self):
+        response = self.client.get('/api/notifications/?page_size=3')
+        with CaptureQueriesContext(connection) as queries, self.assertNumQueries(1):
+            self.client.get(response.data['next'])
+        self.assertFalse([query for query in queries.captured_queries if 'COUNT(' in query['sql'].upper()])
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class RoleCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.mechanic = make_mechanic(status='pending')
+        self.user = self.mechanic.user
+
+    def test_profiles_are_read_once_then_cached(self):
+        with self.assertNumQueries(1):
+            role = resolve_role(self.user)
+        self.assertEqual((role.user_type, role.mechanic_status), ('mechanic', 'pending'))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_role(self.user), role)
+
+    def test_profile_save_invalidates(self):
+        resolve_role(self.user)
+        self.mechanic.status = 'approved'
+        self.mechanic.save()
+
+        self.assertTrue(resolve_role(self.user).is_approved_mechanic)
+
+    def test_approve_endpoint_invalidates(self):
+        resolve_role(self.user)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('staff@example.com', 'staff@example.com', 'pw', is_staff=True))
+
+        client.post(f'/api/mechanics/{self.mechanic.pk}/approve/')
+
+        self.assertTrue(resolve_role(self.user).is_approved_mechanic)
+
+    def test_admin_reject_actions_invalidate_despite_bypassing_signals(self):
+        garage = make_garage()
+        for profile in (self.mechanic, garage):
+            resolve_role(profile.user)
+
+        request = mock.Mock()
+        with mock.patch.object(admin.ModelAdmin, 'message_user'):
+            MechanicAdmin(Mechanic, admin.site).reject_mechanics(request, Mechanic.objects.filter(pk=self.mechanic.pk))
+            GarageAdmin(Garage, admin.site).reject_garages(request, Garage.objects.filter(pk=garage.pk))
+
+        self.assertEqual(resolve_role(self.user).mechanic_status, 'rejected')
+        self.assertEqual(resolve_role(garage.user).garage_status, 'rejected')
+
+    def test_reject_action_on_a_status_filtered_changelist_invalidates(self):
+        self.assertEqual(resolve_role(self.user).mechanic_status, 'pending')
+        self.client.force_login(User.objects.create_superuser('admin@example.com', 'admin@example.com', 'pw'))
+
+        response = self.client.post('/admin/cars/mechanic/?status__exact=pending', {
+            'action': 'reject_mechanics', '_selected_action': [self.mechanic.pk],
+        })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(resolve_role(self.user).mechanic_status, 'rejected')
@@ -0,0 +1,152 @@
+"""
+Streaming validation of multipart file uploads.
+
+Django's default handlers keep small files in memory and only let the view
+look at a file after the whole request body has been read, and the view
+can only check the content type the client declared. ValidatingUploadHandler
+streams every file part to a temporary file chunk by chunk instead, and
+checks it while the data arrives:
+
+* the field must be one the action accepts, at most ``max_files`` times;
+* the first bytes must carry the signature of an allowed type (the
+  client-declared content type is replaced by the detected one);
+* the running size must stay within ``max_size``.
+
+The first violation stops parsing and is reported by upload_rejection().
+The rest of the body is still read, but not processed, so the client gets
+the 400 response instead of a reset connection. Temporary files are created under
+UPLOAD_TEMP_DIR, which should be on the same filesystem as MEDIA_ROOT:
+storing an accepted file is then a single atomic rename.
+"""
+import os
+import tempfile
+from collections import Counter
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers, StopUpload
+
+# Content type -> test on the first SIGNATURE_LENGTH bytes of the file
+IMAGE_SIGNATURES = {
+    'image/jpeg': lambda head: head.startswith(b'\xff\xd8\xff'),
+    'image/png': lambda head: head.startswith(b'\x89PNG\r\n\x1a\n'),
+    'image/webp': lambda head: head[:4] == b'RIFF' and head[8:12] == b'WEBP',
+}
+SIGNATURE_LENGTH = 12
+
+MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5MB
+
+
+@dataclass(frozen=True)
+class UploadRule:
+    """What one file field of an action accepts"""
+    max_size: int = MAX_IMAGE_SIZE
+    max_files: int = 1
+    content_types: tuple = tuple(IMAGE_SIGNATURES)
+
+    def describe_types(self):
+        return ', '.join(content_type.split('/')[-1].upper() for content_type in self.content_types)
+
+
+def detect_content_type(head, content_types):
+    for content_type in content_types:
+        if IMAGE_SIGNATURES[content_type](head):
+            return content_type
+    return None
+
+
+class SpooledUpload(TemporaryUploadedFile):
+    """A TemporaryUploadedFile created in UPLOAD_TEMP_DIR"""
+
+    def __init__(self, name, content_type, charset, content_type_extra):
+        os.makedirs(settings.UPLOAD_TEMP_DIR, exist_ok=True)
+        file = tempfile.NamedTemporaryFile(suffix='.upload', dir=settings.UPLOAD_TEMP_DIR)
+        UploadedFile.__init__(self, file, name, content_type, 0, charset, content_type_extra)
+
+
+class ValidatingUploadHandler(FileUploadHandler):
+    def __init__(self, request, rules):
+        super().__init__(request)
+        self.rules = rules
+        self.file_counts = Counter()
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.rule = self.rules.get(field_name)
+        if self.rule is None:
+            self.reject(f'Unexpected file field: {field_name}')
+        self.file_counts[field_name] += 1
+        if self.file_counts[field_name] > self.rule.max_files:
+            self.reject(f'Maximum {self.rule.max_files} files allowed for {field_name}')
+        if content_length and content_length > self.rule.max_size:
+            self.reject(self.oversize_message())
+
+        self.head = b''
+        self.size = 0
+        self.detected_type = None
+        self.file = SpooledUpload(file_name, content_type, charset, content_type_extra)
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > self.rule.max_size:
+            self.reject(self.oversize_message())
+        if self.detected_type is None and len(self.head) < SIGNATURE_LENGTH:
+            self.head += raw_data[:SIGNATURE_LENGTH - len(self.head)]
+            if len(self.head) == SIGNATURE_LENGTH:
+                self.check_signature()
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        if self.detected_type is None:
+            self.check_signature()
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.content_type = self.detected_type
+        return self.file
+
+    def upload_interrupted(self):
+        self.discard()
+
+    def check_signature(self):
+        self.detected_type = detect_content_type(self.head, self.rule.content_types)
+        if self.detected_type is None:
+            self.reject(f'Invalid file type: {self.file_name}. Allowed: {self.rule.describe_types()}')
+
+    def oversize_message(self):
+        return f'File {self.file_name} exceeds {self.rule.max_size // (1024 * 1024)}MB limit'
+
+    def discard(self):
+        # The parser also closes self.file when the upload stops, so keep it set
+        if hasattr(self, 'file'):
+            self.file.close()  # Deletes the temporary file
+
+    def reject(self, message):
+        self.discard()
+        self.request.upload_rejection = message
+        # The parser drains the rest of the body without handing it to us
+        raise StopUpload()
+
+
+def upload_rejection(request):
+    """Why the upload handler refused this request's files, or None"""
+    request.data  # Parse the body if nothing has yet
+    return getattr(request._request, 'upload_rejection', None)
+
+
+class ValidatedUploadMixin:
+    """Viewset mixin: parse the uploads of the actions in ``upload_rules`` with ValidatingUploadHandler.
+
+    ``upload_rules`` maps an action name to {file field: UploadRule}. The
+    handler is installed before authentication, whose CSRF check is what
+    first reads the body.
+    """
+    upload_rules = {}
+
+    def initialize_request(self, request, *args, **kwargs):
+        drf_request = super().initialize_request(request, *args, **kwargs)
+        rules = self.upload_rules.get(self.action)
+        if rules:
+            request.upload_handlers = [ValidatingUploadHandler(request, rules)]
+        return drf_request
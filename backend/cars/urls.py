@@ -1,11 +1,11 @@
-from django.urls import path, include
+from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
 from .views import (
     CarOwnerViewSet, CarViewSet, MechanicViewSet, GarageViewSet,
     ServiceRequestViewSet, ServiceRecordViewSet, NotificationViewSet,
     ProductCategoryViewSet, ProductViewSet, OrderViewSet,
     login_view, logout_view, current_user_view, get_csrf_token,
-    submit_service_inquiry
+    submit_service_inquiry, notification_stream
 )
 
 router = DefaultRouter()
@@ -16,11 +16,31 @@ router.register(r'garages', GarageViewSet, basename='garage')
 router.register(r'service-requests', ServiceRequestViewSet, basename='service-request')
 router.register(r'service-records', ServiceRecordViewSet, basename='service-record')
 router.register(r'notifications', NotificationViewSet, basename='notification')
-router.register(r'product-categories', ProductCategoryViewSet, basename='product-category')
-router.register(r'products', ProductViewSet, basename='product')
 router.register(r'orders', OrderViewSet, basename='order')
 
+# The catalog viewsets run asynchronously (see cars.async_api), so they are
+# routed here rather than by the router
+catalog_urlpatterns = [
+    path('products/', ProductViewSet.as_async_view(
+        {'get': 'list', 'post': 'create'}, basename='product'), name='product-list'),
+    path('products/featured/', ProductViewSet.as_async_view(
+        {'get': 'featured'}, basename='product'), name='product-featured'),
+    path('products/on_sale/', ProductViewSet.as_async_view(
+        {'get': 'on_sale'}, basename='product'), name='product-on-sale'),
+    re_path(r'^products/(?P<slug>[^/.]+)/$', ProductViewSet.as_async_view(
+        {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'},
+        basename='product'), name='product-detail'),
+    path('product-categories/', ProductCategoryViewSet.as_async_view(
+        {'get': 'list', 'post': 'create'}, basename='product-category'), name='product-category-list'),
+    re_path(r'^product-categories/(?P<slug>[^/.]+)/$', ProductCategoryViewSet.as_async_view(
+        {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'},
+        basename='product-category'), name='product-category-detail'),
+]
+
 urlpatterns = [
+    # Before the router so "stream" isn't taken for a notification id
+    path('notifications/stream/', notification_stream, name='notification-stream'),
+    *catalog_urlpatterns,
     path('', include(router.urls)),
     path('auth/login/', login_view, name='login'),
     path('auth/logout/', logout_view, name='logout'),
@@ -1,28 +1,53 @@
-from rest_framework import viewsets, filters, status
+from rest_framework import mixins, viewsets, filters, status
 from rest_framework.decorators import action, api_view, permission_classes, throttle_classes
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAuthenticatedOrReadOnly
 from rest_framework.throttling import AnonRateThrottle
-from django.core.mail import send_mail
+from rest_framework.views import APIView
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from .models import (
-    CarOwner, Car, Mechanic, Garage, GarageImage,
-    ServiceRequest, ServiceRecord, ServiceItem, ServiceWorkItem, Notification,
+    CarOwner, Car, CarServiceSummary, Mechanic, Garage, GarageImage,
+    ServiceRequest, ServiceRequestEvent, ServiceRecord, ServiceItem, ServiceWorkItem, Notification,
     ProductCategory, Product, Order, OrderItem, ServiceInquiry
 )
 from .serializers import (
     CarOwnerSerializer, CarOwnerRegistrationSerializer, CarSerializer,
+    CarHistoryRecordSerializer, CarServiceSummarySerializer,
     MechanicSerializer, MechanicRegistrationSerializer,
     GarageSerializer, GarageRegistrationSerializer, GarageImageSerializer,
-    ServiceRequestSerializer, ServiceRecordSerializer, ServiceItemSerializer,
+    ServiceRequestSerializer, ServiceRequestListSerializer, ServiceRecordSerializer,
+    ServiceRecordListSerializer, ServiceRequestEventSerializer, ServiceItemSerializer, query_param_set,
     ServiceWorkItemSerializer, NotificationSerializer, ProductCategorySerializer, ProductSerializer,
     OrderSerializer, OrderItemSerializer
 )
+from .async_api import AsyncAPIViewMixin, AsyncListModelMixin, AsyncRetrieveModelMixin
+from .caching import CachedCatalogMixin, bump_catalog_version, cached_catalog_response
+from .dispatch import dispatch_on_create, dispatch_pending
+from .mail import aqueue_mail, queue_mail
+from .media import add_references
+from .notifications import recipient_filter, send_broadcast
+from .pagination import AsyncPageNumberPagination, CreatedAtKeysetPagination
+from .pubsub import get_broker
+from .roles import get_role
+from .search import search_products
+from .geo import nearest
+from .images import InvalidImage, process_images
+from .uploads import UploadRule, ValidatedUploadMixin, upload_rejection
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.utils.decorators import method_decorator
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+import asyncio
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -50,40 +75,12 @@ def login_view(request):
     if user is not None:
         login(request, user)
         
-        # Determine user type and return appropriate data
-        user_type = 'unknown'
-        user_data = {'id': user.id, 'email': user.email, 'first_name': user.first_name, 'last_name': user.last_name}
-        
-        try:
-            car_owner = CarOwner.objects.get(user=user)
-            user_type = 'car_owner'
-            user_data['car_owner_id'] = car_owner.id
-        except CarOwner.DoesNotExist:
-            pass
-        
-        try:
-            mechanic = Mechanic.objects.get(user=user)
-            user_type = 'mechanic'
-            user_data['mechanic_id'] = mechanic.id
-            user_data['status'] = mechanic.status
-        except Mechanic.DoesNotExist:
-            pass
-            
-        try:
-            garage = Garage.objects.get(user=user)
-            user_type = 'garage'
-            user_data['garage_id'] = garage.id
-            user_data['status'] = garage.status
-        except Garage.DoesNotExist:
-            pass
-        
-        if user.is_staff:
-            user_type = 'admin'
+        role = get_role(request)
         
         return Response({
             'message': 'Login successful',
-            'user_type': user_type,
-            'user': user_data
+            'user_type': role.user_type,
+            'user': role.user_data(user)
         })
     else:
         return Response({'error': 'Invalid email or password'}, status=status.HTTP_401_UNAUTHORIZED)
@@ -109,41 +106,43 @@ def get_csrf_token(request):
 @permission_classes([IsAuthenticated])
 def current_user_view(request):
     """Get current logged in user info"""
-    user = request.user
-    user_type = 'unknown'
-    user_data = {'id': user.id, 'email': user.email, 'first_name': user.first_name, 'last_name': user.last_name}
-    
-    try:
-        car_owner = CarOwner.objects.get(user=user)
-        user_type = 'car_owner'
-        user_data['car_owner_id'] = car_owner.id
-    except CarOwner.DoesNotExist:
-        pass
-    
-    try:
-        mechanic = Mechanic.objects.get(user=user)
-        user_type = 'mechanic'
-        user_data['mechanic_id'] = mechanic.id
-        user_data['status'] = mechanic.status
-    except Mechanic.DoesNotExist:
-        pass
-        
-    try:
-        garage = Garage.objects.get(user=user)
-        user_type = 'garage'
-        user_data['garage_id'] = garage.id
-        user_data['status'] = garage.status
-    except Garage.DoesNotExist:
-        pass
-    
-    if user.is_staff:
-        user_type = 'admin'
-    
+    role = get_role(request)
     return Response({
-        'user_type': user_type,
-        'user': user_data
+        'user_type': role.user_type,
+        'user': role.user_data(request.user)
     })
 
+NEAREST_DEFAULT_K = 5
+NEAREST_MAX_K = 50
+
+
+def _date_param(request, name):
+    """(date or None, error response) for an optional YYYY-MM-DD query param"""
+    value = request.query_params.get(name)
+    if not value:
+        return None, None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        return None, Response({'error': f'{name} must be a date (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+    return parsed, None
+
+def _nearest_params(request, lat=None, lng=None):
+    """(lat, lng, k, error) from ?lat=&lng=&k=; explicit lat/lng win"""
+    try:
+        if lat is None or lng is None:
+            lat = float(request.query_params['lat'])
+            lng = float(request.query_params['lng'])
+        k = int(request.query_params.get('k', NEAREST_DEFAULT_K))
+    except (KeyError, TypeError, ValueError):
+        return None, None, None, Response({'error': 'lat and lng are required numbers'}, status=status.HTTP_400_BAD_REQUEST)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None, None, None, Response({'error': 'lat/lng out of range'}, status=status.HTTP_400_BAD_REQUEST)
+    return lat, lng, max(1, min(k, NEAREST_MAX_K)), None
+
+
 class CarOwnerViewSet(viewsets.ModelViewSet):
     queryset = CarOwner.objects.select_related('user').all()
     serializer_class = CarOwnerSerializer
@@ -181,19 +180,45 @@ class CarViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         qs = Car.objects.select_related('owner__user')
+        if self.action == 'history':
+            qs = qs.select_related('service_summary')
         if self.request.user.is_staff:
             return qs.all()
-        try:
-            car_owner = CarOwner.objects.get(user=self.request.user)
-            return qs.filter(owner=car_owner)
-        except CarOwner.DoesNotExist:
-            return Car.objects.none()
+        role = get_role(self.request)
+        if role.car_owner_id:
+            return qs.filter(owner_id=role.car_owner_id)
+        return Car.objects.none()
 
     def perform_create(self, serializer):
         car_owner = CarOwner.objects.get(user=self.request.user)
         serializer.save(owner=car_owner)
 
-class MechanicViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        """Service records of a car, newest first, with its lifetime totals.
+
+        The totals come from CarServiceSummary, kept current as records are
+        written, and the records page is one query plus one prefetch for
+        their items - neither grows with the car's history.
+        """
+        car = self.get_object()
+        try:
+            summary = car.service_summary
+        except CarServiceSummary.DoesNotExist:
+            summary = CarServiceSummary(car=car)
+        
+        records = ServiceRecord.objects.filter(car=car).select_related(
+            'car', 'garage', 'mechanic_pickup__user', 'mechanic_return__user'
+        ).prefetch_related('items')
+        paginator = CreatedAtKeysetPagination()
+        page = paginator.paginate_queryset(records, request, view=self)
+        response = paginator.get_paginated_response(
+            CarHistoryRecordSerializer(page, many=True, context=self.get_serializer_context()).data
+        )
+        response.data['summary'] = CarServiceSummarySerializer(summary).data
+        return response
+
+class MechanicViewSet(ValidatedUploadMixin, viewsets.ModelViewSet):
     queryset = Mechanic.objects.select_related('user').all()
     serializer_class = MechanicSerializer
     permission_classes = [IsAuthenticated]
@@ -204,33 +229,34 @@ class MechanicViewSet(viewsets.ModelViewSet):
             return qs.all()
         return qs.filter(user=self.request.user)
 
+    upload_rules = {'register': {'passport_photo': UploadRule()}}
+
     @action(detail=False, methods=['post'], permission_classes=[AllowAny])
     def register(self, request):
+        rejection = upload_rejection(request)
+        if rejection:
+            return Response({'passport_photo': [rejection]}, status=status.HTTP_400_BAD_REQUEST)
+        
         serializer = MechanicRegistrationSerializer(data=request.data)
         if serializer.is_valid():
             mechanic = serializer.save()
             
             # Send confirmation emails
-            try:
-                # Email to mechanic
-                send_mail(
-                    'SwiftCar - Application Received',
-                    f'Dear {mechanic.user.get_full_name()},\n\nWe have received your application to become a SwiftCar mechanic. We will review your details and get back to you soon.\n\nThank you,\nSwiftCar Team',
-                    settings.DEFAULT_FROM_EMAIL,
-                    [mechanic.user.email],
-                    fail_silently=True,
-                )
-                
-                # Email to admin
-                send_mail(
-                    'SwiftCar - New Mechanic Application',
-                    f'A new mechanic has applied:\n\nName: {mechanic.user.get_full_name()}\nEmail: {mechanic.user.email}\nPhone: {mechanic.phone_number}\n\nPlease review in the admin panel.',
-                    settings.DEFAULT_FROM_EMAIL,
-                    [settings.ADMIN_EMAIL],
-                    fail_silently=True,
-                )
-            except Exception as e:
-                print(f"Email sending failed: {e}")
+            # Email to mechanic
+            queue_mail(
+                'SwiftCar - Application Received',
+                f'Dear {mechanic.user.get_full_name()},\n\nWe have received your application to become a SwiftCar mechanic. We will review your details and get back to you soon.\n\nThank you,\nSwiftCar Team',
+                settings.DEFAULT_FROM_EMAIL,
+                [mechanic.user.email],
+            )
+            
+            # Email to admin
+            queue_mail(
+                'SwiftCar - New Mechanic Application',
+                f'A new mechanic has applied:\n\nName: {mechanic.user.get_full_name()}\nEmail: {mechanic.user.email}\nPhone: {mechanic.phone_number}\n\nPlease review in the admin panel.',
+                settings.DEFAULT_FROM_EMAIL,
+                [settings.ADMIN_EMAIL],
+            )
             
             return Response({
                 'message': 'Application submitted successfully! We will review your details and get back to you soon.',
@@ -263,20 +289,16 @@ class MechanicViewSet(viewsets.ModelViewSet):
         mechanic.save()
         
         # Send approval email
-        try:
-            send_mail(
-                'SwiftCar - Application Approved',
-                f'Dear {mechanic.user.get_full_name()},\n\nCongratulations! Your application has been approved. You can now log in to your mechanic portal.\n\nThank you,\nSwiftCar Team',
-                settings.DEFAULT_FROM_EMAIL,
-                [mechanic.user.email],
-                fail_silently=True,
-            )
-        except Exception as e:
-            print(f"Email sending failed: {e}")
+        queue_mail(
+            'SwiftCar - Application Approved',
+            f'Dear {mechanic.user.get_full_name()},\n\nCongratulations! Your application has been approved. You can now log in to your mechanic portal.\n\nThank you,\nSwiftCar Team',
+            settings.DEFAULT_FROM_EMAIL,
+            [mechanic.user.email],
+        )
         
         return Response({'message': 'Mechanic approved successfully'})
 
-class GarageViewSet(viewsets.ModelViewSet):
+class GarageViewSet(ValidatedUploadMixin, viewsets.ModelViewSet):
     queryset = Garage.objects.select_related('user').prefetch_related('images').all()
     serializer_class = GarageSerializer
     permission_classes = [IsAuthenticated]
@@ -291,6 +313,38 @@ class GarageViewSet(viewsets.ModelViewSet):
         # For drivers/mechanics and other users, show all approved garages
         return qs.filter(status='approved')
 
+    @action(detail=False, methods=['get'])
+    def nearest(self, request):
+        """The k approved garages nearest to ?lat=&lng= or to ?service_request=<id>'s pickup"""
+        lat = lng = None
+        service_request_id = request.query_params.get('service_request')
+        if service_request_id:
+            role = get_role(request)
+            request_qs = ServiceRequest.objects.all()
+            if not request.user.is_staff:
+                if role.car_owner_id:
+                    request_qs = request_qs.filter(owner_id=role.car_owner_id)
+                elif role.mechanic_id:
+                    request_qs = request_qs.filter(assigned_mechanic_id=role.mechanic_id)
+                else:
+                    request_qs = request_qs.none()
+            service_request = get_object_or_404(request_qs, pk=service_request_id)
+            lat, lng = service_request.pickup_latitude, service_request.pickup_longitude
+            if lat is None or lng is None:
+                return Response({'error': 'This request has no pickup coordinates'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        lat, lng, k, error = _nearest_params(request, lat, lng)
+        if error:
+            return error
+        
+        garages = Garage.objects.select_related('user').prefetch_related('images').filter(status='approved')
+        results = []
+        for garage, distance in nearest(garages, lat, lng, k, 'latitude', 'longitude', 'geohash'):
+            data = GarageSerializer(garage, context={'request': request}).data
+            data['distance_km'] = round(distance, 2)
+            results.append(data)
+        return Response(results)
+
     @action(detail=False, methods=['post'], permission_classes=[AllowAny])
     def register(self, request):
         serializer = GarageRegistrationSerializer(data=request.data)
@@ -298,24 +352,19 @@ class GarageViewSet(viewsets.ModelViewSet):
             garage = serializer.save()
             
             # Send confirmation emails
-            try:
-                send_mail(
-                    'SwiftCar - Garage Registration Received',
-                    f'Dear {garage.owner_name},\n\nWe have received your garage registration. We will verify your details and get back to you soon.\n\nThank you,\nSwiftCar Team',
-                    settings.DEFAULT_FROM_EMAIL,
-                    [garage.owner_email],
-                    fail_silently=True,
-                )
-                
-                send_mail(
-                    'SwiftCar - New Garage Registration',
-                    f'A new garage has registered:\n\nName: {garage.name}\nOwner: {garage.owner_name}\nEmail: {garage.owner_email}\nPhone: {garage.owner_phone}\n\nPlease review in the admin panel.',
-                    settings.DEFAULT_FROM_EMAIL,
-                    [settings.ADMIN_EMAIL],
-                    fail_silently=True,
-                )
-            except Exception as e:
-                print(f"Email sending failed: {e}")
+            queue_mail(
+                'SwiftCar - Garage Registration Received',
+                f'Dear {garage.owner_name},\n\nWe have received your garage registration. We will verify your details and get back to you soon.\n\nThank you,\nSwiftCar Team',
+                settings.DEFAULT_FROM_EMAIL,
+                [garage.owner_email],
+            )
+            
+            queue_mail(
+                'SwiftCar - New Garage Registration',
+                f'A new garage has registered:\n\nName: {garage.name}\nOwner: {garage.owner_name}\nEmail: {garage.owner_email}\nPhone: {garage.owner_phone}\n\nPlease review in the admin panel.',
+                settings.DEFAULT_FROM_EMAIL,
+                [settings.ADMIN_EMAIL],
+            )
             
             return Response({
                 'message': 'Registration submitted successfully! We will verify your details and get back to you soon.',
@@ -351,31 +400,31 @@ class GarageViewSet(viewsets.ModelViewSet):
         frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:3000')
         portal_link = f'{frontend_url}/portal/garage'
         
-        try:
-            send_mail(
-                'SwiftCar - Garage Approved',
-                f'Dear {garage.owner_name},\n\n'
-                f'Congratulations! Your garage "{garage.name}" registration has been approved.\n\n'
-                f'You can now access your garage portal using the link below:\n\n'
-                f'{portal_link}\n\n'
-                f'Use your registered email ({garage.owner_email}) to log in.\n\n'
-                f'Thank you for joining SwiftCar!\n\n'
-                f'Best regards,\n'
-                f'The SwiftCar Team',
-                settings.DEFAULT_FROM_EMAIL,
-                [garage.owner_email],
-                fail_silently=True,
-            )
-        except Exception as e:
-            print(f"Email sending failed: {e}")
+        queue_mail(
+            'SwiftCar - Garage Approved',
+            f'Dear {garage.owner_name},\n\n'
+            f'Congratulations! Your garage "{garage.name}" registration has been approved.\n\n'
+            f'You can now access your garage portal using the link below:\n\n'
+            f'{portal_link}\n\n'
+            f'Use your registered email ({garage.owner_email}) to log in.\n\n'
+            f'Thank you for joining SwiftCar!\n\n'
+            f'Best regards,\n'
+            f'The SwiftCar Team',
+            settings.DEFAULT_FROM_EMAIL,
+            [garage.owner_email],
+        )
         
         return Response({'message': 'Garage approved successfully'})
 
-    ALLOWED_IMAGE_TYPES = ['image/jpeg', 'image/png', 'image/webp']
-    MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5MB
+    # Type, size and count are checked while the body streams in (see cars.uploads)
+    upload_rules = {'upload_images': {'images': UploadRule(max_files=10)}}
 
     @action(detail=True, methods=['post'])
     def upload_images(self, request, pk=None):
+        rejection = upload_rejection(request)
+        if rejection:
+            return Response({'error': rejection}, status=status.HTTP_400_BAD_REQUEST)
+        
         garage = self.get_object()
         
         # Authorization: only the garage owner or admin can upload images
@@ -387,24 +436,15 @@ class GarageViewSet(viewsets.ModelViewSet):
         if not images:
             return Response({'error': 'No images provided'}, status=status.HTTP_400_BAD_REQUEST)
         
-        if len(images) > 10:
-            return Response({'error': 'Maximum 10 images per upload'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Validate each image
-        for image in images:
-            if image.content_type not in self.ALLOWED_IMAGE_TYPES:
-                return Response(
-                    {'error': f'Invalid file type: {image.content_type}. Allowed: JPEG, PNG, WebP'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            if image.size > self.MAX_IMAGE_SIZE:
-                return Response(
-                    {'error': f'File {image.name} exceeds 5MB limit'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        
-        for image in images:
-            GarageImage.objects.create(garage=garage, image=image)
+        # Decode, strip and resize all photos in parallel before storing any
+        try:
+            processed = process_images(images)
+        except InvalidImage as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        with transaction.atomic():
+            created = GarageImage.objects.bulk_create([GarageImage.from_processed(garage, item) for item in processed])
+            add_references(created)  # bulk_create skips the signals that count them
         
         return Response({'message': f'{len(images)} images uploaded successfully'})
 
@@ -414,100 +454,233 @@ class ServiceRequestViewSet(viewsets.ModelViewSet):
     ).prefetch_related('work_items').all()
     serializer_class = ServiceRequestSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtKeysetPagination
+
+    # Actions that return compact list rows
+    list_actions = ('list', 'open_jobs', 'my_jobs', 'nearest_jobs')
+
+    def get_serializer_class(self):
+        if self.action in self.list_actions:
+            return ServiceRequestListSerializer
+        return ServiceRequestSerializer
+
+    def _base_queryset(self):
+        if self.action not in self.list_actions:
+            return ServiceRequest.objects.select_related(
+                'car__owner__user', 'owner__user', 'assigned_mechanic__user', 'assigned_garage__user'
+            ).prefetch_related('work_items')
+        
+        # The compact list rows only need names; join the rest when expanded
+        qs = ServiceRequest.objects.select_related('car', 'owner__user', 'assigned_mechanic__user', 'assigned_garage')
+        expand = query_param_set(self.request, 'expand')
+        if 'car_details' in expand:
+            qs = qs.select_related('car__owner__user')
+        if 'garage_details' in expand:
+            qs = qs.select_related('assigned_garage__user').prefetch_related('assigned_garage__images')
+        if 'work_items' in expand:
+            qs = qs.prefetch_related('work_items')
+        return qs
 
     def get_queryset(self):
         user = self.request.user
-        qs = ServiceRequest.objects.select_related(
-            'car__owner__user', 'owner__user', 'assigned_mechanic__user', 'assigned_garage__user'
-        ).prefetch_related('work_items')
+        qs = self._base_queryset()
         
         if user.is_staff:
             return qs.all()
         
-        # Car owner
-        try:
-            car_owner = CarOwner.objects.get(user=user)
-            return qs.filter(owner=car_owner)
-        except CarOwner.DoesNotExist:
-            pass
+        role = get_role(self.request)
         
-        # Mechanic - see pending requests (to accept) plus their assigned requests
-        try:
-            mechanic = Mechanic.objects.get(user=user)
-            # Show all pending requests + requests assigned to this mechanic
+        # Car owner
+        if role.car_owner_id:
+            return qs.filter(owner_id=role.car_owner_id)
+        
+        # Mechanic - see pending requests (to accept) plus their assigned requests.
+        # The driver app reads the open_jobs and my_jobs feeds, which each use
+        # a single index; this combined view no longer needs DISTINCT since
+        # nothing here joins a multi-valued relation.
+        if role.mechanic_id:
             return qs.filter(
-                models.Q(status='pending') | models.Q(assigned_mechanic=mechanic)
-            ).distinct()
-        except Mechanic.DoesNotExist:
-            pass
+                models.Q(status='pending') | models.Q(assigned_mechanic_id=role.mechanic_id)
+            )
         
         # Garage
-        try:
-            garage = Garage.objects.get(user=user)
-            return qs.filter(assigned_garage=garage)
-        except Garage.DoesNotExist:
-            pass
+        if role.garage_id:
+            return qs.filter(assigned_garage_id=role.garage_id)
         
         return ServiceRequest.objects.none()
 
     def perform_create(self, serializer):
         car_owner = CarOwner.objects.get(user=self.request.user)
-        # Save as pending - drivers will see and accept from their dashboard
-        serializer.save(owner=car_owner, status='pending')
+        # Save as pending - drivers will see and accept from their dashboard,
+        # unless automatic dispatch assigns one first
+        service_request = serializer.save(owner=car_owner, status='pending')
+        dispatch_on_create(service_request)
+
+    @action(detail=False, methods=['post'])
+    def dispatch_batch(self, request):
+        """Admin: assign a batch of pending requests to drivers now"""
+        if not request.user.is_staff:
+            return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+        
+        assigned = dispatch_pending()
+        return Response({
+            'message': f'{len(assigned)} requests assigned',
+            'assignments': [{'service_request': request_id, 'mechanic': mechanic_id} for request_id, mechanic_id in assigned],
+        })
+
+    def _paginated_list(self, queryset):
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def open_jobs(self, request):
+        """Pending requests drivers can accept, newest first.
+
+        Optional filters: ``date_from``/``date_to`` (preferred_date window,
+        YYYY-MM-DD) and ``area`` (matched against the pickup location).
+        """
+        role = get_role(request)
+        if not (request.user.is_staff or role.is_approved_mechanic):
+            return Response({'error': 'Only approved drivers can view open jobs'}, status=status.HTTP_403_FORBIDDEN)
+        
+        qs = self._base_queryset().filter(status='pending')
+        
+        for param, lookup in (('date_from', 'preferred_date__gte'), ('date_to', 'preferred_date__lte')):
+            value, error = _date_param(request, param)
+            if error:
+                return error
+            if value:
+                qs = qs.filter(**{lookup: value})
+        
+        area = request.query_params.get('area', '').strip()
+        if area:
+            qs = qs.filter(pickup_location__icontains=area)
+        
+        return self._paginated_list(qs)
+
+    @action(detail=False, methods=['get'])
+    def nearest_jobs(self, request):
+        """The k pending jobs whose pickup is nearest to the driver's ?lat=&lng="""
+        role = get_role(request)
+        if not (request.user.is_staff or role.is_approved_mechanic):
+            return Response({'error': 'Only approved drivers can view open jobs'}, status=status.HTTP_403_FORBIDDEN)
+        
+        lat, lng, k, error = _nearest_params(request)
+        if error:
+            return error
+        
+        jobs = self._base_queryset().filter(status='pending')
+        results = []
+        for job, distance in nearest(jobs, lat, lng, k, 'pickup_latitude', 'pickup_longitude', 'pickup_geohash'):
+            data = self.get_serializer(job).data
+            data['distance_km'] = round(distance, 2)
+            results.append(data)
+        return Response(results)
+
+    @action(detail=False, methods=['get'])
+    def my_jobs(self, request):
+        """Requests assigned to the calling driver, optionally filtered by ``status``"""
+        role = get_role(request)
+        if not role.mechanic_id:
+            return Response({'error': 'Only drivers can view their jobs'}, status=status.HTTP_403_FORBIDDEN)
+        
+        qs = self._base_queryset().filter(assigned_mechanic_id=role.mechanic_id)
+        job_status = request.query_params.get('status')
+        if job_status:
+            qs = qs.filter(status=job_status)
+        
+        return self._paginated_list(qs)
 
     @action(detail=True, methods=['post'])
     def accept_job(self, request, pk=None):
-        """Driver accepts a pending service request"""
-        service_request = self.get_object()
-        
-        # Check if the user is an approved mechanic/driver
-        try:
-            mechanic = Mechanic.objects.get(user=request.user, status='approved')
-        except Mechanic.DoesNotExist:
+        """Driver accepts a pending service request.
+
+        Acceptance is a single conditional UPDATE (compare-and-set on
+        status='pending'), so when several drivers accept at once exactly
+        one of them wins and the rest are told the job was taken.
+        """
+        role = get_role(request)
+        if not role.is_approved_mechanic:
             return Response({'error': 'Only approved drivers can accept jobs'}, status=status.HTTP_403_FORBIDDEN)
         
-        # Check if request is still pending
-        if service_request.status != 'pending':
-            return Response({'error': 'This request has already been taken'}, status=status.HTTP_400_BAD_REQUEST)
+        owner_id = get_object_or_404(ServiceRequest.objects.values_list('owner_id', flat=True), pk=pk)
         
-        # Assign the driver
-        service_request.assigned_mechanic = mechanic
-        service_request.status = 'assigned'
-        service_request.save()
+        accepted = ServiceRequest.objects.filter(pk=pk).transition(
+            'accept', actor=request.user, assigned_mechanic_id=role.mechanic_id
+        )
+        if not accepted:
+            return Response({'error': 'This request has already been taken'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Notify the car owner
         Notification.objects.create(
             recipient_type='owner',
-            recipient_owner=service_request.owner,
+            recipient_owner_id=owner_id,
             title='Driver Assigned',
             message=f'A driver has accepted your service request and will pick up your car soon.'
         )
         
-        return Response({'message': 'Job accepted successfully'})
+        return Response({'message': 'Job accepted successfully', 'mechanic_id': role.mechanic_id})
+
+    @action(detail=True, methods=['get'])
+    def timeline(self, request, pk=None):
+        """Lifecycle events of a request, oldest first"""
+        if not self.get_queryset().filter(pk=pk).exists():
+            return Response({'error': 'Service request not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        events = ServiceRequestEvent.objects.filter(service_request_id=pk).select_related('actor')
+        return Response(ServiceRequestEventSerializer(events, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def stage_metrics(self, request):
+        """Admin: time spent in each lifecycle stage, from the event log.
+
+        Optional ``date_from``/``date_to`` (YYYY-MM-DD) limit it to
+        transitions made in that window.
+        """
+        if not request.user.is_staff:
+            return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+        
+        events = ServiceRequestEvent.objects.all()
+        # Whole days as a created_at range, so the window can use the index
+        for param, lookup, days in (('date_from', 'created_at__gte', 0), ('date_to', 'created_at__lt', 1)):
+            value, error = _date_param(request, param)
+            if error:
+                return error
+            if value:
+                day_start = timezone.make_aware(datetime.combine(value + timedelta(days=days), datetime.min.time()))
+                events = events.filter(**{lookup: day_start})
+        
+        return Response(events.stage_metrics())
+
+    def _transition_failed(self, pk, message, mechanic_id=None, garage_id=None):
+        """Explain why a guarded transition matched no row"""
+        current = ServiceRequest.objects.filter(pk=pk).values('assigned_mechanic_id', 'assigned_garage_id').first()
+        if current is None:
+            return Response({'error': 'Service request not found'}, status=status.HTTP_404_NOT_FOUND)
+        if mechanic_id is not None and current['assigned_mechanic_id'] != mechanic_id:
+            return Response({'error': 'You are not assigned to this request'}, status=status.HTTP_403_FORBIDDEN)
+        if garage_id is not None and current['assigned_garage_id'] != garage_id:
+            return Response({'error': 'This request is not at your garage'}, status=status.HTTP_403_FORBIDDEN)
+        return Response({'error': message}, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['post'])
     def pickup_car(self, request, pk=None):
         """Driver picks up the car from owner"""
-        service_request = self.get_object()
-        
-        try:
-            mechanic = Mechanic.objects.get(user=request.user)
-        except Mechanic.DoesNotExist:
+        role = get_role(request)
+        if not role.mechanic_id:
             return Response({'error': 'Only drivers can perform this action'}, status=status.HTTP_403_FORBIDDEN)
         
-        if service_request.assigned_mechanic != mechanic:
-            return Response({'error': 'You are not assigned to this request'}, status=status.HTTP_403_FORBIDDEN)
-        
-        if service_request.status != 'assigned':
-            return Response({'error': 'Cannot pick up car at this stage'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        service_request.status = 'picked_up'
-        service_request.save()
+        moved = ServiceRequest.objects.filter(pk=pk, assigned_mechanic_id=role.mechanic_id).transition(
+            'pickup', actor=request.user
+        )
+        if not moved:
+            return self._transition_failed(pk, 'Cannot pick up car at this stage', mechanic_id=role.mechanic_id)
         
         # Notify owner
         Notification.objects.create(
             recipient_type='owner',
-            recipient_owner=service_request.owner,
+            recipient_owner_id=ServiceRequest.objects.values_list('owner_id', flat=True).get(pk=pk),
             title='Car Picked Up',
             message='Your car has been picked up by the driver and is on its way to the garage.'
         )
@@ -517,28 +690,22 @@ class ServiceRequestViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def deliver_to_garage(self, request, pk=None):
         """Driver delivers car to selected garage"""
-        service_request = self.get_object()
-        garage_id = request.data.get('garage_id')
-        
-        try:
-            mechanic = Mechanic.objects.get(user=request.user)
-        except Mechanic.DoesNotExist:
+        role = get_role(request)
+        if not role.mechanic_id:
             return Response({'error': 'Only drivers can perform this action'}, status=status.HTTP_403_FORBIDDEN)
         
-        if service_request.assigned_mechanic != mechanic:
-            return Response({'error': 'You are not assigned to this request'}, status=status.HTTP_403_FORBIDDEN)
-        
-        if service_request.status != 'picked_up':
-            return Response({'error': 'Car must be picked up first'}, status=status.HTTP_400_BAD_REQUEST)
-        
         try:
-            garage = Garage.objects.get(id=garage_id, status='approved')
-        except Garage.DoesNotExist:
+            garage = Garage.objects.only('id', 'name').get(id=request.data.get('garage_id'), status='approved')
+        except (Garage.DoesNotExist, ValueError, TypeError):
             return Response({'error': 'Garage not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        service_request.assigned_garage = garage
-        service_request.status = 'in_service'
-        service_request.save()
+        moved = ServiceRequest.objects.filter(pk=pk, assigned_mechanic_id=role.mechanic_id).transition(
+            'deliver_to_garage', actor=request.user, assigned_garage_id=garage.pk
+        )
+        if not moved:
+            return self._transition_failed(pk, 'Car must be picked up first', mechanic_id=role.mechanic_id)
+        
+        service_request = ServiceRequest.objects.select_related('car').get(pk=pk)
         
         # Notify garage
         Notification.objects.create(
@@ -551,28 +718,32 @@ class ServiceRequestViewSet(viewsets.ModelViewSet):
         # Notify owner
         Notification.objects.create(
             recipient_type='owner',
-            recipient_owner=service_request.owner,
+            recipient_owner_id=service_request.owner_id,
             title='Car At Garage',
             message=f'Your car has arrived at {garage.name} and service has begun.'
         )
         
         return Response({'message': 'Car delivered to garage successfully'})
 
-    @action(detail=True, methods=['post'])
-    def add_work_item(self, request, pk=None):
-        """Garage adds a work item (service done) to the request"""
+    def _get_garage_service_request(self, request, action_label):
+        """Return (service_request, error_response) for actions only the assigned garage may take"""
         service_request = self.get_object()
+        role = get_role(request)
         
-        try:
-            garage = Garage.objects.get(user=request.user)
-        except Garage.DoesNotExist:
-            return Response({'error': 'Only garages can add work items'}, status=status.HTTP_403_FORBIDDEN)
+        if not role.garage_id:
+            return service_request, Response({'error': f'Only garages can {action_label}'}, status=status.HTTP_403_FORBIDDEN)
         
-        if service_request.assigned_garage != garage:
-            return Response({'error': 'This request is not at your garage'}, status=status.HTTP_403_FORBIDDEN)
+        if service_request.assigned_garage_id != role.garage_id:
+            return service_request, Response({'error': 'This request is not at your garage'}, status=status.HTTP_403_FORBIDDEN)
         
-        if service_request.status != 'in_service':
-            return Response({'error': 'Can only add work items when service is in progress'}, status=status.HTTP_400_BAD_REQUEST)
+        return service_request, None
+
+    @action(detail=True, methods=['post'])
+    def add_work_item(self, request, pk=None):
+        """Garage adds a work item (service done) to the request"""
+        service_request, error = self._get_garage_service_request(request, 'add work items')
+        if error:
+            return error
         
         description = request.data.get('description')
         cost = request.data.get('cost')
@@ -581,24 +752,21 @@ class ServiceRequestViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Description and cost are required'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            from decimal import Decimal
             cost = Decimal(str(cost))
-        except:
+        except InvalidOperation:
             return Response({'error': 'Invalid cost value'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Create the work item
-        work_item = ServiceWorkItem.objects.create(
-            service_request=service_request,
-            description=description,
-            cost=cost
-        )
-        
-        # Update garage_cost (sum of all work items)
-        total_garage_cost = service_request.work_items.aggregate(total=models.Sum('cost'))['total'] or Decimal('0')
-        service_request.garage_cost = total_garage_cost
-        # Calculate total cost for customer
-        service_request.total_cost = service_request.calculate_customer_total()
-        service_request.save()
+        with transaction.atomic():
+            service_request = ServiceRequest.objects.select_for_update().get(pk=service_request.pk)
+            if service_request.status != 'in_service':
+                return Response({'error': 'Can only add work items when service is in progress'}, status=status.HTTP_400_BAD_REQUEST)
+            
+            work_item = ServiceWorkItem.objects.create(
+                service_request=service_request,
+                description=description,
+                cost=cost
+            )
+            service_request.apply_cost_delta(cost)
         
         return Response({
             'message': 'Work item added successfully',
@@ -610,65 +778,104 @@ class ServiceRequestViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['delete'])
     def remove_work_item(self, request, pk=None):
         """Garage removes a work item"""
-        service_request = self.get_object()
+        service_request, error = self._get_garage_service_request(request, 'remove work items')
+        if error:
+            return error
+        
         work_item_id = request.data.get('work_item_id')
         
+        with transaction.atomic():
+            service_request = ServiceRequest.objects.select_for_update().get(pk=service_request.pk)
+            try:
+                work_item = ServiceWorkItem.objects.get(id=work_item_id, service_request=service_request)
+            except (ServiceWorkItem.DoesNotExist, ValueError, TypeError):
+                return Response({'error': 'Work item not found'}, status=status.HTTP_404_NOT_FOUND)
+            
+            work_item.delete()
+            service_request.apply_cost_delta(-work_item.cost)
+        
+        return Response({
+            'message': 'Work item removed',
+            'garage_cost': str(service_request.garage_cost),
+            'total_cost': str(service_request.total_cost)
+        })
+
+    @action(detail=True, methods=['post'])
+    def work_items(self, request, pk=None):
+        """Garage adds and/or removes many work items in one call.
+
+        Body: {"add": [{"description": ..., "cost": ...}, ...], "remove": [work_item_id, ...]}
+        """
+        service_request, error = self._get_garage_service_request(request, 'change work items')
+        if error:
+            return error
+        
+        add_serializer = ServiceWorkItemSerializer(data=request.data.get('add', []), many=True)
+        if not add_serializer.is_valid():
+            return Response({'add': add_serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        remove_ids = request.data.get('remove', [])
+        if not isinstance(remove_ids, list):
+            return Response({'error': 'remove must be a list of work item ids'}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            garage = Garage.objects.get(user=request.user)
-        except Garage.DoesNotExist:
-            return Response({'error': 'Only garages can remove work items'}, status=status.HTTP_403_FORBIDDEN)
+            remove_ids = {int(work_item_id) for work_item_id in remove_ids}
+        except (TypeError, ValueError):
+            return Response({'error': 'remove must be a list of work item ids'}, status=status.HTTP_400_BAD_REQUEST)
         
-        if service_request.assigned_garage != garage:
-            return Response({'error': 'This request is not at your garage'}, status=status.HTTP_403_FORBIDDEN)
+        if not add_serializer.validated_data and not remove_ids:
+            return Response({'error': 'Nothing to add or remove'}, status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            work_item = ServiceWorkItem.objects.get(id=work_item_id, service_request=service_request)
-            work_item.delete()
+        with transaction.atomic():
+            service_request = ServiceRequest.objects.select_for_update().get(pk=service_request.pk)
+            if service_request.status != 'in_service':
+                return Response({'error': 'Can only change work items when service is in progress'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Recalculate costs
-            from decimal import Decimal
-            total_garage_cost = service_request.work_items.aggregate(total=models.Sum('cost'))['total'] or Decimal('0')
-            service_request.garage_cost = total_garage_cost
-            service_request.total_cost = service_request.calculate_customer_total()
-            service_request.save()
+            removed = dict(
+                ServiceWorkItem.objects.filter(service_request=service_request, id__in=remove_ids)
+                .values_list('id', 'cost')
+            )
+            missing = remove_ids - removed.keys()
+            if missing:
+                return Response({'error': f'Work items not found: {sorted(missing)}'}, status=status.HTTP_404_NOT_FOUND)
             
-            return Response({
-                'message': 'Work item removed',
-                'garage_cost': str(service_request.garage_cost),
-                'total_cost': str(service_request.total_cost)
-            })
-        except ServiceWorkItem.DoesNotExist:
-            return Response({'error': 'Work item not found'}, status=status.HTTP_404_NOT_FOUND)
+            if removed:
+                ServiceWorkItem.objects.filter(id__in=removed).delete()
+            added = ServiceWorkItem.objects.bulk_create([
+                ServiceWorkItem(service_request=service_request, **item)
+                for item in add_serializer.validated_data
+            ])
+            
+            delta = sum((item.cost for item in added), Decimal('0')) - sum(removed.values(), Decimal('0'))
+            service_request.apply_cost_delta(delta)
+        
+        return Response({
+            'message': f'{len(added)} work items added, {len(removed)} removed',
+            'work_items': ServiceWorkItemSerializer(added, many=True).data,
+            'garage_cost': str(service_request.garage_cost),
+            'total_cost': str(service_request.total_cost)
+        })
 
     @action(detail=True, methods=['post'])
     def complete_service(self, request, pk=None):
         """Garage marks service as complete"""
-        service_request = self.get_object()
-        
-        try:
-            garage = Garage.objects.get(user=request.user)
-        except Garage.DoesNotExist:
+        role = get_role(request)
+        if not role.garage_id:
             return Response({'error': 'Only garages can complete services'}, status=status.HTTP_403_FORBIDDEN)
         
-        if service_request.assigned_garage != garage:
-            return Response({'error': 'This request is not at your garage'}, status=status.HTTP_403_FORBIDDEN)
-        
-        if service_request.status != 'in_service':
-            return Response({'error': 'Service is not in progress'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Calculate final costs before completing
-        from decimal import Decimal
-        total_garage_cost = service_request.work_items.aggregate(total=models.Sum('cost'))['total'] or Decimal('0')
-        service_request.garage_cost = total_garage_cost
-        service_request.total_cost = service_request.calculate_customer_total()
-        service_request.status = 'completed'
-        service_request.save()
+        # The customer total is derived in the same guarded UPDATE that
+        # flips the status (see ServiceRequest.transition_changes)
+        moved = ServiceRequest.objects.filter(pk=pk, assigned_garage_id=role.garage_id).transition(
+            'complete', actor=request.user
+        )
+        if not moved:
+            return self._transition_failed(pk, 'Service is not in progress', garage_id=role.garage_id)
+        service_request = ServiceRequest.objects.select_related('car').get(pk=pk)
         
         # Notify driver to pick up
-        if service_request.assigned_mechanic:
+        if service_request.assigned_mechanic_id:
             Notification.objects.create(
                 recipient_type='mechanic',
-                recipient_mechanic=service_request.assigned_mechanic,
+                recipient_mechanic_id=service_request.assigned_mechanic_id,
                 title='Service Complete',
                 message=f'The service for {service_request.car.make} {service_request.car.model} is complete. Please pick up and return to owner.'
             )
@@ -676,7 +883,7 @@ class ServiceRequestViewSet(viewsets.ModelViewSet):
         # Notify owner with cost details
         Notification.objects.create(
             recipient_type='owner',
-            recipient_owner=service_request.owner,
+            recipient_owner_id=service_request.owner_id,
             title='Service Complete',
             message=f'Your car service has been completed! Total cost: KSH {service_request.total_cost}. The driver will return your car soon.'
         )
@@ -690,26 +897,20 @@ class ServiceRequestViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def return_to_owner(self, request, pk=None):
         """Driver returns car to owner"""
-        service_request = self.get_object()
-        
-        try:
-            mechanic = Mechanic.objects.get(user=request.user)
-        except Mechanic.DoesNotExist:
+        role = get_role(request)
+        if not role.mechanic_id:
             return Response({'error': 'Only drivers can perform this action'}, status=status.HTTP_403_FORBIDDEN)
         
-        if service_request.assigned_mechanic != mechanic:
-            return Response({'error': 'You are not assigned to this request'}, status=status.HTTP_403_FORBIDDEN)
-        
-        if service_request.status != 'completed':
-            return Response({'error': 'Service must be completed first'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        service_request.status = 'delivered'
-        service_request.save()
+        moved = ServiceRequest.objects.filter(pk=pk, assigned_mechanic_id=role.mechanic_id).transition(
+            'return_to_owner', actor=request.user
+        )
+        if not moved:
+            return self._transition_failed(pk, 'Service must be completed first', mechanic_id=role.mechanic_id)
         
         # Notify owner
         Notification.objects.create(
             recipient_type='owner',
-            recipient_owner=service_request.owner,
+            recipient_owner_id=ServiceRequest.objects.values_list('owner_id', flat=True).get(pk=pk),
             title='Car Returned',
             message='Your car has been returned. Thank you for using SwiftServe!'
         )
@@ -721,17 +922,32 @@ class ServiceRequestViewSet(viewsets.ModelViewSet):
         if not request.user.is_staff:
             return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
         
-        service_request = self.get_object()
         mechanic_id = request.data.get('mechanic_id')
-        
         try:
-            mechanic = Mechanic.objects.get(id=mechanic_id, status='approved')
-            service_request.assigned_mechanic = mechanic
-            service_request.status = 'assigned'
-            service_request.save()
-            return Response({'message': 'Mechanic assigned successfully'})
-        except Mechanic.DoesNotExist:
+            mechanic_exists = Mechanic.objects.filter(id=mechanic_id, status='approved').exists()
+        except (ValueError, TypeError):
+            mechanic_exists = False
+        if not mechanic_exists:
             return Response({'error': 'Mechanic not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        moved = ServiceRequest.objects.filter(pk=pk).transition(
+            'assign', actor=request.user, assigned_mechanic_id=mechanic_id
+        )
+        if not moved:
+            return self._transition_failed(pk, 'A driver can only be assigned before pickup')
+        return Response({'message': 'Mechanic assigned successfully'})
+
+    def _transition_for_status(self, new_status):
+        """(transition name, error response) for an admin status change"""
+        if new_status not in dict(ServiceRequest.STATUS_CHOICES):
+            return None, Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
+        name = ServiceRequest.transition_for_status(new_status)
+        if name is None:
+            return None, Response(
+                {'error': f'Use the dedicated action to move a request to {new_status}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return name, None
 
     @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
@@ -739,15 +955,42 @@ class ServiceRequestViewSet(viewsets.ModelViewSet):
         if not request.user.is_staff:
             return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
         
-        service_request = self.get_object()
-        new_status = request.data.get('status')
+        name, error = self._transition_for_status(request.data.get('status'))
+        if error:
+            return error
+        
+        if not ServiceRequest.objects.filter(pk=pk).transition(name, actor=request.user):
+            return self._transition_failed(pk, f'Cannot move this request to {request.data["status"]} from its current status')
+        return Response({'message': 'Status updated successfully'})
+
+    @action(detail=False, methods=['post'])
+    def bulk_transition(self, request):
+        """Admin: move many requests to a status in one UPDATE.
+
+        Body: {"ids": [...], "status": "cancelled"}. Requests that can't make
+        that move from their current status are left alone and reported.
+        """
+        if not request.user.is_staff:
+            return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+        
+        name, error = self._transition_for_status(request.data.get('status'))
+        if error:
+            return error
+        
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return Response({'error': 'ids must be a non-empty list of service request ids'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = {int(request_id) for request_id in ids}
+        except (TypeError, ValueError):
+            return Response({'error': 'ids must be a non-empty list of service request ids'}, status=status.HTTP_400_BAD_REQUEST)
         
-        if new_status in dict(ServiceRequest.STATUS_CHOICES):
-            service_request.status = new_status
-            service_request.save()
-            return Response({'message': 'Status updated successfully'})
+        moved = ServiceRequest.objects.filter(pk__in=ids).transition(name, actor=request.user)
         
-        return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'updated': sorted(moved),
+            'skipped': sorted(ids - set(moved)),
+        })
 
 class ServiceRecordViewSet(viewsets.ModelViewSet):
     queryset = ServiceRecord.objects.select_related(
@@ -756,32 +999,44 @@ class ServiceRecordViewSet(viewsets.ModelViewSet):
     serializer_class = ServiceRecordSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ServiceRecordListSerializer
+        return ServiceRecordSerializer
+
+    def _base_queryset(self):
+        if self.action != 'list':
+            return ServiceRecord.objects.select_related(
+                'car__owner__user', 'mechanic_pickup__user', 'mechanic_return__user', 'garage__user'
+            ).prefetch_related('items')
+        
+        qs = ServiceRecord.objects.select_related('car', 'mechanic_pickup__user', 'mechanic_return__user', 'garage')
+        expand = query_param_set(self.request, 'expand')
+        if 'car_details' in expand:
+            qs = qs.select_related('car__owner__user')
+        if 'garage_details' in expand:
+            qs = qs.select_related('garage__user').prefetch_related('garage__images')
+        if 'items' in expand:
+            qs = qs.prefetch_related('items')
+        return qs
+
     def get_queryset(self):
         user = self.request.user
-        qs = ServiceRecord.objects.select_related(
-            'car__owner__user', 'mechanic_pickup__user', 'mechanic_return__user', 'garage__user'
-        ).prefetch_related('items')
+        qs = self._base_queryset()
         
         if user.is_staff:
             return qs.all()
         
-        try:
-            car_owner = CarOwner.objects.get(user=user)
-            return qs.filter(car__owner=car_owner)
-        except CarOwner.DoesNotExist:
-            pass
+        role = get_role(self.request)
         
-        try:
-            mechanic = Mechanic.objects.get(user=user)
-            return qs.filter(mechanic_pickup=mechanic) | qs.filter(mechanic_return=mechanic)
-        except Mechanic.DoesNotExist:
-            pass
+        if role.car_owner_id:
+            return qs.filter(car__owner_id=role.car_owner_id)
         
-        try:
-            garage = Garage.objects.get(user=user)
-            return qs.filter(garage=garage)
-        except Garage.DoesNotExist:
-            pass
+        if role.mechanic_id:
+            return qs.filter(mechanic_pickup_id=role.mechanic_id) | qs.filter(mechanic_return_id=role.mechanic_id)
+        
+        if role.garage_id:
+            return qs.filter(garage_id=role.garage_id)
         
         return ServiceRecord.objects.none()
 
@@ -814,6 +1069,7 @@ class NotificationViewSet(viewsets.ModelViewSet):
     queryset = Notification.objects.all().order_by('-created_at')
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtKeysetPagination
 
     def get_queryset(self):
         user = self.request.user
@@ -822,60 +1078,66 @@ class NotificationViewSet(viewsets.ModelViewSet):
         if user.is_staff:
             return qs.all()
         
-        try:
-            car_owner = CarOwner.objects.get(user=user)
-            return qs.filter(recipient_owner=car_owner)
-        except CarOwner.DoesNotExist:
-            pass
+        role = get_role(self.request)
         
-        try:
-            mechanic = Mechanic.objects.get(user=user)
-            return qs.filter(recipient_mechanic=mechanic)
-        except Mechanic.DoesNotExist:
-            pass
+        if role.car_owner_id:
+            return qs.filter(recipient_owner_id=role.car_owner_id)
         
-        try:
-            garage = Garage.objects.get(user=user)
-            return qs.filter(recipient_garage=garage)
-        except Garage.DoesNotExist:
-            pass
+        if role.mechanic_id:
+            return qs.filter(recipient_mechanic_id=role.mechanic_id)
+        
+        if role.garage_id:
+            return qs.filter(recipient_garage_id=role.garage_id)
         
         return Notification.objects.none()
 
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
-        notification = self.get_object()
-        
-        # Authorization: ensure the notification belongs to the requesting user
-        user = request.user
-        authorized = user.is_staff
-        if not authorized:
-            try:
-                car_owner = CarOwner.objects.get(user=user)
-                if notification.recipient_owner == car_owner:
-                    authorized = True
-            except CarOwner.DoesNotExist:
-                pass
-            try:
-                mechanic = Mechanic.objects.get(user=user)
-                if notification.recipient_mechanic == mechanic:
-                    authorized = True
-            except Mechanic.DoesNotExist:
-                pass
-            try:
-                garage = Garage.objects.get(user=user)
-                if notification.recipient_garage == garage:
-                    authorized = True
-            except Garage.DoesNotExist:
-                pass
-        
-        if not authorized:
-            return Response({'error': 'You cannot mark this notification as read'}, status=status.HTTP_403_FORBIDDEN)
-        
-        notification.is_read = True
-        notification.save()
+        # get_queryset() only contains the caller's own notifications (or all
+        # of them for staff), so the scoped UPDATE doubles as the ownership check.
+        if not self.get_queryset().filter(pk=pk).update(is_read=True):
+            return Response({'error': 'Notification not found'}, status=status.HTTP_404_NOT_FOUND)
         return Response({'message': 'Notification marked as read'})
 
+    def _recipient_notifications(self, request):
+        """The caller's own notifications, or None for accounts without a feed"""
+        recipient, _ = recipient_filter(get_role(request))
+        if recipient is None:
+            return None
+        return Notification.objects.filter(**recipient)
+
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        notifications = self._recipient_notifications(request)
+        if notifications is None:
+            return Response({'error': 'This account has no notifications'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'unread_count': notifications.filter(is_read=False).count()})
+
+    @action(detail=False, methods=['post'])
+    def mark_all_read(self, request):
+        notifications = self._recipient_notifications(request)
+        if notifications is None:
+            return Response({'error': 'This account has no notifications'}, status=status.HTTP_400_BAD_REQUEST)
+        updated = notifications.filter(is_read=False).update(is_read=True)
+        return Response({'message': f'{updated} notifications marked as read', 'updated': updated})
+
+    @action(detail=False, methods=['post'])
+    def mark_read_bulk(self, request):
+        notifications = self._recipient_notifications(request)
+        if notifications is None:
+            return Response({'error': 'This account has no notifications'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return Response({'error': 'ids must be a non-empty list of notification ids'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = [int(notification_id) for notification_id in ids]
+        except (TypeError, ValueError):
+            return Response({'error': 'ids must be a non-empty list of notification ids'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        updated = notifications.filter(id__in=ids, is_read=False).update(is_read=True)
+        return Response({'message': f'{updated} notifications marked as read', 'updated': updated})
+
     @action(detail=False, methods=['post'])
     def send_to_mechanics(self, request):
         if not request.user.is_staff:
@@ -884,16 +1146,18 @@ class NotificationViewSet(viewsets.ModelViewSet):
         title = request.data.get('title')
         message = request.data.get('message')
         
-        mechanics = Mechanic.objects.filter(status='approved')
-        for mechanic in mechanics:
-            Notification.objects.create(
-                recipient_type='mechanic',
-                recipient_mechanic=mechanic,
-                title=title,
-                message=message
-            )
+        if not title or not message:
+            return Response({'error': 'Title and message are required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        return Response({'message': f'Notification sent to {mechanics.count()} mechanics'})
+        job = send_broadcast('mechanic', title, message)
+        if job.status == 'sent':
+            return Response({'message': f'Notification sent to {job.delivered} mechanics', 'status': 'sent', 'count': job.delivered})
+        return Response({
+            'message': f'Notification queued for {job.audience_size} mechanics',
+            'status': 'queued',
+            'job': job.pk,
+            'audience_size': job.audience_size,
+        }, status=status.HTTP_202_ACCEPTED)
 
     @action(detail=False, methods=['post'])
     def send_to_garages(self, request):
@@ -903,68 +1167,199 @@ class NotificationViewSet(viewsets.ModelViewSet):
         title = request.data.get('title')
         message = request.data.get('message')
         
-        garages = Garage.objects.filter(status='approved')
-        for garage in garages:
-            Notification.objects.create(
-                recipient_type='garage',
-                recipient_garage=garage,
-                title=title,
-                message=message
-            )
+        if not title or not message:
+            return Response({'error': 'Title and message are required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        return Response({'message': f'Notification sent to {garages.count()} garages'})
+        job = send_broadcast('garage', title, message)
+        if job.status == 'sent':
+            return Response({'message': f'Notification sent to {job.delivered} garages', 'status': 'sent', 'count': job.delivered})
+        return Response({
+            'message': f'Notification queued for {job.audience_size} garages',
+            'status': 'queued',
+            'job': job.pk,
+            'audience_size': job.audience_size,
+        }, status=status.HTTP_202_ACCEPTED)
 
 
-class ProductCategoryViewSet(viewsets.ModelViewSet):
-    queryset = ProductCategory.objects.all()
-    serializer_class = ProductCategorySerializer
+# Live notification stream (Server-Sent Events)
+STREAM_MAX_SECONDS = 300        # clients reconnect with Last-Event-ID afterwards
+STREAM_KEEPALIVE_SECONDS = 15   # also how often other processes' rows are picked up
+STREAM_RETRY_MS = 3000          # also the poll interval under WSGI
+STREAM_BATCH_SIZE = 50
+
+
+def _stream_recipient(request):
+    if not request.user.is_authenticated:
+        return None, None
+    return recipient_filter(get_role(request))
+
+
+async def _notifications_after(recipient, last_id):
+    queryset = Notification.objects.filter(id__gt=last_id, **recipient).order_by('id')[:STREAM_BATCH_SIZE]
+    return [NotificationSerializer(notification).data async for notification in queryset]
+
+
+def _sse_event(data):
+    return f"id: {data['id']}\nevent: notification\ndata: {json.dumps(data)}\n\n"
+
+
+async def _notification_events(recipient, channel, last_id, long_poll):
+    """Yield SSE chunks for new notifications until the time window ends.
+
+    With ``long_poll`` the generator stops as soon as it has sent something,
+    and waits at most NOTIFICATION_LONG_POLL_SECONDS for it.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + (settings.NOTIFICATION_LONG_POLL_SECONDS if long_poll else STREAM_MAX_SECONDS)
+    # Subscribe before reading the backlog so nothing falls in between;
+    # anything seen twice is dropped by the id check.
+    subscription = get_broker().subscribe(channel)
+    try:
+        yield f'retry: {STREAM_RETRY_MS}\n\n'
+        pending = await _notifications_after(recipient, last_id)
+        while True:
+            sent = False
+            for data in pending:
+                if data['id'] > last_id:
+                    last_id = data['id']
+                    sent = True
+                    yield _sse_event(data)
+            if len(pending) >= STREAM_BATCH_SIZE:
+                pending = await _notifications_after(recipient, last_id)
+                continue
+            if sent and long_poll:
+                return
+            
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            message = await subscription.get(timeout=min(STREAM_KEEPALIVE_SECONDS, remaining))
+            if message is not None:
+                pending = [message]
+                continue
+            
+            # Quiet period: pick up rows written by other processes
+            pending = await _notifications_after(recipient, last_id)
+            if not pending and not long_poll:
+                yield ': keepalive\n\n'
+    finally:
+        subscription.close()
+
+
+async def notification_stream(request):
+    """
+    Stream the caller's new notifications as Server-Sent Events.
+
+    Under ASGI the connection stays open and notifications are pushed as they
+    are created. Under WSGI (which cannot stream asynchronously) each request
+    returns the backlog, waiting up to NOTIFICATION_LONG_POLL_SECONDS for one,
+    and Retry-After says when to ask again.
+    Resume with the Last-Event-ID header or ?after=<notification id>.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    
+    recipient, channel = await sync_to_async(_stream_recipient)(request)
+    if recipient is None:
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=403)
+        return JsonResponse({'error': 'This account has no notification feed'}, status=400)
+    
+    last_id = request.headers.get('Last-Event-ID') or request.GET.get('after')
+    if last_id is None:
+        last_id = await Notification.objects.filter(**recipient).order_by('-id').values_list('id', flat=True).afirst()
+    try:
+        last_id = int(last_id or 0)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid event id'}, status=400)
+    
+    long_poll = not isinstance(request, ASGIRequest)
+    events = _notification_events(recipient, channel, last_id, long_poll)
+    if long_poll:
+        response = HttpResponse(''.join([chunk async for chunk in events]), content_type='text/event-stream')
+        response['Retry-After'] = STREAM_RETRY_MS // 1000
+    else:
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _product_queryset(params):
+    """Active products, narrowed by the catalog's ``category`` and ``featured`` query params"""
+    queryset = Product.objects.select_related('category').filter(is_active=True)
+    category = params.get('category')
+    featured = params.get('featured')
+    
+    if category:
+        queryset = queryset.filter(category__slug=category)
+    if featured:
+        queryset = queryset.filter(is_featured=True)
+    return queryset
+
+
+class CatalogViewSet(CachedCatalogMixin, AsyncListModelMixin, AsyncRetrieveModelMixin, AsyncAPIViewMixin,
+                     mixins.CreateModelMixin, mixins.UpdateModelMixin, mixins.DestroyModelMixin,
+                     viewsets.GenericViewSet):
+    """
+    A public catalog resource. cars.urls serves it with as_async_view():
+    reads run on the async ORM and are cached, writes are the usual DRF mixins.
+    """
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = AsyncPageNumberPagination
     lookup_field = 'slug'
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductCategoryViewSet(CatalogViewSet):
+    queryset = ProductCategory.objects.all()
+    serializer_class = ProductCategorySerializer
+
+
+class ProductViewSet(CatalogViewSet):
     queryset = Product.objects.select_related('category').filter(is_active=True)
     serializer_class = ProductSerializer
-    permission_classes = [IsAuthenticatedOrReadOnly]
-    lookup_field = 'slug'
 
     def get_queryset(self):
-        queryset = Product.objects.select_related('category').filter(is_active=True)
-        category = self.request.query_params.get('category')
-        featured = self.request.query_params.get('featured')
-        
-        if category:
-            queryset = queryset.filter(category__slug=category)
-        if featured:
-            queryset = queryset.filter(is_featured=True)
+        queryset = _product_queryset(self.request.query_params)
+        query = self.request.query_params.get('q', '').strip()
+        if query:
+            queryset = search_products(queryset, query)
         
         return queryset
 
-    @action(detail=False, methods=['get'])
-    def featured(self, request):
-        products = Product.objects.filter(is_active=True, is_featured=True)[:8]
-        return Response(ProductSerializer(products, many=True).data)
+    async def aget_queryset(self):
+        if self.request.query_params.get('q', '').strip():
+            # The full-text match is a raw query on the search table
+            return await sync_to_async(self.get_queryset)()
+        return self.get_queryset()
 
-    @action(detail=False, methods=['get'])
-    def on_sale(self, request):
-        products = Product.objects.filter(is_active=True, sale_price__isnull=False)[:8]
-        return Response(ProductSerializer(products, many=True).data)
+    async def featured(self, request):
+        async def build():
+            products = Product.objects.select_related('category').filter(is_active=True, is_featured=True)[:8]
+            return Response(ProductSerializer([product async for product in products], many=True).data)
+        return await cached_catalog_response(request, 'product-featured', build)
+
+    async def on_sale(self, request):
+        async def build():
+            products = Product.objects.select_related('category').filter(is_active=True, sale_price__isnull=False)[:8]
+            return Response(ProductSerializer([product async for product in products], many=True).data)
+        return await cached_catalog_response(request, 'product-on-sale', build)
 
 
 class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.select_related('customer__user').prefetch_related('items').all()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtKeysetPagination
 
     def get_queryset(self):
         qs = Order.objects.select_related('customer__user').prefetch_related('items')
         if self.request.user.is_staff:
             return qs.all()
-        try:
-            car_owner = CarOwner.objects.get(user=self.request.user)
-            return qs.filter(customer=car_owner)
-        except CarOwner.DoesNotExist:
-            return Order.objects.none()
+        role = get_role(self.request)
+        if role.car_owner_id:
+            return qs.filter(customer_id=role.car_owner_id)
+        return Order.objects.none()
 
     def perform_create(self, serializer):
         car_owner = CarOwner.objects.get(user=self.request.user)
@@ -982,57 +1377,93 @@ class OrderViewSet(viewsets.ModelViewSet):
         phone_number = request.data.get('phone_number')
         notes = request.data.get('notes', '')
         
-        if not items:
+        if not items or not isinstance(items, list):
             return Response({'error': 'No items in order'}, status=status.HTTP_400_BAD_REQUEST)
         
-        subtotal = 0
-        order_items = []
+        if not shipping_address or not phone_number:
+            return Response({'error': 'Shipping address and phone number are required'}, status=status.HTTP_400_BAD_REQUEST)
         
+        # Merge repeated products into one line, keeping the cart's order
+        quantities = {}
         for item in items:
             try:
-                product = Product.objects.get(id=item['product_id'])
-                quantity = item.get('quantity', 1)
-                price = product.sale_price if product.is_on_sale else product.price
-                total = price * quantity
-                subtotal += total
-                
-                order_items.append({
-                    'product': product,
-                    'product_name': product.name,
-                    'quantity': quantity,
-                    'price': price,
-                    'total': total
-                })
-            except Product.DoesNotExist:
-                return Response({'error': f'Product not found: {item.get("product_id")}'}, status=status.HTTP_400_BAD_REQUEST)
+                product_id = int(item['product_id'])
+                quantity = int(item.get('quantity', 1))
+            except (KeyError, TypeError, ValueError, AttributeError):
+                return Response({'error': 'Each item needs a product_id and an integer quantity'}, status=status.HTTP_400_BAD_REQUEST)
+            if quantity < 1:
+                return Response({'error': f'Invalid quantity for product {product_id}'}, status=status.HTTP_400_BAD_REQUEST)
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        
+        products = Product.objects.filter(is_active=True).in_bulk(list(quantities))
+        missing = [product_id for product_id in quantities if product_id not in products]
+        if missing:
+            return Response({'error': f'Product not found: {missing[0]}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        subtotal = Decimal('0')
+        order_items = []
+        for product_id, quantity in quantities.items():
+            product = products[product_id]
+            price = product.sale_price if product.is_on_sale else product.price
+            total = price * quantity
+            subtotal += total
+            order_items.append(OrderItem(
+                product=product,
+                product_name=product.name,
+                quantity=quantity,
+                price=price,
+                total=total
+            ))
         
         shipping_cost = 0 if subtotal >= 50 else 5
         total = subtotal + shipping_cost
         
-        order = Order.objects.create(
-            customer=car_owner,
-            subtotal=subtotal,
-            shipping_cost=shipping_cost,
-            total=total,
-            shipping_address=shipping_address,
-            phone_number=phone_number,
-            notes=notes
-        )
-        
-        for item_data in order_items:
-            OrderItem.objects.create(order=order, **item_data)
+        with transaction.atomic():
+            # Decrement every product's stock in one conditional UPDATE. Rows
+            # without enough stock don't match, so a short count means an
+            # oversell and the whole order is rolled back.
+            in_stock = models.Q()
+            for product_id, quantity in quantities.items():
+                in_stock |= models.Q(pk=product_id, stock__gte=quantity)
+            decrement = models.Case(
+                *[models.When(pk=product_id, then=models.Value(quantity)) for product_id, quantity in quantities.items()],
+                output_field=models.IntegerField(),
+            )
+            updated = Product.objects.filter(in_stock).update(stock=models.F('stock') - decrement)
+            if updated != len(quantities):
+                transaction.set_rollback(True)
+                short = [products[product_id].name for product_id, quantity in quantities.items()
+                         if products[product_id].stock < quantity]
+                return Response({
+                    'error': f'Insufficient stock for: {", ".join(short)}' if short else 'Insufficient stock'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            order = Order.objects.create(
+                customer=car_owner,
+                subtotal=subtotal,
+                shipping_cost=shipping_cost,
+                total=total,
+                shipping_address=shipping_address,
+                phone_number=phone_number,
+                notes=notes
+            )
+            for order_item in order_items:
+                order_item.order = order
+            OrderItem.objects.bulk_create(order_items)
+            # Cached catalog pages show stock levels
+            transaction.on_commit(bump_catalog_version)
         
         return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
 
 
-@api_view(['POST'])
-@permission_classes([AllowAny])
-def submit_service_inquiry(request):
+async def _submit_service_inquiry(request):
     """
     Handle service inquiry submissions for Fleet Management, NTSA Inspection, and Dedicated Drivers.
-    Sends email notification to admin.
+    Queues email notifications to the admin and the customer.
     """
     data = request.data
+    if not isinstance(data, dict):
+        return Response({'error': 'Expected a JSON object'}, status=status.HTTP_400_BAD_REQUEST)
     
     # Required fields
     service_type = data.get('service_type')
@@ -1060,7 +1491,7 @@ def submit_service_inquiry(request):
     inquiry_data = {k: v for k, v in data.items() if k not in ['service_type', 'companyName', 'institutionName', 'contactPerson', 'email', 'phone']}
     
     # Create the inquiry
-    inquiry = ServiceInquiry.objects.create(
+    inquiry = await ServiceInquiry.objects.acreate(
         service_type=service_type,
         company_name=company_name,
         contact_person=contact_person,
@@ -1104,17 +1535,12 @@ Please follow up with this inquiry promptly.
 """
     
     # Send email notification
-    try:
-        send_mail(
-            subject=f'New {service_type_display} Inquiry - {company_name}',
-            message=email_body,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[settings.ADMIN_EMAIL],
-            fail_silently=False,
-        )
-    except Exception as e:
-        # Log the error but don't fail the request
-        print(f"Failed to send email notification: {e}")
+    await aqueue_mail(
+        subject=f'New {service_type_display} Inquiry - {company_name}',
+        message=email_body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[settings.ADMIN_EMAIL],
+    )
     
     # Also send confirmation email to the customer
     customer_email_body = f"""
@@ -1132,18 +1558,27 @@ Best regards,
 Swift Serve Team
 """
     
-    try:
-        send_mail(
-            subject=f'Thank You for Your {service_type_display} Inquiry - Swift Serve',
-            message=customer_email_body,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[email],
-            fail_silently=False,
-        )
-    except Exception as e:
-        print(f"Failed to send confirmation email to customer: {e}")
+    await aqueue_mail(
+        subject=f'Thank You for Your {service_type_display} Inquiry - Swift Serve',
+        message=customer_email_body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[email],
+    )
     
     return Response({
         'message': 'Inquiry submitted successfully',
         'reference': f'INQ-{inquiry.id:06d}'
     }, status=status.HTTP_201_CREATED)
+
+
+class ServiceInquiryView(AsyncAPIViewMixin, APIView):
+    # A public form with nothing tied to the session: no authentication, so
+    # no CSRF check either
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    async def post(self, request):
+        return await _submit_service_inquiry(request)
+
+
+submit_service_inquiry = ServiceInquiryView.as_async_view()
@@ -3,6 +3,12 @@ ASGI config for swiftcar_api project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the API through this module (e.g. ``gunicorn swiftcar_api.asgi:application
+-k uvicorn.workers.UvicornWorker``) to get a held-open /api/notifications/stream/
+connection; under WSGI that endpoint falls back to long polling. The catalog
+reads and the service inquiry form are async views too, so under ASGI they
+do not hold a worker thread while waiting on the database.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
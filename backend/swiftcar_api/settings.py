@@ -78,14 +78,42 @@ if DB_ENGINE == 'mysql':
             },
         }
     }
+    # MySQL has no partial indexes, so Django skips the conditional ones on
+    # Product (models.W037). They only exist for SQLite's boolean filters;
+    # on MySQL the composite product_featured_idx/product_sale_idx serve the
+    # same queries.
+    SILENCED_SYSTEM_CHECKS = ['models.W037']
 else:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # File-backed test database so concurrent test threads wait on
+            # SQLite's write lock instead of failing with "table is locked"
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
         }
     }
 
+# Cache
+# The default file-based cache is shared by every worker process on the host,
+# so role and catalog invalidations reach all of them. Point CACHE_BACKEND at
+# a shared store (e.g. django.core.cache.backends.redis.RedisCache with
+# CACHE_LOCATION=redis://...) when running on more than one host.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / 'cache')),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
+        'KEY_PREFIX': config('CACHE_KEY_PREFIX', default='swiftcar'),
+    }
+}
+
+# Gives test runs their own in-memory cache instead of the one above
+TEST_RUNNER = 'swiftcar_api.test_runner.TestRunner'
+
+# How long catalog responses are cached (they are also invalidated on change)
+CATALOG_CACHE_TIMEOUT = config('CATALOG_CACHE_TIMEOUT', default=600, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -116,6 +144,27 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Serve MEDIA_ROOT from Django (cars.serving), for deployments where nothing
+# in front of passenger_wsgi.py does. Files outside MEDIA_ROOT/blobs are
+# cached for MEDIA_CACHE_MAX_AGE seconds, blobs for a year.
+SERVE_MEDIA = config('SERVE_MEDIA', default=True, cast=bool)
+MEDIA_CACHE_MAX_AGE = config('MEDIA_CACHE_MAX_AGE', default=3600, cast=int)
+
+# Uploaded images are stored once per distinct content under MEDIA_ROOT/blobs
+# (see cars.storage); `python manage.py gc_media_blobs` removes unused ones.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'media_blobs': {'BACKEND': 'cars.storage.ContentAddressedStorage'},
+}
+
+# Where uploads are spooled while they are validated (see cars.uploads); keep it
+# on the same filesystem as MEDIA_ROOT so storing a file is a rename
+UPLOAD_TEMP_DIR = config('UPLOAD_TEMP_DIR', default=str(BASE_DIR / 'tmp' / 'uploads'))
+
+# Threads used to resize a batch of uploaded garage photos (see cars.images)
+IMAGE_PROCESSING_WORKERS = config('IMAGE_PROCESSING_WORKERS', default=4, cast=int)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -134,8 +183,9 @@ REST_FRAMEWORK = {
         'rest_framework.throttling.UserRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
-        'anon': '30/minute',
-        'user': '120/minute',
+        # Raise these for load tests (see the bench_http command)
+        'anon': config('ANON_THROTTLE_RATE', default='30/minute'),
+        'user': config('USER_THROTTLE_RATE', default='120/minute'),
         'login': '5/minute',
     },
 }
@@ -164,6 +214,27 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@swiftcar.com')
 ADMIN_EMAIL = config('ADMIN_EMAIL', default='admin@swiftcar.com')
 
+# Outbound email queue (drained by `python manage.py send_queued_mail`)
+EMAIL_QUEUE_BATCH_SIZE = config('EMAIL_QUEUE_BATCH_SIZE', default=50, cast=int)
+EMAIL_QUEUE_MAX_ATTEMPTS = config('EMAIL_QUEUE_MAX_ATTEMPTS', default=5, cast=int)
+
+# Live notification delivery for /api/notifications/stream/. The in-process
+# broker only reaches streams served by the same process; other processes'
+# notifications are picked up by the stream's periodic database check.
+NOTIFICATION_BROKER = config('NOTIFICATION_BROKER', default='cars.pubsub.InProcessBroker')
+
+# Under WSGI GET /api/notifications/stream/ can't stream, and a waiting
+# request holds one of the few Passenger workers; 0 answers at once with
+# Retry-After (a plain poll). Only the ASGI deployment pushes notifications.
+NOTIFICATION_LONG_POLL_SECONDS = config('NOTIFICATION_LONG_POLL_SECONDS', default=0, cast=int)
+
+# Automatic dispatch of pending service requests (`python manage.py dispatch_requests`).
+# DISPATCH_SCORER is called as score(candidate, service_request); see cars.dispatch.
+DISPATCH_ON_CREATE = config('DISPATCH_ON_CREATE', default=False, cast=bool)
+DISPATCH_SCORER = config('DISPATCH_SCORER', default='cars.dispatch.default_score')
+DISPATCH_MAX_ACTIVE_JOBS = config('DISPATCH_MAX_ACTIVE_JOBS', default=3, cast=int)
+DISPATCH_BATCH_SIZE = config('DISPATCH_BATCH_SIZE', default=200, cast=int)
+
 # Frontend URL for email links
 FRONTEND_URL = config('FRONTEND_URL', default='http://localhost:3000')
 
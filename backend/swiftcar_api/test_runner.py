@@ -0,0 +1,28 @@
+"""
+Test runner for ``manage.py test``.
+
+The configured cache (a file-based cache in BASE_DIR/cache by default) is
+shared with the development server and with other test runs, and tests
+clear it. Each run gets a private in-memory cache instead. Runners that
+bypass TEST_RUNNER (e.g. pytest) can set CACHE_BACKEND to
+django.core.cache.backends.locmem.LocMemCache for the same effect.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_override = override_settings(CACHES=TEST_CACHES)
+        self.cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_override.disable()
+        super().teardown_test_environment(**kwargs)
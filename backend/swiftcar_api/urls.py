@@ -1,7 +1,14 @@
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+from cars.serving import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('cars.urls')),
 ]
+
+if settings.SERVE_MEDIA:
+    urlpatterns.append(
+        re_path(rf'^{settings.MEDIA_URL.strip("/")}/(?P<path>.+)$', serve_media, name='serve-media')
+    )
@@ -32,17 +32,30 @@ export default function DriverPortalPage() {
 
   const loadData = async () => {
     try {
-      const [requestsData, notificationsData, garagesData] = await Promise.all([
-        api.getServiceRequests(),
+      // allSettled: open jobs are refused (403) until the driver is approved,
+      // which mustn't hide their own jobs, notifications and garages
+      const [openJobs, myJobs, notificationsData, garagesData] = await Promise.allSettled([
+        api.getOpenJobs(),
+        api.getMyJobs(),
         api.getNotifications(),
         api.getGarages(),
       ]);
-      
-      setServiceRequests(requestsData);
-      setNotifications(notificationsData);
-      setGarages(garagesData.filter((g: Garage) => g.status === 'approved'));
-    } catch (error) {
-      console.error('Failed to load data:', error);
+
+      for (const result of [openJobs, myJobs, notificationsData, garagesData]) {
+        if (result.status === 'rejected') {
+          console.error('Failed to load data:', result.reason);
+        }
+      }
+      setServiceRequests([
+        ...(openJobs.status === 'fulfilled' ? openJobs.value : []),
+        ...(myJobs.status === 'fulfilled' ? myJobs.value : []),
+      ]);
+      if (notificationsData.status === 'fulfilled') {
+        setNotifications(notificationsData.value);
+      }
+      if (garagesData.status === 'fulfilled') {
+        setGarages(garagesData.value.filter((g: Garage) => g.status === 'approved'));
+      }
     } finally {
       setLoading(false);
     }
@@ -128,7 +141,7 @@ export default function DriverPortalPage() {
   // Service complete, ready to return to owner
   const completedJobs = serviceRequests.filter(r => r.status === 'completed');
   // Delivered back to owner
-  const deliveredJobs = serviceRequests.filter(r => r.status === 'delivered');
+  const deliveredJobs = serviceRequests.filter(r => r.status === 'returned');
 
   if (loading) {
     return (
@@ -382,7 +395,7 @@ export default function DriverPortalPage() {
                               </div>
                               <div>
                                 <h4 className="font-semibold text-gray-900">
-                                  {request.car_details?.year} {request.car_details?.make} {request.car_details?.model}
+                                  {request.car_label}
                                 </h4>
                                 <p className="text-sm text-gray-500">{request.service_type?.replace(/_/g, ' ')}</p>
                               </div>
@@ -442,7 +455,7 @@ export default function DriverPortalPage() {
                           <div className="flex flex-col lg:flex-row lg:items-start lg:justify-between gap-4">
                             <div>
                               <h4 className="font-semibold text-gray-900">
-                                {request.car_details?.year} {request.car_details?.make} {request.car_details?.model}
+                                {request.car_label}
                               </h4>
                               <p className="text-sm text-gray-500">{request.service_type?.replace(/_/g, ' ')}</p>
                               <p className="text-sm text-gray-600 mt-1">📍 {request.pickup_location}</p>
@@ -473,7 +486,7 @@ export default function DriverPortalPage() {
                           <div className="flex flex-col lg:flex-row lg:items-start lg:justify-between gap-4">
                             <div>
                               <h4 className="font-semibold text-gray-900">
-                                {request.car_details?.year} {request.car_details?.make} {request.car_details?.model}
+                                {request.car_label}
                               </h4>
                               <p className="text-sm text-gray-500">{request.service_type?.replace(/_/g, ' ')}</p>
                               <p className="text-sm text-blue-600 mt-1 font-medium">Car picked up! Select a garage to deliver to.</p>
@@ -504,11 +517,11 @@ export default function DriverPortalPage() {
                           <div className="flex flex-col lg:flex-row lg:items-start lg:justify-between gap-4">
                             <div>
                               <h4 className="font-semibold text-gray-900">
-                                {request.car_details?.year} {request.car_details?.make} {request.car_details?.model}
+                                {request.car_label}
                               </h4>
                               <p className="text-sm text-gray-500">{request.service_type?.replace(/_/g, ' ')}</p>
-                              {request.garage_details && (
-                                <p className="text-sm text-purple-600 mt-1 font-medium">🔧 At {request.garage_details.name}</p>
+                              {request.garage_name && (
+                                <p className="text-sm text-purple-600 mt-1 font-medium">🔧 At {request.garage_name}</p>
                               )}
                             </div>
                             <div className="px-4 py-2 bg-purple-100 text-purple-700 text-sm rounded-lg">
@@ -531,7 +544,7 @@ export default function DriverPortalPage() {
                           <div className="flex flex-col lg:flex-row lg:items-start lg:justify-between gap-4">
                             <div>
                               <h4 className="font-semibold text-gray-900">
-                                {request.car_details?.year} {request.car_details?.make} {request.car_details?.model}
+                                {request.car_label}
                               </h4>
                               <p className="text-sm text-gray-500">{request.service_type?.replace(/_/g, ' ')}</p>
                               <p className="text-sm text-green-600 mt-1 font-medium">✅ Service completed! Return car to owner.</p>
@@ -588,12 +601,12 @@ export default function DriverPortalPage() {
                         <div className="flex items-start justify-between">
                           <div>
                             <h4 className="font-semibold text-gray-900">
-                              {request.car_details?.year} {request.car_details?.make} {request.car_details?.model}
+                              {request.car_label}
                             </h4>
                             <p className="text-sm text-gray-500">{request.service_type?.replace(/_/g, ' ')}</p>
-                            {request.garage_details && (
+                            {request.garage_name && (
                               <p className="text-sm text-gray-400 mt-1">
-                                Serviced at: {request.garage_details.name}
+                                Serviced at: {request.garage_name}
                               </p>
                             )}
                             <p className="text-xs text-gray-400 mt-1">
@@ -113,7 +113,7 @@ export default function GaragePortalPage() {
   // Cars at this garage being serviced
   const inServiceRequests = serviceRequests.filter(r => r.status === 'in_service');
   // Cars that were serviced and completed
-  const completedRequests = serviceRequests.filter(r => ['completed', 'delivered'].includes(r.status));
+  const completedRequests = serviceRequests.filter(r => ['completed', 'returned'].includes(r.status));
 
   const formatCurrency = (amount: string | number) => {
     const num = typeof amount === 'string' ? parseFloat(amount) : amount;
@@ -140,7 +140,7 @@ export default function GaragePortalPage() {
             <div className="p-6 border-b">
               <h3 className="text-lg font-bold text-gray-900">Service Details</h3>
               <p className="text-sm text-gray-500">
-                {selectedRequest.car_details?.year} {selectedRequest.car_details?.make} {selectedRequest.car_details?.model}
+                {selectedRequest.car_label}
               </p>
             </div>
             
@@ -443,9 +443,9 @@ export default function GaragePortalPage() {
                               </div>
                               <div>
                                 <h4 className="font-semibold text-gray-900">
-                                  {request.car_details?.year} {request.car_details?.make} {request.car_details?.model}
+                                  {request.car_label}
                                 </h4>
-                                <p className="text-sm text-gray-500">Reg: {request.car_details?.registration_number}</p>
+                                <p className="text-sm text-gray-500">Reg: {request.car_registration}</p>
                                 <p className="text-sm text-purple-600 font-medium mt-1">
                                   Service: {request.service_type?.replace(/_/g, ' ')}
                                 </p>
@@ -505,7 +505,7 @@ export default function GaragePortalPage() {
                         <div className="flex items-start justify-between">
                           <div>
                             <h4 className="font-semibold text-gray-900">
-                              {request.car_details?.year} {request.car_details?.make} {request.car_details?.model}
+                              {request.car_label}
                             </h4>
                             <p className="text-sm text-gray-500">{request.service_type?.replace(/_/g, ' ')}</p>
                             <p className="text-xs text-gray-400 mt-1">
@@ -513,11 +513,11 @@ export default function GaragePortalPage() {
                             </p>
                           </div>
                           <span className={`px-3 py-1 text-xs font-medium rounded-full ${
-                            request.status === 'delivered' 
+                            request.status === 'returned' 
                               ? 'bg-green-100 text-green-700' 
                               : 'bg-yellow-100 text-yellow-700'
                           }`}>
-                            {request.status === 'delivered' ? '✓ Returned to Owner' : '⏳ Awaiting Pickup by Driver'}
+                            {request.status === 'returned' ? '✓ Returned to Owner' : '⏳ Awaiting Pickup by Driver'}
                           </span>
                         </div>
                       </div>
@@ -451,7 +451,7 @@ export default function OwnerPortalPage() {
                 </div>
                 {(() => {
                   // Filter completed/delivered requests
-                  let filteredRequests = serviceRequests.filter(r => ['completed', 'delivered'].includes(r.status));
+                  let filteredRequests = serviceRequests.filter(r => ['completed', 'returned'].includes(r.status));
                   
                   // Apply car filter
                   if (historyCarFilter !== 'all') {
@@ -529,7 +529,7 @@ export default function OwnerPortalPage() {
                           <div className="flex flex-col sm:flex-row sm:items-start sm:justify-between gap-4 mb-4">
                             <div>
                               <h4 className="font-semibold text-gray-900">
-                                {request.car_details?.year} {request.car_details?.make} {request.car_details?.model}
+                                {request.car_label}
                               </h4>
                               <p className="text-sm text-gray-500">{request.service_type?.replace(/_/g, ' ')}</p>
                             </div>
@@ -555,7 +555,7 @@ export default function OwnerPortalPage() {
                                 <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M19 21V5a2 2 0 00-2-2H7a2 2 0 00-2 2v16m14 0h2m-2 0h-5m-9 0H3m2 0h5M9 7h1m-1 4h1m4-4h1m-1 4h1m-5 10v-5a1 1 0 011-1h2a1 1 0 011 1v5m-4 0h4" />
                               </svg>
                               <span className="text-gray-600">Garage:</span>
-                              <span className="font-medium text-gray-900">{request.garage_details?.name || 'N/A'}</span>
+                              <span className="font-medium text-gray-900">{request.garage_name || 'N/A'}</span>
                             </div>
                             <div className="flex items-center gap-2">
                               <svg className="w-4 h-4 text-gray-400" fill="none" stroke="currentColor" viewBox="0 0 24 24">
@@ -643,7 +643,7 @@ export default function OwnerPortalPage() {
                         <div className="flex flex-col sm:flex-row sm:items-start sm:justify-between gap-3 mb-4">
                           <div>
                             <h4 className="font-semibold text-gray-900">
-                              {request.car_details?.year} {request.car_details?.make} {request.car_details?.model}
+                              {request.car_label}
                             </h4>
                             <p className="text-sm text-gray-500">{request.service_type?.replace(/_/g, ' ')}</p>
                           </div>
@@ -668,7 +668,7 @@ export default function OwnerPortalPage() {
                         </div>
 
                         {/* Work Items & Cost Section - Show when service is complete or delivered */}
-                        {['completed', 'delivered'].includes(request.status) && request.work_items && request.work_items.length > 0 && (
+                        {['completed', 'returned'].includes(request.status) && request.work_items && request.work_items.length > 0 && (
                           <div className="mt-4 pt-4 border-t">
                             <h5 className="text-sm font-medium text-gray-700 mb-3 flex items-center gap-2">
                               <svg className="w-4 h-4 text-green-600" fill="none" stroke="currentColor" viewBox="0 0 24 24">
@@ -106,6 +106,9 @@ export interface Garage {
   owner_email: string;
   address: string;
   location: string;
+  latitude?: number | null;
+  longitude?: number | null;
+  distance_km?: number;
   status: 'pending' | 'approved' | 'rejected';
   images?: any[];
   created_at: string;
@@ -123,11 +126,19 @@ export interface ServiceRequest {
   id: number;
   car: number;
   owner: number;
+  car_label?: string;
+  car_registration?: string;
+  owner_name?: string;
+  mechanic_name?: string | null;
+  garage_name?: string | null;
   car_details?: Car;
   owner_details?: CarOwner;
   mechanic_details?: Mechanic;
   garage_details?: Garage;
   pickup_location: string;
+  pickup_latitude?: number | null;
+  pickup_longitude?: number | null;
+  distance_km?: number;
   preferred_date: string;
   preferred_time: string;
   service_type: string;
@@ -155,6 +166,11 @@ export interface ServiceRecord {
   id: number;
   service_request: number;
   car: number;
+  car_label?: string;
+  car_registration?: string;
+  mechanic_pickup_name?: string | null;
+  mechanic_return_name?: string | null;
+  garage_name?: string | null;
   car_details?: Car;
   owner_details?: CarOwner;
   mechanic_pickup: number | null;
@@ -187,6 +203,17 @@ export interface Notification {
   created_at: string;
 }
 
+export interface CarHistory {
+  summary: {
+    visit_count: number;
+    lifetime_cost: string;
+    last_service_date: string | null;
+  };
+  next: string | null;
+  previous: string | null;
+  results: ServiceRecord[];
+}
+
 export interface ProductCategory {
   id: number;
   name: string;
@@ -309,6 +336,12 @@ export const api = {
     return data.results || data;
   },
 
+  getCarHistory: async (carId: number, cursorUrl?: string): Promise<CarHistory> => {
+    const response = await authenticatedFetch(cursorUrl || `${API_URL}/cars/${carId}/history/`, { credentials: 'include' });
+    if (!response.ok) throw new Error('Failed to fetch car history');
+    return response.json();
+  },
+
   createCar: async (car: any): Promise<Car> => {
     const response = await authenticatedFetch(`${API_URL}/cars/`, {
       method: 'POST',
@@ -403,12 +436,32 @@ export const api = {
 
   // Service Request endpoints
   getServiceRequests: async (): Promise<ServiceRequest[]> => {
-    const response = await fetch(`${API_URL}/service-requests/`, { credentials: 'include' });
+    const response = await fetch(`${API_URL}/service-requests/?expand=work_items`, { credentials: 'include' });
     if (!response.ok) throw new Error('Failed to fetch service requests');
     const data = await response.json();
     return data.results || data;
   },
 
+  getOpenJobs: async (params?: { date_from?: string; date_to?: string; area?: string }): Promise<ServiceRequest[]> => {
+    const searchParams = new URLSearchParams();
+    if (params?.date_from) searchParams.append('date_from', params.date_from);
+    if (params?.date_to) searchParams.append('date_to', params.date_to);
+    if (params?.area) searchParams.append('area', params.area);
+
+    const url = `${API_URL}/service-requests/open_jobs/${searchParams.toString() ? '?' + searchParams.toString() : ''}`;
+    const response = await fetch(url, { credentials: 'include' });
+    if (!response.ok) throw new Error('Failed to fetch open jobs');
+    const data = await response.json();
+    return data.results || data;
+  },
+
+  getMyJobs: async (): Promise<ServiceRequest[]> => {
+    const response = await fetch(`${API_URL}/service-requests/my_jobs/`, { credentials: 'include' });
+    if (!response.ok) throw new Error('Failed to fetch jobs');
+    const data = await response.json();
+    return data.results || data;
+  },
+
   createServiceRequest: async (data: any): Promise<ServiceRequest> => {
     const response = await authenticatedFetch(`${API_URL}/service-requests/`, {
       method: 'POST',
@@ -574,10 +627,11 @@ export const api = {
   },
 
   // Product endpoints
-  getProducts: async (params?: { category?: string; featured?: boolean }): Promise<Product[]> => {
+  getProducts: async (params?: { category?: string; featured?: boolean; q?: string }): Promise<Product[]> => {
     const searchParams = new URLSearchParams();
     if (params?.category) searchParams.append('category', params.category);
     if (params?.featured) searchParams.append('featured', 'true');
+    if (params?.q) searchParams.append('q', params.q);
     
     const url = `${API_URL}/products/${searchParams.toString() ? '?' + searchParams.toString() : ''}`;
     const response = await fetch(url);